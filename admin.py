@@ -1,12 +1,24 @@
-from aiogram import F, Router
+import os
+
+from aiogram import Router
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message, ReplyKeyboardRemove
+from aiogram.types import CallbackQuery, FSInputFile, Message, ReplyKeyboardRemove
 
-from database import Application, AsyncSessionLocal
-from logger import error_logger
+from audit import audit_log
+from callbacks import Action, ActionData, ActionRegistry
+from export import EXPORT_FORMATS, EXPORT_MODELS, export_to_files, parse_date
+from filters import IsAdmin
+from logger import error_logger, logger
+from notifications import admin_message_sync, format_question, notify_admins_about_question
+from repository import repo
+from roster import admin_roster
+from topics import TOPICS, topic_classifier, topic_title
 
 admin_router = Router()
+admin_router.message.filter(IsAdmin())
+admin_router.callback_query.filter(IsAdmin())
 
 
 class RejectReason(StatesGroup):
@@ -14,22 +26,34 @@ class RejectReason(StatesGroup):
     application_id = State()
 
 
-@admin_router.callback_query(F.data.startswith("accept_"))
-async def accept_application(callback: CallbackQuery):
-    app_id = int(callback.data.split("_")[1])
+callback_actions = ActionRegistry()
 
-    async with AsyncSessionLocal() as session:
-        application = await session.get(Application, app_id)
-        if not application:
-            return await callback.answer("Заявка не найдена или уже обработана.")
 
-        if application.status != "новая":
-            return await callback.answer(
-                "Эта заявка уже была обработана.", show_alert=True
-            )
+@admin_router.callback_query(callback_actions.filter())
+async def dispatch_callback_action(
+    callback: CallbackQuery, state: FSMContext, action_data: ActionData, action_handler
+):
+    await action_handler(callback, action_data, state)
+
+
+@callback_actions.register(Action.ACCEPT)
+async def accept_application(callback: CallbackQuery, action_data: ActionData, state: FSMContext):
+    app_id = action_data.entity_id
+
+    application = await repo.get_application(app_id)
+    if not application:
+        return await callback.answer("Заявка не найдена или уже обработана.")
+
+    if application.status != "новая" or not await repo.set_application_status(
+        app_id, "принята", expected_status="новая"
+    ):
+        return await callback.answer(
+            "Эта заявка уже была обработана.", show_alert=True
+        )
 
-        application.status = "принята"
-        await session.commit()
+    audit_log.record(
+        "application_accepted", "application", app_id, actor_id=callback.from_user.id
+    )
 
     try:
         await callback.bot.send_message(
@@ -42,25 +66,35 @@ async def accept_application(callback: CallbackQuery):
         )
 
     await callback.answer("Заявка принята")
-    await callback.message.edit_reply_markup(reply_markup=None)
+    await admin_message_sync.sync_application(
+        callback.bot,
+        app_id,
+        actor_id=callback.from_user.id,
+        extra=[(callback.message.chat.id, callback.message.message_id)],
+    )
 
 
-@admin_router.callback_query(F.data.startswith("reject_"))
-async def reject_application(callback: CallbackQuery, state: FSMContext):
-    app_id = int(callback.data.split("_")[1])
+@callback_actions.register(Action.REJECT)
+async def reject_application(callback: CallbackQuery, action_data: ActionData, state: FSMContext):
+    app_id = action_data.entity_id
 
-    async with AsyncSessionLocal() as session:
-        application = await session.get(Application, app_id)
-        if not application:
-            return await callback.answer("Заявка не найдена или уже обработана.")
+    application = await repo.get_application(app_id)
+    if not application:
+        return await callback.answer("Заявка не найдена или уже обработана.")
 
-        if application.status != "новая":
-            return await callback.answer(
-                "Эта заявка уже была обработана.", show_alert=True
-            )
+    if application.status != "новая":
+        return await callback.answer(
+            "Эта заявка уже была обработана.", show_alert=True
+        )
 
-    await state.update_data(application_id=app_id)
+    await state.update_data(
+        application_id=app_id,
+        notification=(callback.message.chat.id, callback.message.message_id),
+    )
     await state.set_state(RejectReason.waiting_for_reason)
+    audit_log.record(
+        "application_reject_started", "application", app_id, actor_id=callback.from_user.id
+    )
 
     await callback.message.answer(f"Введите причину отклонения заявки №{app_id}:")
     await callback.answer()
@@ -72,16 +106,21 @@ async def process_reject_reason(message: Message, state: FSMContext):
     data = await state.get_data()
     app_id = data.get("application_id")
 
-    async with AsyncSessionLocal() as session:
-        application = await session.get(Application, app_id)
-        if not application:
-            await message.answer("Заявка не найдена или уже обработана.")
-            await state.clear()
-            return
+    application = await repo.get_application(app_id)
+    if not application or not await repo.set_application_status(
+        app_id, "отклонена", admin_comment=reason, expected_status="новая"
+    ):
+        await message.answer("Заявка не найдена или уже обработана.")
+        await state.clear()
+        return
 
-        application.status = "отклонена"
-        application.admin_comment = reason
-        await session.commit()
+    audit_log.record(
+        "application_rejected",
+        "application",
+        app_id,
+        actor_id=message.from_user.id,
+        reason=reason,
+    )
 
     try:
         await message.bot.send_message(
@@ -98,3 +137,247 @@ async def process_reject_reason(message: Message, state: FSMContext):
 
     await message.answer(f"Заявка №{application.id} отклонена с причиной: {reason}")
     await state.clear()
+    notification = data.get("notification")
+    await admin_message_sync.sync_application(
+        message.bot,
+        app_id,
+        actor_id=message.from_user.id,
+        extra=[tuple(notification)] if notification else (),
+    )
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f"{hours} ч {minutes} мин"
+    return f"{hours // 24} дн {hours % 24} ч"
+
+
+@admin_router.message(Command("stats"))
+async def show_stats(message: Message):
+    parts = message.text.split()
+    days = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 7
+    days = min(max(days, 1), 365)
+    summary = await repo.get_stats_summary(days)
+
+    lines = [f"📊 <b>Статистика за {days} дн.</b> (с {summary['since']})"]
+    if not summary["counts"]:
+        lines.append("\nЗа этот период событий нет.")
+    for request_type, counts in summary["counts"].items():
+        lines.append(f"\n<b>{request_type}</b>")
+        for status, count in counts.items():
+            lines.append(f"• {status}: {count}")
+        for status, timing in summary["response_time"].get(request_type, {}).items():
+            lines.append(
+                f"⏱ до статуса «{status}»: в среднем {format_duration(timing['avg_seconds'])}, "
+                f"максимум {format_duration(timing['max_seconds'])}"
+            )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@admin_router.message(Command("export"))
+async def export_data(message: Message):
+    usage = (
+        "Использование: /export applications|questions [csv|jsonl] "
+        "[с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД] [статус]"
+    )
+    parts = message.text.split(maxsplit=5)[1:]
+    if not parts or parts[0] not in EXPORT_MODELS:
+        return await message.answer(usage)
+
+    kind = parts[0]
+    fmt = parts[1] if len(parts) > 1 else "csv"
+    if fmt not in EXPORT_FORMATS:
+        return await message.answer(usage)
+    try:
+        date_from = parse_date(parts[2] if len(parts) > 2 and parts[2] != "-" else None)
+        date_to = parse_date(parts[3] if len(parts) > 3 and parts[3] != "-" else None)
+    except ValueError:
+        return await message.answer(usage)
+    status = parts[4] if len(parts) > 4 else None
+
+    await message.answer("⏳ Готовлю выгрузку...")
+    paths = []
+    try:
+        paths = await export_to_files(kind, fmt, date_from, date_to, status)
+        if not paths:
+            return await message.answer("Нет данных для выгрузки.")
+        for number, path in enumerate(paths, start=1):
+            suffix = f"_part{number}" if len(paths) > 1 else ""
+            await message.answer_document(
+                FSInputFile(path, filename=f"{kind}{suffix}.{fmt}")
+            )
+        logger.info(
+            f"Администратор {message.from_user.id} выгрузил {kind} ({fmt}), файлов: {len(paths)}"
+        )
+    except Exception as e:
+        error_logger.error(f"Ошибка выгрузки {kind} для {message.from_user.id}: {e}", exc_info=True)
+        await message.answer("Не удалось подготовить выгрузку. Попробуйте позднее.")
+    finally:
+        for path in paths:
+            os.unlink(path)
+
+
+ADMINS_USAGE = (
+    "Использование:\n"
+    "/admins — список администраторов\n"
+    "/admins add ID — добавить администратора\n"
+    "/admins remove ID — удалить администратора\n"
+    "/admins group ID — сменить группу для публикаций\n"
+    "/admins reload — перечитать состав из базы"
+)
+
+
+@admin_router.message(Command("admins"))
+async def manage_admins(message: Message):
+    parts = message.text.split()[1:]
+    actor_id = message.from_user.id
+    if not parts:
+        admins = "\n".join(f"• <code>{admin_id}</code>" for admin_id in admin_roster)
+        return await message.answer(
+            f"👥 <b>Администраторы</b> (версия {admin_roster.version}):\n{admins}\n\n"
+            f"📢 Группа для публикаций: <code>{admin_roster.group_id}</code>",
+            parse_mode="HTML",
+        )
+
+    action = parts[0]
+    if action == "reload":
+        await admin_roster.load()
+        return await message.answer(
+            f"🔄 Состав перечитан: {len(admin_roster)} администраторов, версия {admin_roster.version}."
+        )
+
+    if action not in ("add", "remove", "group") or len(parts) != 2 or not parts[1].lstrip("-").isdigit():
+        return await message.answer(ADMINS_USAGE)
+    target_id = int(parts[1])
+
+    if action == "add":
+        if not await admin_roster.add(target_id, added_by=actor_id):
+            return await message.answer("Этот пользователь уже администратор.")
+        reply = f"✅ Администратор {target_id} добавлен."
+    elif action == "remove":
+        if target_id == actor_id or len(admin_roster) == 1:
+            return await message.answer("Нельзя удалить себя или последнего администратора.")
+        if not await admin_roster.remove(target_id):
+            return await message.answer("Такого администратора нет.")
+        reply = f"🗑 Администратор {target_id} удалён."
+    else:
+        await admin_roster.set_group_id(target_id)
+        reply = f"📢 Группа для публикаций изменена на {target_id}."
+
+    audit_log.record(f"admins_{action}", "admin", target_id, actor_id=actor_id)
+    logger.info(f"Администратор {actor_id}: /admins {action} {target_id}")
+    await message.answer(reply)
+
+
+TOPICS_USAGE = (
+    "Использование:\n"
+    "/topics — темы и кто их ведёт\n"
+    "/topics ID тема1,тема2 — назначить администратору темы\n"
+    "/topics ID - — снять темы (будет получать все вопросы)\n"
+    "/topic N тема — исправить тему вопроса №N\n"
+    "/retrain — переобучить классификатор и перераспределить ожидающие вопросы\n\n"
+    "Темы: " + ", ".join(f"{key} ({title})" for key, (title, _) in TOPICS.items())
+)
+
+
+@admin_router.message(Command("topics"))
+async def manage_topics(message: Message):
+    parts = message.text.split()[1:]
+    if not parts:
+        lines = []
+        for key, (title, _) in TOPICS.items():
+            specialists = [
+                f"<code>{admin_id}</code>"
+                for admin_id, topics in admin_roster.topics.items()
+                if key in topics
+            ]
+            lines.append(f"• <b>{key}</b> — {title}: {', '.join(specialists) or 'все без тем'}")
+        generalists = [f"<code>{admin_id}</code>" for admin_id in admin_roster if admin_id not in admin_roster.topics]
+        return await message.answer(
+            "🏷 <b>Темы вопросов</b>\n"
+            + "\n".join(lines)
+            + f"\n\n📥 Получают все вопросы: {', '.join(generalists) or 'никто'}\n\n"
+            + TOPICS_USAGE,
+            parse_mode="HTML",
+        )
+
+    if len(parts) != 2 or not parts[0].isdigit():
+        return await message.answer(TOPICS_USAGE)
+    target_id = int(parts[0])
+    topics = set() if parts[1] == "-" else set(parts[1].split(","))
+    unknown = topics - set(TOPICS)
+    if unknown:
+        return await message.answer(f"Неизвестные темы: {', '.join(sorted(unknown))}\n\n{TOPICS_USAGE}")
+    if not await admin_roster.set_topics(target_id, topics):
+        return await message.answer("Такого администратора нет.")
+
+    audit_log.record(
+        "admins_topics", "admin", target_id, actor_id=message.from_user.id, topics=sorted(topics)
+    )
+    await message.answer(
+        f"🏷 Темы администратора {target_id}: {', '.join(sorted(topics))}"
+        if topics
+        else f"🏷 Администратор {target_id} получает все вопросы."
+    )
+
+
+@admin_router.message(Command("topic"))
+async def set_question_topic(message: Message):
+    parts = message.text.split()[1:]
+    if len(parts) != 2 or not parts[0].isdigit() or parts[1] not in TOPICS:
+        return await message.answer(TOPICS_USAGE)
+    question_id, topic = int(parts[0]), parts[1]
+    if not await repo.get_question(question_id):
+        return await message.answer("❌ Вопрос не найден.")
+
+    await repo.set_question_topics([(question_id, topic)], by_admin=True)
+    audit_log.record(
+        "question_topic", "question", question_id, actor_id=message.from_user.id, topic=topic
+    )
+    routed = await _route_questions(message.bot, [(question_id, topic, 1.0)])
+    await message.answer(
+        f"🏷 Вопрос №{question_id}: тема «{topic_title(topic)}»."
+        + (f" Отправлен ещё {routed} администраторам." if routed else "")
+    )
+
+
+@admin_router.message(Command("retrain"))
+async def retrain_topics(message: Message):
+    report = await topic_classifier.train()
+    changed = await topic_classifier.rescore_backlog()
+    routed = await _route_questions(message.bot, changed)
+    audit_log.record(
+        "topics_retrained", "classifier", None, actor_id=message.from_user.id,
+        samples=report["samples"], rescored=len(changed),
+    )
+    await message.answer(
+        f"🧠 Классификатор обучен на {report['samples']} вопросах "
+        f"за {report['train_ms']:.0f} мс (слов: {report['vocabulary']}).\n"
+        f"🏷 Тема изменилась у {len(changed)} ожидающих вопросов, "
+        f"новых рассылок специалистам: {routed}."
+    )
+
+
+async def _route_questions(bot, questions) -> int:
+    """
+    Досылает вопросы с новой темой тем, кто её ведёт и ещё не получил вопрос.
+    """
+    sent = 0
+    for question_id, topic, confidence in questions:
+        if topic is None:
+            continue
+        received = {chat_id for chat_id, _ in await repo.get_admin_messages("question", question_id)}
+        recipients = [
+            admin_id for admin_id in admin_roster.recipients(topic) if admin_id not in received
+        ]
+        if not recipients:
+            continue
+        question = await repo.get_question(question_id)
+        text = format_question(question_id, question.question_text, topic, confidence)
+        sent += len(await notify_admins_about_question(bot, question_id, text, recipients))
+    return sent
@@ -0,0 +1,94 @@
+import asyncio
+from typing import List, Optional
+
+from sqlalchemy.engine import Row
+
+from database import utcnow
+from logger import error_logger
+from repository import repo
+
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 0.5
+AUDIT_MAX_BUFFER = 10000
+
+
+class AuditLog:
+    """
+    Журнал действий администраторов и шагов оформления заявок.
+    record() только добавляет событие в буфер в памяти; запись в БД идёт
+    одной пачкой каждые batch_size событий или каждые flush_interval секунд.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_buffer: int = AUDIT_MAX_BUFFER,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+
+    def record(
+        self,
+        action: str,
+        entity_type: str,
+        entity_id: Optional[int] = None,
+        actor_id: Optional[int] = None,
+        **payload,
+    ):
+        self._buffer.append(
+            {
+                "created_at": utcnow(),
+                "actor_id": actor_id,
+                "action": action,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "payload": payload or None,
+            }
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                await repo.insert_audit_events(batch)
+            except Exception as e:
+                error_logger.error(
+                    f"Не удалось записать {len(batch)} событий аудита: {e}", exc_info=True
+                )
+                self._buffer = (batch + self._buffer)[-self.max_buffer:]
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stop(self):
+        """
+        Завершает run() после очередного сброса буфера. Задачу нельзя просто
+        отменить: отмена посреди flush() теряет уже взятую из буфера пачку.
+        """
+        self._stopping = True
+        self._wakeup.set()
+
+    async def get_events(
+        self, entity_type: str, entity_id: int, limit: int = 100
+    ) -> List[Row]:
+        await self.flush()
+        return await repo.get_audit_events(entity_type, entity_id, limit)
+
+
+audit_log = AuditLog()
@@ -0,0 +1,610 @@
+"""
+Микробенчмарки горячих путей бота.
+
+    python bench.py              # все бенчмарки
+    python bench.py admin_filter # только выбранные
+
+Сеть и БД не нужны: запросы к Telegram API перехватываются и считаются.
+"""
+import asyncio
+import dataclasses
+import importlib
+import logging
+import os
+import sys
+import time
+import timeit
+from functools import lru_cache
+
+os.environ.setdefault("BOT_TOKEN", "1:bench")
+os.environ.setdefault("ADMIN_CHAT_IDS", "1")
+os.environ.setdefault("GROUP_ID", "1")
+
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+class CountingSession(BaseSession):
+    """
+    Сессия бота, которая только считает запросы к Telegram API.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        raise RuntimeError(f"Запрос к API в бенчмарке: {type(method).__name__}")
+
+    async def stream_content(self, *args, **kwargs):
+        raise RuntimeError("Загрузка файлов в бенчмарке")
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self)
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def _user(user_id: int, is_bot: bool = False) -> dict:
+    return {"id": user_id, "is_bot": is_bot, "first_name": "bench"}
+
+
+def _message(message_id: int, user_id: int, text: str, **extra) -> dict:
+    return {
+        "message_id": message_id,
+        "date": 0,
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text,
+        **extra,
+    }
+
+
+def _setup_bot():
+    from storage import bot
+
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    bot.session = CountingSession()
+    return bot
+
+
+@lru_cache(maxsize=None)
+def _setup_dispatcher():
+    from aiogram import Dispatcher
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    import main
+
+    # Роутеры можно подключить к диспетчеру лишь однажды за процесс
+    dp = Dispatcher(storage=MemoryStorage())
+    main.include_routers(dp)
+    return _setup_bot(), dp
+
+
+async def _feed(bot, dp, updates, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for update in updates:
+            await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / (rounds * len(updates)) * 1e6
+
+
+@benchmark
+async def admin_filter(rounds: int = 2000) -> dict:
+    """
+    Ответы на сообщения бота, нажатия inline-кнопок и админские команды
+    от обычного пользователя должны отсекаться фильтром IsAdmin,
+    не доходя ни до БД, ни до Telegram API.
+    """
+    from callbacks import Action, ActionData, Entity
+    from database import engine
+    from roster import admin_roster
+
+    bot, dp = _setup_dispatcher()
+    queries = QueryCounter(engine)
+    admin_ids = list(range(1000, 1050))
+    admin_roster.ids = frozenset(admin_ids)
+    outsider = 10 ** 9
+
+    bot_message = _message(5, outsider, "Вопрос", **{"from": _user(bot.id, is_bot=True)})
+    updates = [
+        Update.model_validate(
+            {"update_id": 1, "message": _message(10, outsider, "ответ", reply_to_message=bot_message)}
+        ),
+        Update.model_validate(
+            {
+                "update_id": 2,
+                "callback_query": {
+                    "id": "1",
+                    "from": _user(outsider),
+                    "chat_instance": "bench",
+                    "data": ActionData(Action.ACCEPT, Entity.APPLICATION, 1).pack(),
+                    "message": bot_message,
+                },
+            }
+        ),
+        Update.model_validate({"update_id": 3, "message": _message(11, outsider, "/stats")}),
+    ]
+    per_update_us = await _feed(bot, dp, updates, rounds)
+
+    list_us = timeit.timeit(lambda: outsider in admin_ids, number=100000) * 10
+    set_us = timeit.timeit(lambda: outsider in admin_roster, number=100000) * 10
+    return {
+        "updates": rounds * len(updates),
+        "per_update_us": round(per_update_us, 1),
+        "db_queries": queries.count,
+        "api_calls": bot.session.calls,
+        "membership_list_us": round(list_us, 3),
+        "membership_frozenset_us": round(set_us, 3),
+    }
+
+
+_noop_calls = 0
+
+
+async def _noop(*args, **kwargs):
+    global _noop_calls
+    _noop_calls += 1
+
+
+def _fixed_routers():
+    """
+    Команды, ответ администратора и роутер админки — общие для обеих схем.
+    """
+    from aiogram import F, Router
+    from aiogram.filters import Command, CommandStart
+
+    from admin import RejectReason
+    from filters import IsAdmin
+
+    start, commands, replies, admin = Router(), Router(), Router(), Router()
+    start.message(CommandStart())(_noop)
+    commands.message(Command("my"))(_noop)
+    replies.message(IsAdmin(), F.reply_to_message)(_noop)
+    admin.message.filter(IsAdmin())
+    for command in ("stats", "export", "admins"):
+        admin.message(Command(command))(_noop)
+    admin.message(RejectReason.waiting_for_reason)(_noop)
+    return start, commands, replies, admin
+
+
+def _legacy_routers(message_dispatch):
+    """
+    Прежняя схема: у каждого модуля сценария свой роутер, кнопки меню
+    проверяются lambda-фильтрами, состояния — StateFilter, всё по порядку.
+    """
+    from aiogram import Router
+    from aiogram.filters.state import StateFilter
+
+    routers = {}
+    for text, handler in message_dispatch.by_text.items():
+        router = routers.setdefault(handler.__module__, Router())
+        router.message(lambda m, text=text: m.text == text)(_noop)
+    for state, handler in message_dispatch.by_state.items():
+        router = routers.setdefault(handler.__module__, Router())
+        router.message(StateFilter(state))(_noop)
+    return [routers[name] for name in ("handlers.question", "handlers.free_consult", "handlers.paid_consult")]
+
+
+@benchmark
+async def message_dispatch(rounds: int = 300) -> dict:
+    """
+    Стоимость выбора обработчика для сообщений пользователей: кнопки меню,
+    ответы в каждом состоянии Form и сообщения, которые никто не обрабатывает.
+    Обработчики пустые, так что измеряется только проверка фильтров.
+    """
+    from aiogram import Dispatcher, Router
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    import dispatch
+    import main
+
+    for module_name in main.HANDLER_MODULES:
+        importlib.import_module(module_name)
+    bot = _setup_bot()
+    table = dispatch.message_dispatch
+
+    updates, states = [], {}
+    for number, text in enumerate(table.by_text, start=1):
+        updates.append(_message(number, 100, text))
+    for number, state in enumerate(table.by_state, start=200):
+        updates.append(_message(number, number, "Иван"))
+        states[number] = state
+    updates.append(_message(999, 999, "просто текст"))
+    updates = [
+        Update.model_validate({"update_id": number, "message": message})
+        for number, message in enumerate(updates, start=1)
+    ]
+
+    async def measure(routers):
+        global _noop_calls
+        dp = Dispatcher(storage=MemoryStorage())
+        dp.include_routers(*routers)
+        for user_id, state in states.items():
+            await dp.storage.set_state(StorageKey(bot.id, user_id, user_id), state)
+        _noop_calls = 0
+        per_update_us = await _feed(bot, dp, updates, rounds)
+        return per_update_us, _noop_calls
+
+    start, commands, replies, admin = _fixed_routers()
+    question, free, paid = _legacy_routers(table)
+    before_us, before_handled = await measure([start, commands, question, replies, free, paid, admin])
+
+    noop_table = dispatch.MessageDispatch()
+    noop_table.by_text = dict.fromkeys(table.by_text, _noop)
+    noop_table.by_state = dict.fromkeys(table.by_state, _noop)
+    dispatch_router = Router()
+    dispatch_router.message(dispatch.DispatchFilter(noop_table))(_noop)
+    start, commands, replies, admin = _fixed_routers()
+    after_us, after_handled = await measure([start, commands, replies, dispatch_router, admin])
+
+    return {
+        "updates": rounds * len(updates),
+        "menu_texts": len(table.by_text),
+        "states": len(table.by_state),
+        "handled": [before_handled, after_handled],
+        "before_us": round(before_us, 1),
+        "after_us": round(after_us, 1),
+        "speedup": round(before_us / after_us, 2),
+    }
+
+
+class EchoSession(CountingSession):
+    """
+    Сессия бота, которая сразу «доставляет» отправленные сообщения.
+    """
+
+    async def make_request(self, bot, method, timeout=None):
+        from aiogram.types import Message
+
+        self.calls += 1
+        if method.__returning__ is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            text = getattr(method, "text", None) or ""
+            return Message.model_validate(
+                _message(self.calls, chat_id if isinstance(chat_id, int) else 0, text)
+            )
+        return True
+
+
+FREE_CONSULT_STEPS = (
+    "Запросить бесплатную видеоконсультацию",
+    "Иван",
+    "пропустить",
+    "Не могу уснуть",
+    "ivan@example.com",
+    "пропустить",
+)
+
+
+async def _bot_throughput(bot, dp, users: int) -> float:
+    """
+    users пользователей одновременно проходят анкету бесплатной консультации
+    до подтверждения согласия; возвращает обработанных апдейтов в секунду.
+    """
+    counter = iter(range(1, 10 ** 9))
+
+    async def user_flow(user_id: int):
+        for text in FREE_CONSULT_STEPS:
+            number = next(counter)
+            update = Update.model_validate({"update_id": number, "message": _message(number, user_id, text)})
+            await dp.feed_update(bot, update)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_flow(user_id) for user_id in range(10 ** 6, 10 ** 6 + users)))
+    return users * len(FREE_CONSULT_STEPS) / (time.perf_counter() - started)
+
+
+async def _http_throughput(http: str, requests: int, concurrency: int) -> float:
+    """
+    Запросы к GET / у uvicorn, запущенного в том же цикле событий;
+    возвращает ответов в секунду.
+    """
+    import socket
+
+    import aiohttp
+    import uvicorn
+
+    import main
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, http=http, lifespan="off", access_log=False, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async def client(session, count: int):
+        for _ in range(count):
+            async with session.get(url) as response:
+                await response.read()
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await client(session, concurrency)  # прогрев соединений
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session, requests // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    server.should_exit = True
+    await serving
+    sock.close()
+    return requests // concurrency * concurrency / elapsed
+
+
+@benchmark
+def runtime_profiles(users: int = 500, requests: int = 20000, concurrency: int = 50) -> dict:
+    """
+    Пропускная способность бота и HTTP-сервера в профилях RUNTIME_PROFILE:
+    default (asyncio + h11) и fast (uvloop + httptools, если установлены).
+    Каждый профиль работает в собственном цикле событий.
+    """
+    from config import get_settings
+    from runtime import RUNTIME_PROFILES, resolve_runtime
+
+    bot, dp = _setup_dispatcher()
+    bot.session = EchoSession()
+    result = {}
+    for profile in RUNTIME_PROFILES:
+        runtime = resolve_runtime(dataclasses.replace(get_settings(), runtime_profile=profile))
+        if runtime["loop"] == "uvloop":
+            import uvloop
+
+            loop_factory = uvloop.new_event_loop
+        else:
+            loop_factory = asyncio.new_event_loop
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            bot_rate = runner.run(_bot_throughput(bot, dp, users))
+            http_rate = runner.run(_http_throughput(runtime["http"], requests, concurrency))
+        result[profile] = {
+            "loop": runtime["loop"],
+            "http": runtime["http"],
+            "bot_updates_per_s": round(bot_rate),
+            "http_requests_per_s": round(http_rate),
+        }
+    return result
+
+
+@benchmark
+async def group_commit(writes: int = 2000, concurrency: int = 200) -> dict:
+    """
+    Всплеск заявок: concurrency пользователей одновременно отправляют
+    анкеты во временную БД. Сравнивается транзакция на каждую запись
+    (пачка из одной операции) и групповая фиксация с настройками по умолчанию.
+    """
+    import tempfile
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from config import get_settings
+    from database import Base
+    from repository import SQLAlchemyRepository
+
+    data = {
+        "request_type": "Запросить бесплатную видеоконсультацию",
+        "name": "Иван",
+        "description": "Не могу уснуть",
+        "email": "ivan@example.com",
+    }
+
+    async def measure(directory: str, batch_window: float, batch_max: int):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench_{batch_max}.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        repo = SQLAlchemyRepository(engine, batch_window=batch_window, batch_max=batch_max)
+
+        async def user(user_id: int):
+            for _ in range(writes // concurrency):
+                await repo.create_application(user_id, "bench", data)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(user_id) for user_id in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        report = repo.writer.report()
+        await repo.writer.drain(1)
+        await engine.dispose()
+        return report["operations"] / elapsed, report
+
+    settings = get_settings()
+    with tempfile.TemporaryDirectory() as directory:
+        single_rate, _ = await measure(directory, 0, 1)
+        batched_rate, report = await measure(
+            directory, settings.write_batch_window_ms / 1000, settings.write_batch_max
+        )
+    return {
+        "writes": writes // concurrency * concurrency,
+        "concurrency": concurrency,
+        "per_write_tx_per_s": round(single_rate),
+        "group_commit_per_s": round(batched_rate),
+        "avg_batch": report["avg_batch"],
+        "speedup": round(batched_rate / single_rate, 2),
+    }
+
+
+@benchmark
+def question_index(questions: int = 5000, length: int = 550, lookups: int = 500) -> dict:
+    """
+    Память индекса дубликатов на questions вопросах длиной около length
+    символов и время поиска похожих для вопроса такой же длины и для 4 КБ.
+    Отдельно показано время сигнатуры нового вопроса: оно растёт с длиной
+    текста, а обращение к индексу от длины и размера архива не зависит.
+    """
+    import random
+    import tracemalloc
+
+    from dedup import QuestionIndex, minhash, shingles
+
+    rng = random.Random(0)
+    letters = "абвгдежзиклмнопрстуфхцчшщэюя"
+    vocabulary = ["".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(3000)]
+
+    def text(size: int) -> str:
+        words = []
+        while sum(map(len, words)) + len(words) < size:
+            words.append(rng.choice(vocabulary))
+        return " ".join(words)
+
+    texts = [text(length) for _ in range(questions)]
+    tracemalloc.start()
+    index = QuestionIndex()
+    for question_id, question_text in enumerate(texts, 1):
+        index.add(question_id, question_text)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {"questions": questions, "memory_mb": round(memory / 2 ** 20, 2)}
+    cases = {
+        f"new_{length}_chars": [text(length) for _ in range(lookups)],
+        "new_4096_chars": [text(4096) for _ in range(lookups)],
+        # Почти-дубликаты: известный вопрос со вставленным словом
+        f"duplicate_{length}_chars": [
+            texts[rng.randrange(questions)].replace(" ", " " + rng.choice(vocabulary) + " ", 1)
+            for _ in range(lookups)
+        ],
+    }
+    for name, queries in cases.items():
+        lookup = timeit.timeit(lambda: [index.find_similar(query) for query in queries], number=1)
+        signature = timeit.timeit(lambda: [minhash(shingles(query)) for query in queries], number=1)
+        result[name] = {
+            "lookup_ms": round(lookup / lookups * 1000, 3),
+            "signature_ms": round(signature / lookups * 1000, 3),
+            "found": sum(bool(index.find_similar(query)) for query in queries),
+        }
+    return result
+
+
+@benchmark
+def topic_classifier(samples: int = 5000, questions: int = 2000) -> dict:
+    """
+    Обучение классификатора тем на синтетических вопросах (несколько
+    слов-затравок темы вперемешку с общими словами) и классификация
+    отложенной выборки: время на вопрос и доля верных тем.
+    """
+    import random
+
+    from topics import TOPICS, NaiveBayesModel, TopicClassifier
+
+    filler = (
+        "здравствуйте подскажите пожалуйста давно последнее время понимаю "
+        "хочется делать ситуация помогите спасибо человек вообще сильно"
+    ).split()
+    rng = random.Random(0)
+
+    def question():
+        topic = rng.choice(list(TOPICS))
+        seeds = TOPICS[topic][1].split()
+        words = rng.sample(seeds, 2) + rng.sample(filler, rng.randint(3, 8))
+        rng.shuffle(words)
+        return " ".join(words), topic
+
+    train = [question() for _ in range(samples)]
+    held_out = [question() for _ in range(questions)]
+
+    started = time.perf_counter()
+    classifier = TopicClassifier()
+    classifier.model = NaiveBayesModel.fit(train)
+    fit_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    predicted = [classifier.classify(text) for text, _ in held_out]
+    elapsed = time.perf_counter() - started
+    return {
+        "samples": samples,
+        "vocabulary": len(classifier.model.log_probs),
+        "fit_ms": round(fit_ms, 1),
+        "classify_us": round(elapsed / questions * 1e6, 1),
+        "rescore_per_s": round(questions / elapsed),
+        "accuracy": round(
+            sum(topic == expected for (topic, _), (_, expected) in zip(predicted, held_out)) / questions, 3
+        ),
+        "unrouted": sum(topic is None for topic, _ in predicted),
+    }
+
+
+@benchmark
+def crisis_matcher(lengths=(500, 4096, 100_000), lexicon_sizes=(0, 1000), rounds: int = 20) -> dict:
+    """
+    Поиск кризисных фраз в длинных текстах: автомат Ахо — Корасик
+    против регулярного выражения с альтернацией всех вариантов словаря,
+    со встроенным словарём и словарём, дополненным случайными фразами.
+    Фраза из словаря стоит в самом конце текста, чтобы просмотр был полным.
+    """
+    import random
+    import re
+
+    from crisis import DEFAULT_LEXICON, CrisisMatcher
+    from dedup import normalize_text
+
+    words = (
+        "здравствуйте последнее время мне тяжело сосредоточиться на работе "
+        "плохо сплю часто ссоримся с мужем и я не понимаю что делать дальше"
+    ).split()
+    rng = random.Random(0)
+    letters = "абвгдежзиклмнопрстуфхцчшщэюя"
+
+    result = {}
+    for extra in lexicon_sizes:
+        lexicon = DEFAULT_LEXICON + tuple(
+            "".join(rng.choices(letters, k=rng.randint(5, 9))) + rng.choice(("*", " " + rng.choice(words)))
+            for _ in range(extra)
+        )
+        matcher = CrisisMatcher(lexicon)
+        pattern = re.compile("|".join(re.escape(variant) for variant in matcher.variants))
+
+        def regex_scan(text: str):
+            # findall не находит фразы, делящие обрамляющий пробел с предыдущей
+            # находкой, так что для сравнения скорости это нижняя оценка работы
+            return set(pattern.findall(f" {normalize_text(text)} "))
+
+        rows = {"variants": len(matcher.variants), "states": len(matcher.transitions)}
+        for length in lengths:
+            text = (" ".join(words) + " ") * (length // 120 + 1)
+            text = text[:length] + " не хочу жить"
+            assert matcher.scan(text) and regex_scan(text)
+            automaton_ms = timeit.timeit(lambda: matcher.scan(text), number=rounds) / rounds * 1000
+            regex_ms = timeit.timeit(lambda: regex_scan(text), number=rounds) / rounds * 1000
+            rows[f"{length}_chars"] = {
+                "automaton_ms": round(automaton_ms, 3),
+                "regex_ms": round(regex_ms, 3),
+                "automaton_mb_per_s": round(len(text.encode()) / automaton_ms / 1000, 1),
+            }
+        result[f"lexicon_{len(lexicon)}"] = rows
+    result["normalize_100000_chars_ms"] = round(
+        timeit.timeit(lambda: normalize_text(text), number=rounds) / rounds * 1000, 3
+    )
+    return result
+
+def run(names):
+    for name in names:
+        func = BENCHMARKS[name]
+        result = asyncio.run(func()) if asyncio.iscoroutinefunction(func) else func()
+        print(name, result)
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"Неизвестные бенчмарки: {', '.join(unknown)}. Доступны: {', '.join(BENCHMARKS)}")
+    run(selected)
@@ -0,0 +1,124 @@
+import base64
+import binascii
+import struct
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, InlineKeyboardButton
+
+CALLBACK_VERSION = 1
+CALLBACK_PREFIX = "~"
+
+# версия, действие, тип записи, id записи, страница — 9 байт, 13 символов в callback_data
+_LAYOUT = struct.Struct(">BBBIH")
+
+
+class Action(IntEnum):
+    ACCEPT = 1
+    REJECT = 2
+
+
+class Entity(IntEnum):
+    APPLICATION = 1
+    QUESTION = 2
+
+
+# Кнопки в уже отправленных уведомлениях: accept_<id> / reject_<id>
+_LEGACY_ACTIONS = {
+    "accept": (Action.ACCEPT, Entity.APPLICATION),
+    "reject": (Action.REJECT, Entity.APPLICATION),
+}
+
+
+@dataclass(frozen=True)
+class ActionData:
+    """
+    Данные inline-кнопки в компактном двоичном виде вместо строк вида accept_<id>.
+    Поле page зарезервировано для постраничных клавиатур.
+    """
+
+    action: Action
+    entity: Entity
+    entity_id: int
+    page: int = 0
+
+    def pack(self) -> str:
+        raw = _LAYOUT.pack(CALLBACK_VERSION, self.action, self.entity, self.entity_id, self.page)
+        return CALLBACK_PREFIX + base64.urlsafe_b64encode(raw).decode()
+
+    @classmethod
+    def unpack(cls, data: str) -> Optional["ActionData"]:
+        """
+        Разбирает callback_data. Возвращает None для чужих, повреждённых
+        и устаревших (другой версии) данных.
+        """
+        if not data:
+            return None
+        if data[0] != CALLBACK_PREFIX:
+            return cls._unpack_legacy(data)
+        try:
+            version, action, entity, entity_id, page = _LAYOUT.unpack(
+                base64.urlsafe_b64decode(data[1:])
+            )
+            if version != CALLBACK_VERSION:
+                return None
+            return cls(Action(action), Entity(entity), entity_id, page)
+        except (binascii.Error, struct.error, ValueError):
+            return None
+
+    @classmethod
+    def _unpack_legacy(cls, data: str) -> Optional["ActionData"]:
+        name, _, entity_id = data.partition("_")
+        if name not in _LEGACY_ACTIONS or not entity_id.isdigit():
+            return None
+        action, entity = _LEGACY_ACTIONS[name]
+        return cls(action, entity, int(entity_id))
+
+
+def action_button(text: str, action: Action, entity: Entity, entity_id: int, page: int = 0):
+    return InlineKeyboardButton(
+        text=text, callback_data=ActionData(action, entity, entity_id, page).pack()
+    )
+
+
+ActionHandler = Callable[..., Awaitable]
+
+
+class ActionRegistry:
+    """
+    Обработчики inline-кнопок по коду действия. callback_data разбирается
+    один раз, а обработчик выбирается поиском в словаре, а не перебором
+    фильтров по префиксам строк.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[Action, ActionHandler] = {}
+
+    def register(self, action: Action):
+        def decorator(handler: ActionHandler) -> ActionHandler:
+            self._handlers[action] = handler
+            return handler
+
+        return decorator
+
+    def filter(self) -> "ActionFilter":
+        return ActionFilter(self)
+
+    def get(self, action: Action) -> Optional[ActionHandler]:
+        return self._handlers.get(action)
+
+
+class ActionFilter(BaseFilter):
+    def __init__(self, registry: ActionRegistry):
+        self.registry = registry
+
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, dict]:
+        action_data = ActionData.unpack(callback.data)
+        if action_data is None:
+            return False
+        handler = self.registry.get(action_data.action)
+        if handler is None:
+            return False
+        return {"action_data": action_data, "action_handler": handler}
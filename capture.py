@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+from aiogram.types import ReplyKeyboardMarkup
+
+from callbacks import ActionData
+from logger import error_logger, logger
+
+CAPTURE_VERSION = 1
+
+# Ответы, по которым сценарии выбирают ветку; они не персональные и
+# сохраняются как есть, иначе при воспроизведении анкеты пойдут по другому пути.
+CONTROL_WORDS = frozenset(
+    ["да", "нет", "пропустить", "skip", "не хочу", "согласен", "не согласен"]
+)
+ID_PARENTS = frozenset(["from", "chat", "user", "sender_chat", "forward_from", "sender_user"])
+ID_KEYS = frozenset(["user_id", "chat_id"])
+NAME_KEYS = frozenset(
+    ["first_name", "last_name", "username", "title", "phone_number", "address", "file_name"]
+)
+TEXT_KEYS = frozenset(["text", "caption", "query"])
+# Ссылки (text_link, кнопки-ссылки), vCard контакта и id мест в картографических
+# сервисах сценариям не нужны, а псевдонимом их не заменить
+DROP_KEYS = frozenset(["url", "vcard", "foursquare_id", "google_place_id"])
+COORDINATE_KEYS = frozenset(["latitude", "longitude"])
+# Данные inline-кнопок: свои (действие и номер записи) нужны для маршрутизации
+# при воспроизведении, остальные обезличиваются как текст
+CALLBACK_KEYS = frozenset(["data", "callback_data"])
+
+_WORD = re.compile(r"\w+")
+_ALPHABETS = (
+    "abcdefghijklmnopqrstuvwxyz",
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "абвгдежзийклмнопрстуфхцчшщыэюя",
+    "АБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЫЭЮЯ",
+    "0123456789",
+)
+
+
+def keyboard_texts(modules: Iterable) -> frozenset:
+    """
+    Тексты кнопок всех reply-клавиатур, объявленных в модулях.
+    """
+    texts = set()
+    for module in modules:
+        for value in vars(module).values():
+            if isinstance(value, ReplyKeyboardMarkup):
+                texts.update(button.text for row in value.keyboard for button in row)
+    return frozenset(texts)
+
+
+class Anonymizer:
+    """
+    Заменяет идентификаторы и тексты пользователей псевдонимами.
+    Замена детерминирована в пределах одной записи (одинаковые слова и id
+    дают одинаковые псевдонимы, длина и алфавит слов сохраняются), а соль
+    случайна и нигде не сохраняется, поэтому замену не обратить.
+    """
+
+    def __init__(self, keep_texts: Iterable[str] = (), salt: bytes = None):
+        self.salt = salt or os.urandom(16)
+        self.keep_texts = frozenset(keep_texts)
+
+    def user_id(self, value: int) -> int:
+        digest = hashlib.blake2b(str(abs(value)).encode(), key=self.salt, digest_size=4).digest()
+        pseudonym = 10 ** 9 + int.from_bytes(digest, "big")
+        return -pseudonym if value < 0 else pseudonym
+
+    def word(self, word: str) -> str:
+        digest = hashlib.shake_256(self.salt + word.encode()).digest(len(word))
+        chars = []
+        for char, byte in zip(word, digest):
+            for alphabet in _ALPHABETS:
+                if char in alphabet:
+                    char = alphabet[byte % len(alphabet)]
+                    break
+            chars.append(char)
+        return "".join(chars)
+
+    def _free_word(self, match) -> str:
+        word = match.group()
+        if word.isdigit():
+            # Телефон +79XXXXXXXXX должен остаться телефоном: первые цифры не трогаем
+            return word[:2] + self.word(word[2:])
+        return self.word(word)
+
+    def text(self, text: str) -> str:
+        if text in self.keep_texts or text.strip().lower() in CONTROL_WORDS:
+            return text
+        if text.startswith("/"):
+            # Команда и латинские подкоманды (/admins add) нужны для маршрутизации,
+            # числа в аргументах — это id пользователей
+            command, *args = text.split(" ")
+            return " ".join(
+                [command]
+                + [
+                    str(self.user_id(int(arg))) if arg.lstrip("-").isdigit()
+                    else arg if arg.isascii() and arg.isalpha()
+                    else _WORD.sub(self._free_word, arg)
+                    for arg in args
+                ]
+            )
+        return _WORD.sub(self._free_word, text)
+
+    def callback_data(self, data: str) -> str:
+        if ActionData.unpack(data) is not None:
+            return data
+        return _WORD.sub(self._free_word, data)
+
+    def update(self, value, parent: str = None):
+        if isinstance(value, list):
+            return [self.update(item, parent) for item in value]
+        if not isinstance(value, dict):
+            return value
+        is_bot = value.get("is_bot", False)
+        result = {}
+        for key, item in value.items():
+            if key in DROP_KEYS:
+                continue
+            if key == "id" and parent in ID_PARENTS and not is_bot:
+                item = self.user_id(item)
+            elif key in ID_KEYS and isinstance(item, int):
+                item = self.user_id(item)
+            elif key in NAME_KEYS and isinstance(item, str) and not is_bot:
+                item = _WORD.sub(lambda match: self.word(match.group()), item)
+            elif key in TEXT_KEYS and isinstance(item, str):
+                item = self.text(item)
+            elif key in COORDINATE_KEYS and isinstance(item, (int, float)):
+                item = 0.0
+            elif key in CALLBACK_KEYS and isinstance(item, str):
+                item = self.callback_data(item)
+            else:
+                item = self.update(item, key)
+            result[key] = item
+        return result
+
+
+class UpdateCapture:
+    """
+    Внешний middleware aiogram, который пишет обезличенные апдейты
+    в сжатый JSONL-файл для последующего воспроизведения replay.py.
+    Первая строка — заголовок с id бота и псевдонимами администраторов
+    и группы, дальше по строке на апдейт со смещением от начала записи.
+    """
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.recorded = 0
+        self.failed = 0
+        self._anonymizer: Optional[Anonymizer] = None
+        self._file = None
+        self._started = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def open(self, path: str, bot_id: int, admin_ids: Iterable[int], group_id: int, keep_texts=()):
+        """
+        Начинает запись. Существующий файл не дописывается (у новой записи
+        другие псевдонимы), а к имени нового добавляется время запуска.
+        """
+        if os.path.exists(path):
+            directory, name = os.path.split(path)
+            base, dot, extension = name.partition(".")
+            path = os.path.join(directory, f"{base}-{time.strftime('%Y%m%d-%H%M%S')}{dot}{extension}")
+        self.path = path
+        self._anonymizer = Anonymizer(keep_texts)
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._started = time.monotonic()
+        self._write(
+            {
+                "capture": CAPTURE_VERSION,
+                "started_at": time.time(),
+                "bot_id": bot_id,
+                "admins": [self._anonymizer.user_id(admin_id) for admin_id in admin_ids],
+                "group_id": self._anonymizer.user_id(group_id) if group_id else 0,
+            }
+        )
+        logger.info(f"Запись апдейтов включена: {path}")
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    async def __call__(self, handler, event, data):
+        if self._file is not None:
+            try:
+                self._write(
+                    {
+                        "t": round(time.monotonic() - self._started, 4),
+                        "update": self._anonymizer.update(
+                            event.model_dump(mode="json", exclude_none=True, by_alias=True)
+                        ),
+                    }
+                )
+                self.recorded += 1
+            except Exception as e:
+                self.failed += 1
+                error_logger.error(f"Не удалось записать апдейт {event.update_id}: {e}")
+        return await handler(event, data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"Запись апдейтов завершена: {self.recorded} в {self.path}")
+
+    def report(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "recorded": self.recorded,
+            "failed": self.failed,
+        }
+
+
+def read_capture(path: str) -> Tuple[dict, Iterator[Tuple[float, dict]]]:
+    """
+    Возвращает заголовок записи и итератор (смещение, апдейт).
+    Оборванный хвост (процесс был убит) молча отбрасывается.
+    """
+    capture_file = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(capture_file.readline())
+    if header.get("capture") != CAPTURE_VERSION:
+        capture_file.close()
+        raise ValueError(f"{path}: неизвестная версия записи {header.get('capture')}")
+
+    def records():
+        with capture_file:
+            try:
+                for line in capture_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        return
+                    yield record["t"], record["update"]
+            except (EOFError, gzip.BadGzipFile):
+                return
+
+    return header, records()
+
+
+update_capture = UpdateCapture()
@@ -1,13 +1,146 @@
 import os
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import List, Tuple
 
 from dotenv import load_dotenv
 
-load_dotenv()
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-admin_ids_str = os.getenv("ADMIN_CHAT_IDS", "")
-ADMIN_CHAT_IDS = [int(x) for x in admin_ids_str.split(",") if x.strip().isdigit()]
-GROUP_ID = int(os.getenv("GROUP_ID", 0))
+def _split_env(name: str, default: str = "") -> List[str]:
+    return [x.strip() for x in os.getenv(name, default).split(",") if x.strip()]
 
-if not all([BOT_TOKEN, ADMIN_CHAT_IDS, GROUP_ID]):
-    raise ValueError("Не все обязательные переменные окружения установлены")
+
+@dataclass(frozen=True)
+class Settings:
+    bot_token: str
+    admin_chat_ids: Tuple[int, ...]
+    group_id: int
+    api_token: str = ""
+    shutdown_timeout: float = 25
+    roster_refresh_seconds: float = 30
+    admin_sync_rate: float = 20
+
+    bot_http_limit: int = 100
+    bot_http_keepalive: float = 60
+    bot_dns_cache_ttl: int = 3600
+    bot_request_timeout: float = 60
+    bot_method_timeouts: Tuple[Tuple[str, float], ...] = (
+        ("sendMessage", 15),
+        ("editMessageText", 15),
+        ("answerCallbackQuery", 10),
+        ("sendDocument", 120),
+    )
+    bot_json: str = "auto"
+
+    write_batch_window_ms: float = 2
+    write_batch_max: int = 100
+
+    capture_updates: str = ""
+    crisis_lexicon_file: str = ""
+    trace_sample_rate: float = 0.05
+    trace_slow_ms: float = 1000
+    trace_buffer: int = 200
+    trace_file: str = ""
+
+    runtime_profile: str = "default"
+    web_workers: int = 1
+    web_backlog: int = 2048
+
+    loop_watchdog_interval_ms: int = 100
+    loop_lag_threshold_ms: int = 500
+
+    retention_days: int = 0
+    retention_interval_hours: float = 24
+    retention_batch_size: int = 500
+    retention_redact_fields: Tuple[str, ...] = (
+        "username",
+        "name",
+        "phone",
+        "email",
+        "tg_account",
+    )
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Читает настройки из переменных окружения и проверяет обязательные.
+        """
+        group_id = os.getenv("GROUP_ID", "0")
+        settings = cls(
+            bot_token=os.getenv("BOT_TOKEN", ""),
+            admin_chat_ids=tuple(
+                int(x) for x in _split_env("ADMIN_CHAT_IDS") if x.isdigit()
+            ),
+            group_id=int(group_id) if group_id.lstrip("-").isdigit() else 0,
+            api_token=os.getenv("API_TOKEN", ""),
+            shutdown_timeout=float(os.getenv("SHUTDOWN_TIMEOUT", 25)),
+            roster_refresh_seconds=float(os.getenv("ROSTER_REFRESH_SECONDS", 30)),
+            admin_sync_rate=float(os.getenv("ADMIN_SYNC_RATE", 20)),
+            bot_http_limit=int(os.getenv("BOT_HTTP_LIMIT", 100)),
+            bot_http_keepalive=float(os.getenv("BOT_HTTP_KEEPALIVE", 60)),
+            bot_dns_cache_ttl=int(os.getenv("BOT_DNS_CACHE_TTL", 3600)),
+            bot_request_timeout=float(os.getenv("BOT_REQUEST_TIMEOUT", 60)),
+            bot_method_timeouts=tuple(
+                (method, float(seconds))
+                for method, _, seconds in (
+                    item.partition("=")
+                    for item in _split_env(
+                        "BOT_METHOD_TIMEOUTS",
+                        "sendMessage=15,editMessageText=15,answerCallbackQuery=10,sendDocument=120",
+                    )
+                )
+            ),
+            bot_json=os.getenv("BOT_JSON", "auto"),
+            write_batch_window_ms=float(os.getenv("WRITE_BATCH_WINDOW_MS", 2)),
+            write_batch_max=int(os.getenv("WRITE_BATCH_MAX", 100)),
+            capture_updates=os.getenv("CAPTURE_UPDATES", ""),
+            crisis_lexicon_file=os.getenv("CRISIS_LEXICON_FILE", ""),
+            trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 0.05)),
+            trace_slow_ms=float(os.getenv("TRACE_SLOW_MS", 1000)),
+            trace_buffer=int(os.getenv("TRACE_BUFFER", 200)),
+            trace_file=os.getenv("TRACE_FILE", ""),
+            runtime_profile=os.getenv("RUNTIME_PROFILE", "default"),
+            web_workers=int(os.getenv("WEB_WORKERS", 1)),
+            web_backlog=int(os.getenv("WEB_BACKLOG", 2048)),
+            loop_watchdog_interval_ms=int(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", 100)),
+            loop_lag_threshold_ms=int(os.getenv("LOOP_LAG_THRESHOLD_MS", 500)),
+            retention_days=int(os.getenv("RETENTION_DAYS", 0)),
+            retention_interval_hours=float(os.getenv("RETENTION_INTERVAL_HOURS", 24)),
+            retention_batch_size=int(os.getenv("RETENTION_BATCH_SIZE", 500)),
+            retention_redact_fields=tuple(
+                _split_env(
+                    "RETENTION_REDACT_FIELDS", "username,name,phone,email,tg_account"
+                )
+            ),
+        )
+
+        missing = [
+            name
+            for name, value in (
+                ("BOT_TOKEN", settings.bot_token),
+                ("ADMIN_CHAT_IDS", settings.admin_chat_ids),
+                ("GROUP_ID", settings.group_id),
+            )
+            if not value
+        ]
+        if missing:
+            raise ValueError(
+                f"Не все обязательные переменные окружения установлены: {', '.join(missing)}"
+            )
+        return settings
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    load_dotenv()
+    return Settings.from_env()
+
+
+_SETTINGS_FIELDS = {field.name.upper() for field in fields(Settings)}
+
+
+def __getattr__(name: str):
+    if name in _SETTINGS_FIELDS:
+        value = getattr(get_settings(), name.lower())
+        return list(value) if isinstance(value, tuple) else value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,184 @@
+import itertools
+import re
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from dedup import normalize_text
+from logger import logger
+
+# Фразы, указывающие на острый риск. Записываются в нормализованном виде
+# (строчные, «ё» -> «е», без пунктуации). Варианты окончаний перечисляются
+# в фигурных скобках, «*» в конце фразы — любое окончание последнего слова.
+DEFAULT_LEXICON = (
+    "суицид*",
+    "самоубийств*",
+    "предсмертн*",
+    "поконч{ить,у,ила,ил,им} с собой",
+    "св{ести,еду,ела,ел} сч{еты,ет} с жизнью",
+    "уб{ить,ью,ила,ил} себя",
+    "себя уб{ить,ью}",
+    "{не хочу,не хочется,незачем,нет смысла,не могу больше,устал,устала} жить",
+    "жить не {хочу,хочется,хотелось}",
+    "{хочу,хочется} {умереть,исчезнуть,не проснуться}",
+    "лучше бы я умер*",
+    "лучше умереть",
+    "пов{еситься,ешусь,есилась,есился}",
+    "вскр{ыть,ою,ыла,ыл} {вены,себе вены}",
+    "наглота{ться,юсь,лась,лся} таблеток",
+    "{выпрыгн,спрыгн,прыгн}{уть,у} {из окна,с крыши,с моста}",
+    "{режу,резать,порезать,порезала,порезал} себя",
+    "селфхарм*",
+    "самоповрежд*",
+    "{бьет,избивает,избил,избила} меня",
+    "меня {бьет,избивает,избил,избила}",
+    "изнасил*",
+    "угрожа{ет,л,ла} {убить,убийством}",
+)
+
+CRISIS_REPLY = (
+    "💛 Похоже, вам сейчас очень тяжело. Вы не одни, и помощь доступна прямо "
+    "сейчас — бесплатно и анонимно:\n\n"
+    "📞 <b>112</b> — экстренные службы, если есть угроза жизни\n"
+    "📞 <b>8-800-2000-122</b> — телефон доверия для детей, подростков и родителей (круглосуточно)\n"
+    "📞 <b>8-495-989-50-50</b> — экстренная психологическая помощь МЧС (круглосуточно)\n\n"
+    "Ваше обращение будет отмечено как срочное, психологи увидят его в первую очередь."
+)
+
+_ALTERNATIVES = re.compile(r"\{([^{}]*)\}")
+
+
+def expand(entry: str) -> List[str]:
+    """
+    Все варианты фразы словаря: «поконч{ить,у} с собой» ->
+    [«покончить с собой», «покончу с собой»].
+    """
+    parts = _ALTERNATIVES.split(entry)
+    # Нечётные элементы split — содержимое скобок
+    choices = [part.split(",") if i % 2 else [part] for i, part in enumerate(parts)]
+    return ["".join(variant) for variant in itertools.product(*choices)]
+
+
+def load_lexicon(path: str = "") -> Tuple[str, ...]:
+    """
+    Словарь из файла (по фразе на строку, # — комментарий) или встроенный.
+    """
+    if not path:
+        return DEFAULT_LEXICON
+    with open(path, encoding="utf-8") as lexicon_file:
+        return tuple(
+            line.strip() for line in lexicon_file if line.strip() and not line.lstrip().startswith("#")
+        )
+
+
+class CrisisMatcher:
+    """
+    Поиск фраз кризисного словаря автоматом Ахо — Корасик: текст
+    просматривается за один проход независимо от размера словаря.
+    Текст и фразы обрамляются пробелами, поэтому фраза совпадает только
+    с целыми словами, а фраза с «*» — с началом слова.
+
+    Переходы автомата достроены до полной таблицы (переход из состояния
+    по символу без своего ребра заранее взят у состояния-суффикса), так что
+    на символ текста приходится один поиск в словаре.
+    """
+
+    def __init__(self, lexicon: Iterable[str] = DEFAULT_LEXICON):
+        self.scanned = 0
+        self.matched = 0
+        self.scan_seconds = 0.0
+        self.load(lexicon)
+
+    def load(self, lexicon: Iterable[str]):
+        """
+        Перестраивает автомат под новый словарь. Если в словаре есть
+        некорректная фраза, бросает ValueError и оставляет прежний автомат.
+        """
+        lexicon = tuple(lexicon)
+        variants: List[str] = []
+        for entry in lexicon:
+            for variant in expand(entry):
+                prefix = variant.endswith("*")
+                words = normalize_text(variant.rstrip("*"))
+                if not words or "*" in variant.rstrip("*"):
+                    raise ValueError(f"Кризисный словарь: некорректная фраза «{entry}»")
+                variants.append(f" {words}" if prefix else f" {words} ")
+        variants = tuple(dict.fromkeys(variants))
+        self.transitions, self.outputs = self._build(variants)
+        self.lexicon, self.variants = lexicon, variants
+
+    def load_file(self, path: str):
+        """
+        Загружает словарь из CRISIS_LEXICON_FILE. Если файл не читается, пуст
+        или содержит некорректную фразу, используется встроенный словарь.
+        """
+        try:
+            lexicon = load_lexicon(path)
+            if not lexicon:
+                raise ValueError("словарь пуст")
+            self.load(lexicon)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Кризисный словарь {path} не загружен ({e}), используется встроенный")
+            self.load(DEFAULT_LEXICON)
+            return
+        if path:
+            logger.info(f"Кризисный словарь загружен из {path}: {len(lexicon)} фраз")
+
+    @staticmethod
+    def _build(variants: Tuple[str, ...]) -> Tuple[List[Dict[str, int]], List[Tuple[int, ...]]]:
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[int, ...]] = [()]
+        for index, variant in enumerate(variants):
+            state = 0
+            for char in variant:
+                if char not in goto[state]:
+                    goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append(())
+                state = goto[state][char]
+            outputs[state] += (index,)
+
+        fail = [0] * len(goto)
+        transitions: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # Состояние-суффикс ближе к корню и уже достроено (обход в ширину)
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            outputs[state] += outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = transitions[fail[state]].get(char, 0)
+                queue.append(child)
+
+        return transitions, outputs
+
+    def scan(self, text: str) -> List[str]:
+        """
+        Найденные фразы (без обрамляющих пробелов) в порядке появления.
+        """
+        started = time.perf_counter()
+        transitions = self.transitions
+        outputs = self.outputs
+        found: Dict[int, None] = {}
+        state = 0
+        for char in f" {normalize_text(text)} ":
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(dict.fromkeys(outputs[state]))
+        self.scanned += 1
+        self.matched += bool(found)
+        self.scan_seconds += time.perf_counter() - started
+        return [self.variants[index].strip() for index in found]
+
+    def report(self) -> dict:
+        return {
+            "lexicon": len(self.lexicon),
+            "variants": len(self.variants),
+            "states": len(self.transitions),
+            "scanned": self.scanned,
+            "matched": self.matched,
+            "avg_scan_us": round(self.scan_seconds / self.scanned * 1e6, 1) if self.scanned else 0.0,
+        }
+
+
+crisis_matcher = CrisisMatcher()
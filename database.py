@@ -1,14 +1,37 @@
 import datetime
+import json
 import os
 from datetime import timezone
 
-from sqlalchemy import JSON, Column, DateTime, Integer, String, Text, func, select
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    MetaData,
+    Date,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    inspect,
+    literal,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "bot_data.db")
+# Пути можно переопределить, например, чтобы прогнать replay.py на копии БД
+DATABASE_PATH = os.getenv("DATABASE_PATH") or os.path.join(BASE_DIR, "bot_data.db")
 DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+ARCHIVE_DATABASE_PATH = os.getenv("ARCHIVE_DATABASE_PATH") or os.path.join(
+    BASE_DIR, "bot_archive.db"
+)
+ARCHIVE_DATABASE_URL = f"sqlite+aiosqlite:///{ARCHIVE_DATABASE_PATH}"
 
 engine = create_async_engine(DATABASE_URL, echo=False)
 AsyncSessionLocal = async_sessionmaker(
@@ -16,9 +39,13 @@ AsyncSessionLocal = async_sessionmaker(
 )
 Base = declarative_base()
 
+archive_engine = create_async_engine(ARCHIVE_DATABASE_URL, echo=False)
+archive_metadata = MetaData()
+
 
 class Application(Base):
     __tablename__ = "applications"
+    __table_args__ = (Index("ix_applications_user_created", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -31,6 +58,8 @@ class Application(Base):
     tg_account = Column(String(100))
     status = Column(String(20), default="новая")
     admin_comment = Column(Text, nullable=True)
+    # Признаки острого кризиса в описании (crisis.py)
+    priority = Column(Boolean, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
     updated_at = Column(
         DateTime,
@@ -41,6 +70,7 @@ class Application(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (Index("ix_questions_user_created", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -48,92 +78,254 @@ class Question(Base):
     admin_message_id = Column(Integer, nullable=True)
     admin_messages = Column(JSON, nullable=True, default=[])
     status = Column(String(20), default="ожидает")
+    topic = Column(String(30), nullable=True, index=True)
+    topic_by_admin = Column(Boolean, nullable=True)
+    priority = Column(Boolean, nullable=True)
     answer_text = Column(Text, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
     answered_at = Column(DateTime, nullable=True)
 
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+archived_applications = Application.__table__.to_metadata(archive_metadata)
+archived_questions = Question.__table__.to_metadata(archive_metadata)
 
+QUESTION_REQUEST_TYPE = "Задать вопрос психологу"
 
-async def get_next_question_id():
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(func.max(Question.id)))
-        max_id = result.scalar()
-        return (max_id or 0) + 1
 
+class DailyStat(Base):
+    __tablename__ = "stats_daily"
 
-async def create_question(
-    user_id: int, question_text: str, admin_message_id: int = None
-):
-    async with AsyncSessionLocal() as session:
-        question = Question(
-            user_id=user_id,
-            question_text=question_text,
-            admin_message_id=admin_message_id,
-            status="ожидает",
-        )
-        session.add(question)
-        await session.commit()
-        await session.refresh(question)
-        return question.id
+    day = Column(Date, primary_key=True)
+    entity = Column(String(20), primary_key=True)
+    request_type = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
 
 
-async def get_question_by_id(question_id: int):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Question).where(Question.id == question_id)
-        )
-        return result.scalar_one_or_none()
+class ResponseTimeStat(Base):
+    __tablename__ = "stats_response_time"
 
+    day = Column(Date, primary_key=True)
+    entity = Column(String(20), primary_key=True)
+    request_type = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    samples = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0.0)
+    max_seconds = Column(Float, nullable=False, default=0.0)
 
-async def get_question_by_admin_message(admin_message_id: int):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Question).where(Question.admin_message_id == admin_message_id)
-        )
-        return result.scalar_one_or_none()
 
+class AuditEvent(Base):
+    __tablename__ = "audit_events"
+    __table_args__ = (Index("ix_audit_events_entity", "entity_type", "entity_id"),)
 
-async def update_question_answer(question_id: int, answer_text: str, status: str = "отвечен"):
-    async with AsyncSessionLocal() as session:
-        question = await session.get(Question, question_id)
-        if question:
-            question.answer_text = answer_text
-            question.status = status
-            await session.commit()
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+    actor_id = Column(Integer, nullable=True)
+    action = Column(String(50), nullable=False)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=True)
+    payload = Column(JSON, nullable=True)
 
 
-async def get_pending_questions_count():
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(func.count(Question.id)).where(Question.status == "ожидает")
-        )
-        return result.scalar()
+class AnswerDraft(Base):
+    __tablename__ = "answer_drafts"
+    __table_args__ = (
+        Index("ix_answer_drafts_question_admin", "question_id", "admin_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    question_id = Column(Integer, nullable=False)
+    admin_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class AdminMessage(Base):
+    __tablename__ = "admin_messages"
+    __table_args__ = (
+        Index("ux_admin_messages_chat_message", "chat_id", "message_id", unique=True),
+        Index("ix_admin_messages_entity", "entity_type", "entity_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    chat_id = Column(Integer, nullable=False)
+    message_id = Column(Integer, nullable=False)
+
 
+class Admin(Base):
+    __tablename__ = "admins"
 
-async def get_application_by_id(app_id: int):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Application).where(Application.id == app_id)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, unique=True)
+    added_by = Column(Integer, nullable=True)
+    # Ключи тем через запятую; пусто — администратор получает все вопросы
+    topics = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(timezone.utc))
+
+
+class BotSetting(Base):
+    __tablename__ = "bot_settings"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.datetime.now(timezone.utc),
+        onupdate=lambda: datetime.datetime.now(timezone.utc),
+    )
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _rebuild_stats(conn):
+    """
+    Однократно заполняет агрегаты по уже накопленной истории заявок и вопросов.
+    """
+    for model, entity in ((Application, "application"), (Question, "question")):
+        if model is Application:
+            # NULL и «» — один тип: иначе в агрегатах будут две строки с одним ключом
+            request_type = func.coalesce(model.request_type, "")
+            group_by = [request_type]
+        else:
+            request_type, group_by = literal(QUESTION_REQUEST_TYPE), []
+        created = await conn.execute(
+            select(
+                func.date(model.created_at), request_type, func.count(model.id)
+            ).group_by(func.date(model.created_at), *group_by)
+        )
+        initial_status = "новая" if model is Application else "ожидает"
+        for day, rt, count in created:
+            if day is None:
+                continue
+            await conn.execute(
+                sqlite_insert(DailyStat).values(
+                    day=datetime.date.fromisoformat(day),
+                    entity=entity,
+                    request_type=rt,
+                    status=initial_status,
+                    count=count,
+                )
+            )
+
+        finished_at = model.updated_at if model is Application else model.answered_at
+        finished = await conn.execute(
+            select(
+                func.date(finished_at),
+                request_type,
+                model.status,
+                func.count(model.id),
+                func.sum(
+                    (func.julianday(finished_at) - func.julianday(model.created_at))
+                    * 86400
+                ),
+                func.max(
+                    (func.julianday(finished_at) - func.julianday(model.created_at))
+                    * 86400
+                ),
+            )
+            .where(model.status != initial_status, finished_at.is_not(None))
+            .group_by(func.date(finished_at), model.status, *group_by)
         )
-        return result.scalar_one_or_none()
+        for day, rt, status, count, total_seconds, max_seconds in finished:
+            key = dict(
+                day=datetime.date.fromisoformat(day),
+                entity=entity,
+                request_type=rt,
+                status=status,
+            )
+            await conn.execute(sqlite_insert(DailyStat).values(count=count, **key))
+            await conn.execute(
+                sqlite_insert(ResponseTimeStat).values(
+                    samples=count,
+                    total_seconds=total_seconds or 0.0,
+                    max_seconds=max_seconds or 0.0,
+                    **key,
+                )
+            )
+
+
+def _add_missing_columns(sync_conn, metadata: MetaData):
+    """
+    create_all не меняет существующие таблицы: недостающие nullable-колонки
+    добавляются через ALTER TABLE, до создания индексов на них.
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(
+                f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            )
+
 
+def _create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
-async def update_application_status(
-    app_id: int, status: str, admin_comment: str = None
-):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Application).where(Application.id == app_id)
+
+async def _backfill_admin_messages(conn):
+    """
+    Переносит связи «вопрос — сообщение администратору» из устаревшего
+    JSON-поля questions.admin_messages в отдельную индексированную таблицу.
+    """
+    result = await conn.execute(
+        select(Question.id, Question.admin_messages).where(
+            Question.admin_messages.is_not(None)
+        )
+    )
+    rows = []
+    for question_id, messages in result:
+        if isinstance(messages, str):
+            messages = json.loads(messages)
+        for item in messages or []:
+            rows.append(
+                {
+                    "entity_type": "question",
+                    "entity_id": question_id,
+                    "chat_id": item["admin_id"],
+                    "message_id": item["message_id"],
+                }
+            )
+    if rows:
+        await conn.execute(
+            sqlite_insert(AdminMessage).on_conflict_do_nothing(), rows
         )
-        app = result.scalar_one_or_none()
-        if app:
-            app.status = status
-            if admin_comment:
-                app.admin_comment = admin_comment
-            await session.commit()
-            return True
-        return False
+
+
+def _is_empty(sync_conn) -> bool:
+    return not inspect(sync_conn).get_table_names()
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        if await conn.run_sync(_is_empty):
+            # Режим auto_vacuum меняется без VACUUM, только пока в файле нет
+            # таблиц; существующие базы переводятся командой
+            # python retention.py --enable-incremental-vacuum
+            await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        await conn.run_sync(_add_missing_columns, Base.metadata)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        has_stats = (await conn.execute(select(func.count()).select_from(DailyStat))).scalar()
+        if not has_stats:
+            await _rebuild_stats(conn)
+        has_admin_messages = (
+            await conn.execute(select(func.count()).select_from(AdminMessage))
+        ).scalar()
+        if not has_admin_messages:
+            await _backfill_admin_messages(conn)
+    async with archive_engine.begin() as conn:
+        await conn.run_sync(_add_missing_columns, archive_metadata)
+        await conn.run_sync(archive_metadata.create_all)
+
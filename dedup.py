@@ -0,0 +1,180 @@
+import re
+from array import array
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from sqlalchemy.engine import Row
+
+from logger import logger
+from repository import repo
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.6
+# Оценка сходства по 64 корзинам сигнатуры отклоняется от точного значения
+# в среднем на 0.04, поэтому кандидаты отбираются с запасом и проверяются
+# точно по текстам из БД
+ESTIMATE_SLACK = 0.1
+MAX_CANDIDATES = 20
+
+_MAX_HASH = (1 << 32) - 1
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Приводит текст к нижнему регистру, убирает пунктуацию и лишние пробелы.
+    """
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower().replace("ё", "е")).split())
+
+
+def shingles(text: str) -> FrozenSet[int]:
+    """
+    Возвращает множество хешей символьных k-грамм нормализованного текста.
+    Встроенный hash строки заметно быстрее crc32 от её байтов, но зависит
+    от процесса (PYTHONHASHSEED), поэтому сигнатуры не сохраняются,
+    а пересчитываются при загрузке индекса.
+    """
+    normalized = normalize_text(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset({hash(normalized)}) if normalized else frozenset()
+    return frozenset(
+        {hash(normalized[i:i + SHINGLE_SIZE]) for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    )
+
+
+def minhash(shingle_set: FrozenSet[int]) -> array:
+    """
+    MinHash-сигнатура с одной перестановкой (one permutation hashing):
+    младшие биты хеша k-граммы выбирают корзину, следующие 32 — значение,
+    в корзине остаётся минимальное. Один проход по k-граммам вместо
+    NUM_PERM отдельных хеш-функций; хеши строк уже перемешаны, поэтому
+    дополнительное умножение не нужно.
+    Пустые корзины заполняются из следующей непустой (densification).
+    """
+    minimums = [_MAX_HASH] * NUM_PERM
+    for h in shingle_set:
+        value = (h >> _BIN_BITS) & _MAX_HASH
+        slot = h & (NUM_PERM - 1)
+        if value < minimums[slot]:
+            minimums[slot] = value
+
+    filled = [i for i, value in enumerate(minimums) if value != _MAX_HASH]
+    if filled and len(filled) < NUM_PERM:
+        for i in range(NUM_PERM):
+            if minimums[i] == _MAX_HASH:
+                donor = next((j for j in filled if j > i), filled[0])
+                minimums[i] = (minimums[donor] + (donor - i) % NUM_PERM) & _MAX_HASH
+    return array("I", minimums)
+
+
+def estimate_similarity(first: array, second: array) -> float:
+    """
+    Оценка сходства Жаккара: доля совпавших корзин сигнатур.
+    """
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def jaccard(first: str, second: str) -> float:
+    first_set, second_set = shingles(first), shingles(second)
+    if not first_set or not second_set:
+        return 0.0
+    return len(first_set & second_set) / len(first_set | second_set)
+
+
+def _band_keys(signature: array) -> Iterator[int]:
+    for band in range(BANDS):
+        yield hash((band, signature[band * ROWS:(band + 1) * ROWS].tobytes()))
+
+
+class QuestionIndex:
+    """
+    MinHash/LSH-индекс текстов вопросов для поиска почти-дубликатов.
+    Поиск обращается только к корзинам LSH и не зависит от размера архива.
+    Хранятся только сигнатуры (256 байт на вопрос), а не k-граммы текстов,
+    поэтому память не зависит от длины вопросов.
+    """
+
+    def __init__(self):
+        # В корзине обычно один вопрос: кортеж id дешевле множества
+        self._buckets: Dict[int, Tuple[int, ...]] = {}
+        self._signatures: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, question_id: int, text: str):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return
+        self.remove(question_id)
+        signature = minhash(shingle_set)
+        self._signatures[question_id] = signature
+        for key in _band_keys(signature):
+            self._buckets[key] = self._buckets.get(key, ()) + (question_id,)
+
+    def remove(self, question_id: int):
+        signature = self._signatures.pop(question_id, None)
+        if signature is None:
+            return
+        for key in _band_keys(signature):
+            bucket = tuple(other for other in self._buckets.get(key, ()) if other != question_id)
+            if bucket:
+                self._buckets[key] = bucket
+            else:
+                self._buckets.pop(key, None)
+
+    def find_similar(self, text: str, threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[int, float]]:
+        """
+        Возвращает список (id вопроса, оценка сходства), отсортированный по убыванию сходства.
+        """
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return []
+        signature = minhash(shingle_set)
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        matches = []
+        for question_id in candidates:
+            similarity = estimate_similarity(signature, self._signatures[question_id])
+            if similarity >= threshold:
+                matches.append((question_id, similarity))
+        matches.sort(key=lambda item: item[1], reverse=True)
+        return matches
+
+    async def load(self):
+        self._buckets.clear()
+        self._signatures.clear()
+        async for question_id, question_text in repo.iter_question_texts():
+            self.add(question_id, question_text or "")
+        logger.info(f"Индекс дубликатов вопросов загружен: {len(self)} вопросов")
+
+
+question_index = QuestionIndex()
+
+
+async def find_duplicate_question(text: str) -> Optional[Tuple[Row, float]]:
+    """
+    Ищет похожий вопрос в архиве, отдавая предпочтение уже отвеченным.
+    Кандидаты из индекса проверяются точным сходством Жаккара по текстам из БД.
+    """
+    matches = question_index.find_similar(text, SIMILARITY_THRESHOLD - ESTIMATE_SLACK)[:MAX_CANDIDATES]
+    if not matches:
+        return None
+
+    questions = await repo.get_questions([question_id for question_id, _ in matches])
+    confirmed = []
+    for question in questions:
+        similarity = jaccard(text, question.question_text or "")
+        if similarity >= SIMILARITY_THRESHOLD:
+            confirmed.append((question, similarity))
+    confirmed.sort(key=lambda item: item[1], reverse=True)
+
+    for question, similarity in confirmed:
+        if question.answer_text:
+            return question, similarity
+    return confirmed[0] if confirmed else None
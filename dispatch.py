@@ -0,0 +1,69 @@
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+from aiogram import Router
+from aiogram.filters import BaseFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import Message
+
+from keyboards import menu_kb
+
+MENU_TEXTS = frozenset(button.text for row in menu_kb.keyboard for button in row)
+
+MessageHandler = Callable[[Message, FSMContext], Awaitable]
+
+
+class MessageDispatch:
+    """
+    Таблицы обработчиков пользовательских сценариев: кнопка главного меню
+    и состояние Form сопоставляются обработчику поиском в словаре,
+    вместо того чтобы каждое сообщение проверялось цепочкой фильтров всех роутеров.
+    Кнопка меню важнее состояния: нажав её, пользователь начинает новую заявку.
+    """
+
+    def __init__(self):
+        self.by_text: Dict[str, MessageHandler] = {}
+        self.by_state: Dict[str, MessageHandler] = {}
+
+    def menu(self, text: str):
+        if text not in MENU_TEXTS:
+            raise ValueError(f"Кнопки «{text}» нет в главном меню")
+
+        def decorator(handler: MessageHandler) -> MessageHandler:
+            self.by_text[text] = handler
+            return handler
+
+        return decorator
+
+    def state(self, state: State):
+        def decorator(handler: MessageHandler) -> MessageHandler:
+            self.by_state[state.state] = handler
+            return handler
+
+        return decorator
+
+    def resolve(self, text: Optional[str], raw_state: Optional[str]) -> Optional[MessageHandler]:
+        handler = self.by_text.get(text)
+        if handler is None and raw_state is not None:
+            handler = self.by_state.get(raw_state)
+        return handler
+
+
+class DispatchFilter(BaseFilter):
+    def __init__(self, dispatch: MessageDispatch):
+        self.dispatch = dispatch
+
+    async def __call__(self, message: Message, raw_state: Optional[str] = None) -> Union[bool, dict]:
+        handler = self.dispatch.resolve(message.text, raw_state)
+        if handler is None:
+            return False
+        return {"dispatch_handler": handler}
+
+
+message_dispatch = MessageDispatch()
+router = Router()
+
+
+@router.message(DispatchFilter(message_dispatch))
+async def dispatch_message(message: Message, state: FSMContext, dispatch_handler: MessageHandler):
+    await dispatch_handler(message, state)
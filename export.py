@@ -0,0 +1,140 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from database import Application, AsyncSessionLocal, Question
+
+EXPORT_MODELS = {
+    "applications": Application,
+    "questions": Question,
+}
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+EXPORT_BATCH_SIZE = 500
+TELEGRAM_DOCUMENT_LIMIT = 45 * 1024 * 1024
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime.date]:
+    if not value:
+        return None
+    return datetime.date.fromisoformat(value)
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def iter_export(
+    kind: str,
+    fmt: str = "csv",
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    status: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Построчно выгружает заявки или вопросы в CSV/JSONL.
+    Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE,
+    поэтому расход памяти не зависит от размера таблицы.
+    """
+    model = EXPORT_MODELS[kind]
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    columns = [column.name for column in model.__table__.columns]
+    stmt = select(*model.__table__.columns).order_by(model.id)
+    if date_from:
+        stmt = stmt.where(model.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(model.created_at < date_to + datetime.timedelta(days=1))
+    if status:
+        stmt = stmt.where(model.status == status)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(columns)
+
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            for row in partition:
+                values = [_serialize(value) for value in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(
+                        json.dumps(dict(zip(columns, values)), ensure_ascii=False)
+                    )
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def export_to_files(
+    kind: str,
+    fmt: str = "csv",
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    status: Optional[str] = None,
+    part_size: int = TELEGRAM_DOCUMENT_LIMIT,
+) -> List[str]:
+    """
+    Пишет выгрузку во временные файлы, начиная новый файл при превышении
+    part_size байт, чтобы каждая часть укладывалась в лимит документа Telegram.
+    Удаление файлов — на вызывающей стороне.
+    """
+    paths = []
+    current = None
+    written = 0
+    header = None
+
+    try:
+        async for chunk in iter_export(kind, fmt, date_from, date_to, status):
+            if fmt == "csv" and header is None:
+                header, _, chunk = chunk.partition("\n")
+                header += "\n"
+            if not chunk:
+                # Файл начинается с первой строки данных: выгрузка без строк
+                # не даёт ни одной части, как и в JSONL
+                continue
+            data = chunk.encode("utf-8")
+            if current is None or (written and written + len(data) > part_size):
+                if current is not None:
+                    current.close()
+                current = tempfile.NamedTemporaryFile(
+                    prefix=f"{kind}_", suffix=f".{fmt}", delete=False
+                )
+                paths.append(current.name)
+                written = 0
+                if header:
+                    current.write(header.encode("utf-8"))
+                    written += len(header)
+            current.write(data)
+            written += len(data)
+    except Exception:
+        for path in paths:
+            os.unlink(path)
+        raise
+    finally:
+        if current is not None:
+            current.close()
+
+    return paths
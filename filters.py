@@ -0,0 +1,16 @@
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject
+
+from roster import admin_roster
+
+
+class IsAdmin(BaseFilter):
+    """
+    Пропускает только события от администраторов.
+    Проверка — поиск во frozenset в памяти, без обращений к БД и Telegram API,
+    поэтому её стоит ставить первой среди фильтров обработчика.
+    """
+
+    async def __call__(self, event: TelegramObject) -> bool:
+        user = getattr(event, "from_user", None)
+        return user is not None and user.id in admin_roster.ids
@@ -1 +0,0 @@
-from . import free_consult, paid_consult, question
@@ -1,23 +1,22 @@
 import re
 
-from aiogram import Router, types
-from aiogram.filters.state import StateFilter
+from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
     KeyboardButton,
     ReplyKeyboardMarkup,
     ReplyKeyboardRemove,
 )
 
-from config import ADMIN_CHAT_IDS
-from database import Application, AsyncSessionLocal
+from audit import audit_log
+from crisis import CRISIS_REPLY, crisis_matcher
+from dispatch import message_dispatch
 from logger import error_logger, logger
+from notifications import escalate_crisis, notify_admin_about_application
+from repository import repo
 from states import Form
 from utils import is_non_empty, validate_email, validate_tg_account
 
-router = Router()
 
 yes_no_kb = ReplyKeyboardMarkup(
     keyboard=[[KeyboardButton(text="Да"), KeyboardButton(text="Нет")]],
@@ -26,72 +25,7 @@ yes_no_kb = ReplyKeyboardMarkup(
 )
 
 
-async def save_application(data: dict, user: types.User):
-    async with AsyncSessionLocal() as session:
-        app = Application(
-            user_id=user.id,
-            username=user.username or "",
-            request_type=data.get("request_type", ""),
-            name=data.get("name", ""),
-            phone=data.get("phone", ""),
-            description=data.get("description", ""),
-            email=data.get("email", ""),
-            tg_account=data.get("tg_account", ""),
-            status="новая",
-        )
-        session.add(app)
-        await session.commit()
-        await session.refresh(app)
-        return app
-
-
-async def notify_admin_about_application(bot, application: Application):
-    status_emoji = {
-        "новая": "🆕",
-        "принята": "✅",
-        "отклонена": "❌",
-        "на_доработке": "✏️",
-    }
-
-    markup = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="Принять", callback_data=f"accept_{application.id}"
-                ),
-                InlineKeyboardButton(
-                    text="Отклонить", callback_data=f"reject_{application.id}"
-                ),
-            ]
-        ]
-    )
-
-    text = (
-        f"{status_emoji.get(application.status, '📩')} Заявка №{application.id}\n"
-        f"<b>Тип</b>: {application.request_type}\n"
-        f"<b>Имя</b>: {application.name}\n"
-        f"<b>Телефон</b>: {application.phone or 'не указан'}\n"
-        f"<b>Описание</b>: {application.description}\n"
-        f"<b>E-mail</b>: {application.email}\n"
-        f"<b>Telegram</b>: {application.tg_account or 'не указан'}\n"
-        f"<b>Статус</b>: {application.status}\n"
-    )
-
-    if application.admin_comment:
-        text += f"\n📋 Комментарий админа: {application.admin_comment}"
-
-    for admin_id in ADMIN_CHAT_IDS:
-        try:
-            await bot.send_message(
-                chat_id=admin_id, text=text, parse_mode="HTML", reply_markup=markup
-            )
-        except Exception as e:
-            error_logger.error(
-                f"Не удалось отправить уведомление администратору {admin_id}: {e}"
-            )
-
-
-@router.message(lambda m: m.text == "Запросить бесплатную видеоконсультацию")
+@message_dispatch.menu("Запросить бесплатную видеоконсультацию")
 async def start_free_consult(message: types.Message, state: FSMContext):
     try:
         await state.update_data(request_type="Запросить бесплатную видеоконсультацию")
@@ -105,7 +39,7 @@ async def start_free_consult(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_name_free))
+@message_dispatch.state(Form.waiting_for_name_free)
 async def process_name(message: types.Message, state: FSMContext):
     try:
         name = message.text.strip()
@@ -125,7 +59,7 @@ async def process_name(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_phone_free))
+@message_dispatch.state(Form.waiting_for_phone_free)
 async def process_phone(message: types.Message, state: FSMContext):
     try:
         phone = message.text.strip()
@@ -155,7 +89,7 @@ async def process_phone(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_description_free))
+@message_dispatch.state(Form.waiting_for_description_free)
 async def process_description(message: types.Message, state: FSMContext):
     try:
         description = message.text.strip()
@@ -165,6 +99,8 @@ async def process_description(message: types.Message, state: FSMContext):
             )
             return
         await state.update_data(description=description)
+        if crisis_matcher.scan(description):
+            await message.answer(CRISIS_REPLY, parse_mode="HTML")
         await message.answer("✉️ Введите ваш e-mail (обязательно):")
         await state.set_state(Form.waiting_for_email_free)
     except Exception as e:
@@ -175,7 +111,7 @@ async def process_description(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_email_free))
+@message_dispatch.state(Form.waiting_for_email_free)
 async def process_email(message: types.Message, state: FSMContext):
     try:
         email = message.text.strip()
@@ -197,7 +133,7 @@ async def process_email(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_tg_account_free))
+@message_dispatch.state(Form.waiting_for_tg_account_free)
 async def process_tg_account(message: types.Message, state: FSMContext):
     try:
         tg_account = message.text.strip()
@@ -255,7 +191,7 @@ async def confirm_data(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_personal_data_agreement_free))
+@message_dispatch.state(Form.waiting_for_personal_data_agreement_free)
 async def personal_data_agreement(message: types.Message, state: FSMContext):
     try:
         answer = message.text.lower()
@@ -275,7 +211,22 @@ async def personal_data_agreement(message: types.Message, state: FSMContext):
             return
 
         data = await state.get_data()
-        app = await save_application(data, message.from_user)
+        crisis_terms = crisis_matcher.scan(data.get("description", ""))
+        app = await repo.create_application(
+            message.from_user.id, message.from_user.username, data, priority=bool(crisis_terms)
+        )
+        audit_log.record(
+            "application_created",
+            "application",
+            app.id,
+            actor_id=message.from_user.id,
+            request_type=app.request_type,
+        )
+        if crisis_terms:
+            await escalate_crisis(message.bot, "application", app.id, crisis_terms)
+            audit_log.record(
+                "crisis_escalated", "application", app.id, actor_id=message.from_user.id, terms=crisis_terms
+            )
         await notify_admin_about_application(message.bot, app)
 
         await message.answer(
@@ -0,0 +1,56 @@
+from aiogram import Router, types
+from aiogram.filters import Command
+
+from repository import repo
+
+router = Router()
+
+STATUS_EMOJI = {
+    "новая": "🆕",
+    "принята": "✅",
+    "отклонена": "❌",
+    "на_доработке": "✏️",
+    "ожидает": "⏳",
+    "отвечен": "💬",
+    "завершен": "✅",
+}
+
+
+def _format_date(value) -> str:
+    return value.strftime("%d.%m.%Y") if value else "—"
+
+
+@router.message(Command("my"))
+async def show_my_requests(message: types.Message):
+    history = await repo.get_user_history(message.from_user.id)
+    applications = history["applications"]
+    questions = history["questions"]
+
+    if not applications and not questions:
+        await message.answer(
+            "У вас пока нет заявок и вопросов. Чтобы создать заявку, нажмите /start."
+        )
+        return
+
+    lines = []
+    if applications:
+        lines.append("<b>📋 Ваши заявки:</b>")
+        for app in applications:
+            line = (
+                f"{STATUS_EMOJI.get(app['status'], '📩')} №{app['id']} от {_format_date(app['created_at'])} — "
+                f"{app['request_type']}: <b>{app['status']}</b>"
+            )
+            if app["status"] == "отклонена" and app["admin_comment"]:
+                line += f"\n    <i>Причина:</i> {app['admin_comment']}"
+            lines.append(line)
+    if questions:
+        if lines:
+            lines.append("")
+        lines.append("<b>❓ Ваши вопросы:</b>")
+        for question in questions:
+            lines.append(
+                f"{STATUS_EMOJI.get(question['status'], '📩')} №{question['id']} от "
+                f"{_format_date(question['created_at'])}: <b>{question['status']}</b>"
+            )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
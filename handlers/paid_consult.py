@@ -1,23 +1,22 @@
 import re
 
-from aiogram import Router, types
-from aiogram.filters.state import StateFilter
+from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
     KeyboardButton,
     ReplyKeyboardMarkup,
     ReplyKeyboardRemove,
 )
 
-from config import ADMIN_CHAT_IDS
-from database import Application, AsyncSessionLocal
+from audit import audit_log
+from crisis import CRISIS_REPLY, crisis_matcher
+from dispatch import message_dispatch
 from logger import error_logger, logger
+from notifications import escalate_crisis, notify_admin_about_application
+from repository import repo
 from states import Form
 from utils import is_non_empty, validate_email, validate_tg_account
 
-router = Router()
 
 yes_no_kb = ReplyKeyboardMarkup(
     keyboard=[[KeyboardButton(text="Да"), KeyboardButton(text="Нет")]],
@@ -26,60 +25,7 @@ yes_no_kb = ReplyKeyboardMarkup(
 )
 
 
-async def save_application(data: dict, user: types.User):
-    async with AsyncSessionLocal() as session:
-        app = Application(
-            user_id=user.id,
-            username=user.username or "",
-            request_type=data.get("request_type", ""),
-            name=data.get("name", ""),
-            phone=data.get("phone", ""),
-            description=data.get("description", ""),
-            email=data.get("email", ""),
-            tg_account=data.get("tg_account", ""),
-            status="новая",
-        )
-        session.add(app)
-        await session.commit()
-        await session.refresh(app)
-        return app
-
-
-async def notify_admin_about_application(bot, application: Application):
-    markup = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="Принять", callback_data=f"accept_{application.id}"
-                ),
-                InlineKeyboardButton(
-                    text="Отклонить", callback_data=f"reject_{application.id}"
-                ),
-            ]
-        ]
-    )
-    text = (
-        f"📩 Заявка №{application.id}\n"
-        f"<b>Тип</b>: {application.request_type}\n"
-        f"<b>Имя</b>: {application.name}\n"
-        f"<b>Телефон</b>: {application.phone}\n"
-        f"<b>Описание</b>: {application.description}\n"
-        f"<b>E-mail</b>: {application.email}\n"
-        f"<b>Telegram</b>: {application.tg_account}\n"
-        f"<b>Статус</b>: {application.status}\n"
-    )
-    for admin_id in ADMIN_CHAT_IDS:
-        try:
-            await bot.send_message(
-                chat_id=admin_id, text=text, parse_mode="HTML", reply_markup=markup
-            )
-        except Exception as e:
-            error_logger.error(
-                f"Не удалось отправить уведомление администратору {admin_id}: {e}"
-            )
-
-
-@router.message(lambda m: m.text == "Запросить платную видеоконсультацию")
+@message_dispatch.menu("Запросить платную видеоконсультацию")
 async def start_paid_consult(message: types.Message, state: FSMContext):
     try:
         await state.update_data(request_type="Запросить платную видеоконсультацию")
@@ -93,7 +39,7 @@ async def start_paid_consult(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_name_paid))
+@message_dispatch.state(Form.waiting_for_name_paid)
 async def process_name(message: types.Message, state: FSMContext):
     try:
         name = message.text.strip()
@@ -113,7 +59,7 @@ async def process_name(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_phone_paid))
+@message_dispatch.state(Form.waiting_for_phone_paid)
 async def process_phone(message: types.Message, state: FSMContext):
     try:
         phone = message.text.strip()
@@ -133,7 +79,7 @@ async def process_phone(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_description_paid))
+@message_dispatch.state(Form.waiting_for_description_paid)
 async def process_description(message: types.Message, state: FSMContext):
     try:
         description = message.text.strip()
@@ -143,6 +89,8 @@ async def process_description(message: types.Message, state: FSMContext):
             )
             return
         await state.update_data(description=description)
+        if crisis_matcher.scan(description):
+            await message.answer(CRISIS_REPLY, parse_mode="HTML")
         await message.answer("✉️ Введите ваш e-mail (обязательно):")
         await state.set_state(Form.waiting_for_email_paid)
     except Exception as e:
@@ -153,7 +101,7 @@ async def process_description(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_email_paid))
+@message_dispatch.state(Form.waiting_for_email_paid)
 async def process_email(message: types.Message, state: FSMContext):
     try:
         email = message.text.strip()
@@ -175,7 +123,7 @@ async def process_email(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_tg_account_paid))
+@message_dispatch.state(Form.waiting_for_tg_account_paid)
 async def process_tg_account(message: types.Message, state: FSMContext):
     try:
         tg_account = message.text.strip()
@@ -197,13 +145,19 @@ async def process_tg_account(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_paid_agreement))
+@message_dispatch.state(Form.waiting_for_paid_agreement)
 async def process_paid_agreement(message: types.Message, state: FSMContext):
     try:
         answer = message.text.lower()
         if answer not in ["согласен", "не согласен"]:
             await message.answer("Пожалуйста, напишите «согласен» или «не согласен».")
             return
+        audit_log.record(
+            "paid_agreement_accepted" if answer == "согласен" else "paid_agreement_declined",
+            "user",
+            message.from_user.id,
+            actor_id=message.from_user.id,
+        )
         if answer == "не согласен":
             await message.answer(
                 "⚠️ Для платной видеоконсультации необходимо согласие на оказание платных услуг. Заявка отменена.",
@@ -241,7 +195,7 @@ async def process_paid_agreement(message: types.Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте ещё раз.")
 
 
-@router.message(StateFilter(Form.waiting_for_personal_data_agreement_paid))
+@message_dispatch.state(Form.waiting_for_personal_data_agreement_paid)
 async def personal_data_agreement(message: types.Message, state: FSMContext):
     try:
         answer = message.text.lower()
@@ -261,7 +215,22 @@ async def personal_data_agreement(message: types.Message, state: FSMContext):
             return
 
         data = await state.get_data()
-        app = await save_application(data, message.from_user)
+        crisis_terms = crisis_matcher.scan(data.get("description", ""))
+        app = await repo.create_application(
+            message.from_user.id, message.from_user.username, data, priority=bool(crisis_terms)
+        )
+        audit_log.record(
+            "application_created",
+            "application",
+            app.id,
+            actor_id=message.from_user.id,
+            request_type=app.request_type,
+        )
+        if crisis_terms:
+            await escalate_crisis(message.bot, "application", app.id, crisis_terms)
+            audit_log.record(
+                "crisis_escalated", "application", app.id, actor_id=message.from_user.id, terms=crisis_terms
+            )
         await notify_admin_about_application(message.bot, app)
 
         await message.answer(
@@ -1,21 +1,25 @@
-import json
 import logging
 
 from aiogram import F, Router, types
-from aiogram.filters.state import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from sqlalchemy import select
-
-from config import ADMIN_CHAT_IDS, GROUP_ID
-from database import (
-    AsyncSessionLocal,
-    Question,
-    create_question,
-    update_question_answer,
+
+from audit import audit_log
+from crisis import CRISIS_REPLY, crisis_matcher
+from dedup import find_duplicate_question, question_index
+from dispatch import message_dispatch
+from filters import IsAdmin
+from notifications import (
+    crisis_note,
+    escalate_crisis,
+    format_question,
+    notify_admins_about_question,
 )
+from repository import repo
+from roster import admin_roster
 from states import Form
 from storage import bot
+from topics import topic_classifier
 from utils import is_non_empty
 
 logging.basicConfig(level=logging.INFO)
@@ -55,17 +59,17 @@ async def send_answer_to_group(question_text: str, answer_text: str):
     message_parts = split_text(full_message)
 
     for part in message_parts:
-        await bot.send_message(chat_id=GROUP_ID, text=part, parse_mode="HTML")
+        await bot.send_message(chat_id=admin_roster.group_id, text=part, parse_mode="HTML")
 
 
-@router.message(lambda m: m.text == "Задать вопрос психологу")
+@message_dispatch.menu("Задать вопрос психологу")
 async def start_question(message: types.Message, state: FSMContext):
     await state.update_data(request_type="Задать вопрос психологу")
     await message.answer("❓ Пожалуйста, введите ваш вопрос (обязательно):")
     await state.set_state(Form.waiting_for_question)
 
 
-@router.message(StateFilter(Form.waiting_for_question))
+@message_dispatch.state(Form.waiting_for_question)
 async def process_question(message: types.Message, state: FSMContext):
     question = message.text.strip()
     if not is_non_empty(question):
@@ -74,6 +78,8 @@ async def process_question(message: types.Message, state: FSMContext):
         )
         return
     await state.update_data(question=question)
+    if crisis_matcher.scan(question):
+        await message.answer(CRISIS_REPLY, parse_mode="HTML")
     preview_text = (
         "📋 <b>ПРЕДВАРИТЕЛЬНЫЙ ПРОСМОТР</b>\n\n"
         "▫️▫️▫️▫️▫️▫️▫️▫️▫️▫️▫️▫️▫️\n"
@@ -86,7 +92,7 @@ async def process_question(message: types.Message, state: FSMContext):
     await state.set_state(Form.waiting_for_personal_data_agreement_question)
 
 
-@router.message(StateFilter(Form.waiting_for_personal_data_agreement_question))
+@message_dispatch.state(Form.waiting_for_personal_data_agreement_question)
 async def personal_data_agreement(message: types.Message, state: FSMContext):
     answer = message.text.lower()
     if answer == "/cancel":
@@ -110,44 +116,36 @@ async def personal_data_agreement(message: types.Message, state: FSMContext):
     question_text = data.get("question")
     user_id = message.from_user.id
 
-    notification_text = (
-        f"🆕 Новый анонимный вопрос\n\n"
-        f"<b>❓ ВОПРОС:</b>\n"
-        f"<i>«{question_text}»</i>\n\n"
-        "💬 Просто ответьте на это сообщение, чтобы отправить ответ в группу."
-    )
-
-    admin_messages = []
-    for admin_id in ADMIN_CHAT_IDS:
-        sent_message = await bot.send_message(
-            admin_id, notification_text, parse_mode="HTML"
-        )
-        admin_messages.append(
-            {"admin_id": admin_id, "message_id": sent_message.message_id}
+    duplicate_note = ""
+    duplicate = await find_duplicate_question(question_text)
+    if duplicate:
+        similar_question, similarity = duplicate
+        duplicate_note = (
+            f"♻️ <b>Похоже на вопрос №{similar_question.id}</b> "
+            f"({similar_question.status}, сходство {similarity:.0%})\n\n"
         )
 
-    question_id = await create_question(
-        user_id=user_id, question_text=question_text, admin_message_id=None
+    topic, confidence = topic_classifier.classify(question_text)
+    crisis_terms = crisis_matcher.scan(question_text)
+    # Запись создаётся до рассылки, чтобы каждый администратор сразу получил номер вопроса
+    question_id = await repo.create_question(
+        user_id=user_id, question_text=question_text, topic=topic, priority=bool(crisis_terms)
     )
-
-    async with AsyncSessionLocal() as session:
-        question = await session.get(Question, question_id)
-        question.admin_messages = json.dumps(admin_messages)
-        await session.commit()
-
-    first_admin_msg = admin_messages[0]
-    notification_text_with_id = (
-        f"🆕 Новый анонимный вопрос №{question_id}\n\n"
-        f"<b>❓ ВОПРОС:</b>\n"
-        f"<i>«{question_text}»</i>\n\n"
-        "💬 Просто ответьте на это сообщение, чтобы отправить ответ в группу."
-    )
-
-    await bot.edit_message_text(
-        chat_id=first_admin_msg["admin_id"],
-        message_id=first_admin_msg["message_id"],
-        text=notification_text_with_id,
-        parse_mode="HTML",
+    question_index.add(question_id, question_text)
+
+    recipients = admin_roster.recipients(topic)
+    if crisis_terms:
+        # Срочный вопрос видят все, а не только специалисты по теме
+        await escalate_crisis(bot, "question", question_id, crisis_terms)
+        audit_log.record("crisis_escalated", "question", question_id, terms=crisis_terms)
+        duplicate_note = crisis_note(crisis_terms) + duplicate_note
+        recipients = admin_roster.ordered
+
+    await notify_admins_about_question(
+        bot,
+        question_id,
+        format_question(question_id, question_text, topic, confidence, duplicate_note),
+        recipients,
     )
 
     await message.answer(
@@ -157,16 +155,16 @@ async def personal_data_agreement(message: types.Message, state: FSMContext):
     await state.clear()
 
 
-@router.message(F.reply_to_message)
+@router.message(IsAdmin(), F.reply_to_message)
 async def handle_admin_reply(message: types.Message, state: FSMContext):
     replied_message = message.reply_to_message
-    if replied_message.from_user.id != (await bot.get_me()).id:
+    if replied_message.from_user.id != bot.id:
         return
 
     admin_id = message.from_user.id
     admin_message_id = replied_message.message_id
 
-    question = await get_question_by_admin_and_message(admin_id, admin_message_id)
+    question = await repo.get_question_by_admin_message(admin_id, admin_message_id)
     if not question:
         await message.answer("❌ Вопрос не найден.")
         return
@@ -178,27 +176,45 @@ async def handle_admin_reply(message: types.Message, state: FSMContext):
         )
         return
 
+    draft_authors = await repo.get_answer_draft_authors(question.id)
+    if admin_id in draft_authors:
+        answer_length = await repo.append_answer_draft(question.id, admin_id, message.text)
+        draft_note = "📎 Ответ добавлен к сохранённому черновику.\n\n"
+    else:
+        answer_length = await repo.replace_answer_draft(question.id, admin_id, message.text)
+        draft_note = ""
+    other_authors = [author for author in draft_authors if author != admin_id]
+    if other_authors:
+        draft_note += (
+            f"👥 Над этим вопросом также работают другие психологи "
+            f"(черновиков: {len(other_authors)}).\n\n"
+        )
+
     await state.update_data(
         question_id=question.id,
         user_id=question.user_id,
         question_text=question.question_text,
-        current_answer=message.text,
+        draft_admin_id=admin_id,
         admin_message_id=admin_message_id
     )
 
     await message.answer(
         f"📝 <b>Ответ на вопрос №{question.id}</b>\n\n"
         f"❓ Вопрос: {question.question_text}\n\n"
-        f"💬 Ваш ответ ({len(message.text)} символов) готов.\n\n"
+        f"{draft_note}"
+        f"💬 Ваш ответ ({answer_length} символов) готов.\n\n"
         "Выберите действие:",
         parse_mode="HTML",
         reply_markup=admin_actions_kb
     )
 
+    audit_log.record(
+        "answer_started", "question", question.id, actor_id=admin_id, length=answer_length
+    )
     await state.set_state(Form.waiting_for_admin_action)
 
 
-@router.message(StateFilter(Form.waiting_for_admin_action))
+@message_dispatch.state(Form.waiting_for_admin_action)
 async def handle_admin_action(message: types.Message, state: FSMContext):
     action = message.text
     data = await state.get_data()
@@ -206,9 +222,12 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
     question_id = data.get("question_id")
     user_id = data.get("user_id")
     question_text = data.get("question_text")
-    current_answer = data.get("current_answer")
+    draft_admin_id = data.get("draft_admin_id", message.from_user.id)
 
     if action == "📝 Ответить еще раз":
+        audit_log.record(
+            "answer_append_requested", "question", question_id, actor_id=message.from_user.id
+        )
         await message.answer(
             "📝 Отправьте дополнительный ответ к этому вопросу:",
             reply_markup=ReplyKeyboardRemove()
@@ -216,6 +235,10 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
         await state.set_state(Form.waiting_for_additional_answer)
 
     elif action == "✏️ Редактировать ответ":
+        audit_log.record(
+            "answer_edit_requested", "question", question_id, actor_id=message.from_user.id
+        )
+        current_answer = await repo.get_answer_draft(question_id, draft_admin_id)
         preview_answer = current_answer[:1000] + "..." if len(current_answer) > 1000 else current_answer
 
         await message.answer(
@@ -228,6 +251,15 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
         await state.set_state(Form.waiting_for_edited_answer)
 
     elif action == "✅ Завершить вопрос":
+        current_answer = await repo.get_answer_draft(question_id, draft_admin_id)
+        if not current_answer:
+            await message.answer(
+                "❌ Черновик ответа не найден. Ответьте на сообщение с вопросом ещё раз.",
+                reply_markup=ReplyKeyboardRemove()
+            )
+            await state.clear()
+            return
+
         await send_answer_to_group(question_text, current_answer)
 
         await bot.send_message(
@@ -235,7 +267,15 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
             text="✅ Ваш вопрос опубликован в группе. Спасибо за доверие!"
         )
 
-        await update_question_answer(question_id, current_answer, status="завершен")
+        await repo.update_question_answer(question_id, current_answer, status="завершен")
+        await repo.delete_answer_drafts(question_id)
+        audit_log.record(
+            "question_finished",
+            "question",
+            question_id,
+            actor_id=message.from_user.id,
+            length=len(current_answer),
+        )
 
         await message.answer(
             f"✅ Вопрос №{question_id} завершен. Ответ отправлен в группу и пользователь уведомлен.",
@@ -245,8 +285,11 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
         await state.clear()
 
     elif action == "🚫 Отменить":
+        audit_log.record(
+            "answer_cancelled", "question", question_id, actor_id=message.from_user.id
+        )
         await message.answer(
-            "❌ Действие отменено. Вы можете ответить на вопрос позже.",
+            "❌ Действие отменено. Черновик сохранён — вы можете ответить на вопрос позже.",
             reply_markup=ReplyKeyboardRemove()
         )
         await state.clear()
@@ -258,19 +301,24 @@ async def handle_admin_action(message: types.Message, state: FSMContext):
         )
 
 
-@router.message(StateFilter(Form.waiting_for_additional_answer))
+@message_dispatch.state(Form.waiting_for_additional_answer)
 async def handle_additional_answer(message: types.Message, state: FSMContext):
     data = await state.get_data()
-    current_answer = data.get("current_answer", "")
-    new_answer = message.text
-
-    combined_answer = current_answer + "\n\n" + new_answer
-
-    await state.update_data(current_answer=combined_answer)
+    question_id = data.get("question_id")
+    draft_admin_id = data.get("draft_admin_id", message.from_user.id)
+
+    answer_length = await repo.append_answer_draft(question_id, draft_admin_id, message.text)
+    audit_log.record(
+        "answer_appended",
+        "question",
+        question_id,
+        actor_id=message.from_user.id,
+        length=answer_length,
+    )
 
     await message.answer(
         f"📝 <b>Ответ обновлен</b>\n\n"
-        f"Теперь ответ состоит из {len(combined_answer)} символов.\n\n"
+        f"Теперь ответ состоит из {answer_length} символов.\n\n"
         "Выберите действие:",
         parse_mode="HTML",
         reply_markup=admin_actions_kb
@@ -279,9 +327,19 @@ async def handle_additional_answer(message: types.Message, state: FSMContext):
     await state.set_state(Form.waiting_for_admin_action)
 
 
-@router.message(StateFilter(Form.waiting_for_edited_answer))
+@message_dispatch.state(Form.waiting_for_edited_answer)
 async def handle_edited_answer(message: types.Message, state: FSMContext):
-    await state.update_data(current_answer=message.text)
+    data = await state.get_data()
+    await repo.replace_answer_draft(
+        data.get("question_id"), data.get("draft_admin_id", message.from_user.id), message.text
+    )
+    audit_log.record(
+        "answer_edited",
+        "question",
+        data.get("question_id"),
+        actor_id=message.from_user.id,
+        length=len(message.text),
+    )
 
     preview_answer = message.text[:500] + "..." if len(message.text) > 500 else message.text
 
@@ -296,18 +354,3 @@ async def handle_edited_answer(message: types.Message, state: FSMContext):
 
     await state.set_state(Form.waiting_for_admin_action)
 
-
-async def get_question_by_admin_and_message(admin_id: int, message_id: int):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Question))
-        questions = result.scalars().all()
-        for q in questions:
-            if q.admin_messages:
-                admin_msgs = json.loads(q.admin_messages)
-                for admin_msg in admin_msgs:
-                    if (
-                            admin_msg["admin_id"] == admin_id
-                            and admin_msg["message_id"] == message_id
-                    ):
-                        return q
-    return None
\ No newline at end of file
@@ -0,0 +1,28 @@
+from aiogram import Router
+from aiogram.filters.command import CommandStart
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+
+from keyboards import menu_kb
+from logger import error_logger
+from states import Form
+
+router = Router()
+
+
+@router.message(CommandStart())
+async def cmd_start(message: Message, state: FSMContext):
+    try:
+        await message.answer(
+            "Здравствуйте! Я помогу вам отправить заявку. Выберите тип заявки:",
+            reply_markup=menu_kb,
+        )
+        await state.set_state(Form.waiting_for_type)
+    except Exception as e:
+        error_logger.error(
+            f"Ошибка в обработчике команд /start для пользователя {message.from_user.id}: {e}",
+            exc_info=True,
+        )
+        await message.answer(
+            "Произошла ошибка при обработке команды /start. Попробуйте позднее."
+        )
@@ -0,0 +1,140 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+from aiogram import __version__
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен
+    orjson = None
+
+
+def _orjson_dumps(value: Any) -> str:
+    return orjson.dumps(value).decode()
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """
+    HTTP-сессия Bot API с настраиваемым пулом соединений, keep-alive,
+    кэшем DNS и таймаутами по методам. Считает, сколько запросов
+    переиспользовали соединение и сколько времени ушло на (де)сериализацию JSON.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        keepalive_timeout: float = 60,
+        dns_cache_ttl: int = 3600,
+        timeout: float = 60,
+        method_timeouts: Optional[Dict[str, float]] = None,
+        json_backend: str = "auto",
+    ):
+        if json_backend == "orjson" and orjson is None:
+            raise RuntimeError("BOT_JSON=orjson, но пакет orjson не установлен")
+        use_orjson = orjson is not None and json_backend in ("auto", "orjson")
+        self.json_backend = "orjson" if use_orjson else "json"
+        dumps = _orjson_dumps if use_orjson else json.dumps
+        loads = orjson.loads if use_orjson else json.loads
+
+        super().__init__(
+            limit=limit,
+            json_dumps=self._timed(dumps, "serialize"),
+            json_loads=self._timed(loads, "deserialize"),
+            timeout=timeout,
+        )
+        self._connector_init.update(
+            limit_per_host=limit,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        self.method_timeouts = method_timeouts or {}
+        self.counters = {
+            "requests": 0,
+            "errors": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "serialize": 0.0,
+            "deserialize": 0.0,
+        }
+
+    def _timed(self, func, counter: str):
+        def wrapper(value):
+            started = time.perf_counter()
+            try:
+                return func(value)
+            finally:
+                self.counters[counter] += time.perf_counter() - started
+
+        return wrapper
+
+    def _trace_config(self) -> TraceConfig:
+        trace_config = TraceConfig()
+
+        async def on_create(session, context, params):
+            self.counters["connections_created"] += 1
+
+        async def on_reuse(session, context, params):
+            self.counters["connections_reused"] += 1
+
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    async def create_session(self) -> ClientSession:
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+                trace_configs=[self._trace_config()],
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+    async def make_request(self, bot, method, timeout: Optional[float] = None):
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__)
+        self.counters["requests"] += 1
+        try:
+            return await super().make_request(bot, method, timeout=timeout)
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+
+    def stats(self) -> dict:
+        counters = self.counters
+        connections = counters["connections_created"] + counters["connections_reused"]
+        return {
+            "json": self.json_backend,
+            "limit": self._connector_init.get("limit"),
+            "keepalive_timeout": self._connector_init.get("keepalive_timeout"),
+            "requests": counters["requests"],
+            "errors": counters["errors"],
+            "connections_created": counters["connections_created"],
+            "connections_reused": counters["connections_reused"],
+            "reuse_rate": round(counters["connections_reused"] / connections, 3)
+            if connections
+            else 0.0,
+            "serialize_ms": round(counters["serialize"] * 1000, 2),
+            "deserialize_ms": round(counters["deserialize"] * 1000, 2),
+        }
+
+
+def create_bot_session(settings) -> TunedAiohttpSession:
+    return TunedAiohttpSession(
+        limit=settings.bot_http_limit,
+        keepalive_timeout=settings.bot_http_keepalive,
+        dns_cache_ttl=settings.bot_dns_cache_ttl,
+        timeout=settings.bot_request_timeout,
+        method_timeouts=dict(settings.bot_method_timeouts),
+        json_backend=settings.bot_json,
+    )
@@ -1,78 +1,228 @@
 import os
+import importlib
 import logging
 import asyncio
-from contextlib import asynccontextmanager
-
-from fastapi import FastAPI
-from aiogram.filters.command import CommandStart
-from aiogram.fsm.context import FSMContext
-from aiogram.types import Message
-from database import init_db
-from admin import admin_router
-from handlers import free_consult, paid_consult, question
-from keyboards import menu_kb
-from logger import error_logger
-from states import Form
-from storage import bot, dp
-
-import uvicorn
+from contextlib import asynccontextmanager, suppress
+
+from runtime import log_runtime_report, polling_leader, resolve_runtime, runtime_report
+from startup import startup_profiler
+from watchdog import HandlerContextMiddleware, loop_watchdog
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from config import get_settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+startup_profiler.mark("import main")
+
+# Модули сценариев регистрируют обработчики в таблицах dispatch.message_dispatch
+HANDLER_MODULES = (
+    "handlers.question",
+    "handlers.free_consult",
+    "handlers.paid_consult",
+)
+ROUTERS = (
+    ("handlers.start", "router"),
+    ("handlers.my_requests", "router"),
+    ("handlers.question", "router"),
+    ("dispatch", "router"),
+    ("admin", "admin_router"),
+)
+
 bot_task = None
+retention_task = None
+audit_task = None
+roster_task = None
+
+
+def include_routers(dp):
+    for module_name in HANDLER_MODULES:
+        startup_profiler.import_module(module_name)
+    for module_name, attr in ROUTERS:
+        module = startup_profiler.import_module(module_name)
+        dp.include_router(getattr(module, attr))
+
 
 async def run_bot():
+    global retention_task, audit_task, roster_task
     try:
+        from tracing import tracer
+
+        settings = get_settings()
+        # До импорта storage: от настроек трассировки зависит обёртка FSM-хранилища
+        tracer.configure(
+            sample_rate=settings.trace_sample_rate,
+            slow_ms=settings.trace_slow_ms,
+            buffer_size=settings.trace_buffer,
+            path=settings.trace_file,
+        )
+        from storage import bot, dp
+
+        startup_profiler.mark("import storage")
+
+        from audit import audit_log
+        from crisis import crisis_matcher
+        from database import init_db
+        from dedup import question_index
+        from notifications import admin_message_sync
+        from repository import repo
+        from roster import admin_roster
+        from topics import topic_classifier
+
+        repo.writer.configure(
+            window=settings.write_batch_window_ms / 1000, max_batch=settings.write_batch_max
+        )
+        admin_message_sync.configure(settings.admin_sync_rate)
+        crisis_matcher.load_file(settings.crisis_lexicon_file)
         await init_db()
         logger.info("База данных инициализирована")
+        startup_profiler.mark("init_db")
+        await admin_roster.load()
+        roster_task = asyncio.create_task(
+            admin_roster.run(get_settings().roster_refresh_seconds)
+        )
+        audit_task = asyncio.create_task(audit_log.run())
+        await question_index.load()
+        startup_profiler.mark("load question index")
+        await topic_classifier.train()
+        startup_profiler.mark("train topic classifier")
+
+        if get_settings().retention_days > 0:
+            from retention import run_retention_job
+
+            retention_task = asyncio.create_task(run_retention_job())
+
+        from shutdown import update_drain
+
+        include_routers(dp)
+        if get_settings().capture_updates:
+            from capture import keyboard_texts, update_capture
+
+            update_capture.open(
+                get_settings().capture_updates,
+                bot.id,
+                admin_roster,
+                admin_roster.group_id,
+                keep_texts=keyboard_texts(
+                    importlib.import_module(name) for name in ("keyboards",) + HANDLER_MODULES
+                ),
+            )
+            dp.update.outer_middleware(update_capture)
+        dp.update.outer_middleware(update_drain)
+        dp.message.middleware(HandlerContextMiddleware())
+        dp.callback_query.middleware(HandlerContextMiddleware())
 
-        dp.include_router(question.router)
-        dp.include_router(free_consult.router)
-        dp.include_router(paid_consult.router)
-        dp.include_router(admin_router)
+        if tracer.enabled:
+            from database import engine
 
-        await bot.delete_webhook(drop_pending_updates=True)
+            tracer.instrument_engine(engine)
+            dp.update.outer_middleware(tracer.update_middleware)
+            dp.message.middleware(tracer.handler_middleware)
+            dp.callback_query.middleware(tracer.handler_middleware)
+            bot.session.middleware(tracer.session_middleware)
+        if startup_profiler.enabled:
+            dp.update.outer_middleware(startup_profiler.first_update_middleware)
+
+        await bot.delete_webhook(drop_pending_updates=False)
         logger.info("Webhook удален, начинается polling")
+        startup_profiler.mark("delete_webhook")
 
-        await dp.start_polling(bot)
+        await dp.start_polling(bot, handle_signals=False, close_bot_session=False)
 
     except Exception as exc:
         logger.error(f"Ошибка в основном цикле бота: {exc}", exc_info=True)
         raise
 
 
-@dp.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
+async def run_bot_when_leader():
+    """
+    При нескольких воркерах uvicorn апдейты из Telegram получает только
+    владелец блокировки; остальные ждут, пока он не остановится.
+    """
+    if not polling_leader.try_acquire():
+        logger.info(f"Воркер {os.getpid()} ждёт освобождения блокировки опроса Telegram")
+        await polling_leader.wait()
+        logger.info(f"Воркер {os.getpid()} получил блокировку опроса Telegram")
+    await run_bot()
+
+
+async def shutdown_bot(timeout: float):
+    """
+    Останавливает бота без потери работы: прекращает получать апдейты,
+    до timeout секунд ждёт начатые обработчики, сбрасывает журнал аудита
+    и закрывает сессию бота и соединения с БД.
+    """
+    from notifications import admin_message_sync
+    from storage import bot, dp
+    from shutdown import update_drain
+    from tracing import tracer
+
+    deadline = asyncio.get_running_loop().time() + timeout
     try:
-        await message.answer(
-            "Здравствуйте! Я помогу вам отправить заявку. Выберите тип заявки:",
-            reply_markup=menu_kb,
-        )
-        await state.set_state(Form.waiting_for_type)
-    except Exception as e:
-        error_logger.error(
-            f"Ошибка в обработчике команд /start для пользователя {message.from_user.id}: {e}",
-            exc_info=True,
-        )
-        await message.answer(
-            "Произошла ошибка при обработке команды /start. Попробуйте позднее."
-        )
+        await asyncio.wait_for(dp.stop_polling(), timeout)
+    except (RuntimeError, asyncio.TimeoutError):
+        bot_task.cancel()
+    # Ошибки run_bot уже записаны в лог, здесь важно лишь дождаться его выхода.
+    with suppress(asyncio.CancelledError, Exception):
+        await bot_task
+
+    update_drain.begin()
+    await update_drain.wait(max(deadline - asyncio.get_running_loop().time(), 0))
+    await tracer.drain()
+    await admin_message_sync.drain(max(deadline - asyncio.get_running_loop().time(), 0))
+    if get_settings().capture_updates:
+        from capture import update_capture
+
+        update_capture.close()
+
+    if retention_task:
+        retention_task.cancel()
+    if roster_task:
+        roster_task.cancel()
+    if audit_task:
+        from audit import audit_log
+
+        audit_log.stop()
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                audit_task, max(deadline - asyncio.get_running_loop().time(), 1)
+            )
+        await audit_log.flush()
+
+    from database import archive_engine, engine
+    from repository import repo
+
+    await repo.writer.drain(max(deadline - asyncio.get_running_loop().time(), 0))
+
+    await bot.session.close()
+    await engine.dispose()
+    await archive_engine.dispose()
+    logger.info("Бот корректно остановлен")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global bot_task
     try:
-        bot_task = asyncio.create_task(run_bot())
+        settings = get_settings()
+        startup_profiler.mark("load settings")
+        loop_watchdog.configure(
+            interval=settings.loop_watchdog_interval_ms / 1000,
+            threshold=settings.loop_lag_threshold_ms / 1000,
+        )
+        loop_watchdog.start()
+        polling_leader.try_acquire()
+        log_runtime_report(runtime_report(settings, polling_leader))
+        bot_task = asyncio.create_task(run_bot_when_leader())
         logger.info("Бот запущен через FastAPI lifespan")
         yield
     finally:
         if bot_task:
-            bot_task.cancel()
-            try:
-                await bot_task
-            except asyncio.CancelledError:
-                logger.info("Бот корректно остановлен")
+            await shutdown_bot(get_settings().shutdown_timeout)
+        polling_leader.release()
+        await loop_watchdog.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -80,11 +230,153 @@ app = FastAPI(lifespan=lifespan)
 async def root():
     return {"status": "running", "service": "MyDialogue Telegram Bot"}
 
+
+def require_api_token(x_api_token: str = Header("")):
+    api_token = get_settings().api_token
+    if not api_token or x_api_token != api_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/stats", dependencies=[Depends(require_api_token)])
+async def stats(days: int = Query(7, ge=1, le=365)):
+    from repository import repo
+
+    return await repo.get_stats_summary(days)
+
+
+@app.get("/debug/startup", dependencies=[Depends(require_api_token)])
+async def startup_report():
+    return startup_profiler.report()
+
+
+@app.get("/debug/loop", dependencies=[Depends(require_api_token)])
+async def loop_report():
+    return loop_watchdog.report()
+
+
+@app.get("/debug/runtime", dependencies=[Depends(require_api_token)])
+async def runtime_info():
+    return runtime_report(get_settings(), polling_leader)
+
+
+@app.get("/debug/traces", dependencies=[Depends(require_api_token)])
+async def traces_report(
+    limit: int = Query(50, ge=1, le=500),
+    min_ms: float = Query(0, ge=0),
+    handler: str = Query(None),
+):
+    from tracing import tracer
+
+    return {"tracer": tracer.report(), "traces": tracer.recent(limit, min_ms, handler)}
+
+
+@app.get("/debug/http", dependencies=[Depends(require_api_token)])
+async def http_report():
+    from storage import bot
+
+    return bot.session.stats()
+
+
+@app.get("/debug/cache", dependencies=[Depends(require_api_token)])
+async def cache_report():
+    from repository import repo
+
+    return repo.cache_stats()
+
+
+@app.get("/debug/writes", dependencies=[Depends(require_api_token)])
+async def writes_report():
+    from repository import repo
+
+    return repo.writer.report()
+
+
+@app.get("/debug/topics", dependencies=[Depends(require_api_token)])
+async def topics_report():
+    from roster import admin_roster
+    from topics import topic_classifier
+
+    return {"classifier": topic_classifier.report(), "specialists": admin_roster.report()["topics"]}
+
+
+@app.get("/debug/crisis", dependencies=[Depends(require_api_token)])
+async def crisis_report():
+    from crisis import crisis_matcher
+
+    return crisis_matcher.report()
+
+
+@app.post("/admins/reload", dependencies=[Depends(require_api_token)])
+async def reload_admins():
+    from roster import admin_roster
+
+    await admin_roster.load()
+    return admin_roster.report()
+
+
+@app.get("/audit/{entity_type}/{entity_id}", dependencies=[Depends(require_api_token)])
+async def audit_events(entity_type: str, entity_id: int, limit: int = Query(100, ge=1, le=1000)):
+    from audit import audit_log
+
+    events = await audit_log.get_events(entity_type, entity_id, limit)
+    return [
+        {
+            "id": event.id,
+            "created_at": event.created_at.isoformat(),
+            "actor_id": event.actor_id,
+            "action": event.action,
+            "payload": event.payload,
+        }
+        for event in events
+    ]
+
+
+@app.get("/export/{kind}", dependencies=[Depends(require_api_token)])
+async def export(
+    kind: str,
+    fmt: str = Query("csv"),
+    date_from: str = Query(None),
+    date_to: str = Query(None),
+    status: str = Query(None),
+):
+    from export import EXPORT_FORMATS, EXPORT_MODELS, iter_export, parse_date
+
+    if kind not in EXPORT_MODELS or fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    try:
+        start, end = parse_date(date_from), parse_date(date_to)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Dates must be YYYY-MM-DD")
+    return StreamingResponse(
+        iter_export(kind, fmt, start, end, status),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{fmt}"'},
+    )
+
 def start_fastapi():
+    import uvicorn
+
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    logger.info(f"Starting FastAPI server at http://{host}:{port}")
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    runtime = resolve_runtime(get_settings())
+    logger.info(
+        f"Starting FastAPI server at http://{host}:{port} "
+        f"(profile={runtime['profile']}, loop={runtime['loop']}, http={runtime['http']}, "
+        f"workers={runtime['workers']})"
+    )
+    # Несколько воркеров uvicorn запускает только по строке импорта приложения.
+    # Цикл событий выбранного типа uvicorn создаёт в каждом воркере до lifespan,
+    # то есть до запуска задачи бота.
+    uvicorn.run(
+        "main:app" if runtime["workers"] > 1 else app,
+        host=host,
+        port=port,
+        loop=runtime["loop"],
+        http=runtime["http"],
+        workers=runtime["workers"],
+        backlog=runtime["backlog"],
+        log_level="info",
+    )
 
 if __name__ == "__main__":
-    start_fastapi()
\ No newline at end of file
+    start_fastapi()
@@ -0,0 +1,239 @@
+import asyncio
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from callbacks import Action, Entity, action_button
+from logger import error_logger, logger
+from repository import repo
+from roster import admin_roster
+from topics import topic_title
+from tracing import untraced_task
+
+STATUS_EMOJI = {
+    "новая": "🆕",
+    "принята": "✅",
+    "отклонена": "❌",
+    "на_доработке": "✏️",
+}
+
+
+def format_application(application, actor_id: int = None) -> str:
+    text = (
+        ("🚨 <b>СРОЧНО: признаки кризиса</b>\n" if application.priority else "")
+        + f"{STATUS_EMOJI.get(application.status, '📩')} Заявка №{application.id}\n"
+        f"<b>Тип</b>: {application.request_type}\n"
+        f"<b>Имя</b>: {application.name}\n"
+        f"<b>Телефон</b>: {application.phone or 'не указан'}\n"
+        f"<b>Описание</b>: {application.description}\n"
+        f"<b>E-mail</b>: {application.email}\n"
+        f"<b>Telegram</b>: {application.tg_account or 'не указан'}\n"
+        f"<b>Статус</b>: {application.status}\n"
+    )
+    if application.admin_comment:
+        text += f"\n📋 Комментарий админа: {application.admin_comment}"
+    if actor_id is not None:
+        text += f"\n👤 Обработал администратор <code>{actor_id}</code>"
+    return text
+
+
+def application_markup(app_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                action_button("Принять", Action.ACCEPT, Entity.APPLICATION, app_id),
+                action_button("Отклонить", Action.REJECT, Entity.APPLICATION, app_id),
+            ]
+        ]
+    )
+
+
+async def notify_admin_about_application(bot, application):
+    """
+    Рассылает заявку всем администраторам и запоминает доставленные сообщения,
+    чтобы после решения одного администратора обновить копии у остальных.
+    """
+    text = format_application(application)
+    markup = application_markup(application.id)
+    delivered = []
+    for admin_id in admin_roster:
+        try:
+            sent_message = await bot.send_message(
+                chat_id=admin_id, text=text, parse_mode="HTML", reply_markup=markup
+            )
+        except Exception as e:
+            error_logger.error(
+                f"Не удалось отправить уведомление администратору {admin_id}: {e}"
+            )
+            continue
+        delivered.append((admin_id, sent_message.message_id))
+    await repo.add_admin_messages("application", application.id, delivered)
+
+
+def crisis_note(terms: Iterable[str]) -> str:
+    return f"🚨 <b>СРОЧНО: признаки кризиса</b> ({', '.join(terms)})\n\n"
+
+
+async def escalate_crisis(bot, entity_type: str, entity_id: int, terms: Iterable[str]) -> int:
+    """
+    Срочное оповещение всех администраторов об обращении с признаками
+    острого кризиса. Рассылается параллельно и до обычной рассылки карточки,
+    которая идёт по одному администратору. Возвращает число доставленных.
+    """
+    label = "Заявка" if entity_type == "application" else "Вопрос"
+    text = (
+        f"🚨 <b>СРОЧНО</b>: {label} №{entity_id} — признаки острого кризиса "
+        f"({', '.join(terms)}). Карточка придёт следующим сообщением."
+    )
+    admin_ids = admin_roster.ordered
+    results = await asyncio.gather(
+        *(bot.send_message(admin_id, text, parse_mode="HTML") for admin_id in admin_ids),
+        return_exceptions=True,
+    )
+    for admin_id, result in zip(admin_ids, results):
+        if isinstance(result, Exception):
+            error_logger.error(
+                f"Не удалось отправить срочное оповещение ({label} №{entity_id}) "
+                f"администратору {admin_id}: {result}"
+            )
+    delivered = sum(not isinstance(result, Exception) for result in results)
+    logger.warning(f"{label} №{entity_id}: признаки кризиса, оповещено {delivered} администраторов")
+    return delivered
+
+
+def format_question(
+    question_id: int,
+    question_text: str,
+    topic: Optional[str] = None,
+    confidence: float = 0.0,
+    note: str = "",
+) -> str:
+    topic_line = f"🏷 Тема: {topic_title(topic)} ({confidence:.0%})\n\n" if topic else ""
+    return (
+        f"🆕 Новый анонимный вопрос №{question_id}\n\n"
+        f"{topic_line}"
+        f"{note}"
+        f"<b>❓ ВОПРОС:</b>\n"
+        f"<i>«{question_text}»</i>\n\n"
+        "💬 Просто ответьте на это сообщение, чтобы отправить ответ в группу."
+    )
+
+
+async def notify_admins_about_question(
+    bot, question_id: int, text: str, recipients: Iterable[int]
+) -> List[int]:
+    """
+    Рассылает вопрос выбранным администраторам и запоминает сообщения,
+    чтобы по ответу на них найти вопрос. Возвращает, кому доставлено.
+    """
+    delivered = []
+    for admin_id in recipients:
+        try:
+            sent_message = await bot.send_message(admin_id, text, parse_mode="HTML")
+        except Exception as e:
+            error_logger.error(
+                f"Не удалось отправить вопрос №{question_id} администратору {admin_id}: {e}"
+            )
+            continue
+        delivered.append((admin_id, sent_message.message_id))
+    await repo.add_admin_messages("question", question_id, delivered)
+    return [admin_id for admin_id, _ in delivered]
+
+
+class AdminMessageSync:
+    """
+    Очередь правок уже разосланных уведомлений. Правки выполняются фоновой
+    задачей не чаще rate в секунду; при ответе 429 задача выжидает retry_after
+    и повторяет правку.
+    """
+
+    def __init__(self, rate: float = 20):
+        self.rate = rate
+        self.edited = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, rate: float):
+        self.rate = rate
+
+    async def sync_application(
+        self, bot, app_id: int, actor_id: int = None, extra: Iterable[Tuple[int, int]] = ()
+    ):
+        """
+        Ставит в очередь замену всех копий уведомления о заявке на итоговый
+        статус без кнопок. extra — сообщения, которых нет в БД (например,
+        разосланные до появления учёта копий).
+        """
+        application = await repo.get_application(app_id)
+        if application is None:
+            return
+        text = format_application(application, actor_id)
+        messages = dict.fromkeys(await repo.get_admin_messages("application", app_id))
+        messages.update(dict.fromkeys(extra))
+        for chat_id, message_id in messages:
+            self._queue.put_nowait((bot, chat_id, message_id, text))
+        if self._task is None or self._task.done():
+            self._task = untraced_task(self._run())
+
+    async def _run(self):
+        interval = 1 / self.rate if self.rate > 0 else 0
+        next_at = 0.0
+        while True:
+            bot, chat_id, message_id, text = await self._queue.get()
+            try:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_at = time.monotonic() + interval
+                await self._edit(bot, chat_id, message_id, text)
+            finally:
+                self._queue.task_done()
+
+    async def _edit(self, bot, chat_id: int, message_id: int, text: str):
+        for _ in range(3):
+            try:
+                await bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    text=text,
+                    parse_mode="HTML",
+                    reply_markup=None,
+                )
+                self.edited += 1
+                return
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                # Сообщение удалено или уже в итоговом виде
+                logger.info(f"Уведомление {chat_id}/{message_id} не обновлено: {e.message}")
+                return
+            except Exception as e:
+                error_logger.error(f"Ошибка обновления уведомления {chat_id}/{message_id}: {e}")
+                break
+        self.failed += 1
+
+    async def drain(self, timeout: float) -> bool:
+        if self._task is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Остановка: не обновлено {self._queue.qsize()} уведомлений")
+            return False
+        finally:
+            self._task.cancel()
+
+    def report(self) -> dict:
+        return {
+            "rate": self.rate,
+            "queued": self._queue.qsize(),
+            "edited": self.edited,
+            "failed": self.failed,
+        }
+
+
+admin_message_sync = AdminMessageSync()
@@ -0,0 +1,196 @@
+"""
+Воспроизведение записанных апдейтов (CAPTURE_UPDATES) для проверки
+производительности новой сборки на реальном профиле нагрузки.
+
+    python replay.py updates.jsonl.gz              # в темпе записи
+    python replay.py updates.jsonl.gz --speed 10   # в 10 раз быстрее
+    python replay.py updates.jsonl.gz --speed max  # без пауз
+    python replay.py updates.jsonl.gz --db backup/bot_data.db
+
+Апдейты проходят через тот же диспетчер, что и в боте, но на временной
+копии БД и с заглушкой вместо Telegram API. Апдейты одного чата
+обрабатываются по порядку, разных чатов — параллельно, как при polling.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from capture import read_capture
+
+
+def _percentile(samples, q: float) -> float:
+    return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+class HandlerStats:
+    """
+    Внутренний middleware: время и число SQL-запросов на каждый обработчик.
+    Запросы считаются за всё время работы обработчика, поэтому при
+    параллельной обработке в них попадают и запросы соседей.
+    """
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.latencies = defaultdict(list)
+        self.query_counts = defaultdict(int)
+        self.errors = defaultdict(int)
+
+    async def __call__(self, handler, event, data):
+        callback = data.get("dispatch_handler") or data.get("action_handler")
+        if callback is None:
+            callback = getattr(data.get("handler"), "callback", None)
+        name = getattr(callback, "__qualname__", repr(callback))
+        queries_before = self.queries.count
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.latencies[name].append((time.perf_counter() - started) * 1000)
+            self.query_counts[name] += self.queries.count - queries_before
+
+    def report(self) -> list:
+        rows = []
+        for name, samples in sorted(self.latencies.items(), key=lambda item: -len(item[1])):
+            samples = sorted(samples)
+            rows.append(
+                {
+                    "handler": name,
+                    "calls": len(samples),
+                    "p50_ms": round(_percentile(samples, 0.5), 2),
+                    "p95_ms": round(_percentile(samples, 0.95), 2),
+                    "max_ms": round(samples[-1], 2),
+                    "queries_per_call": round(self.query_counts[name] / len(samples), 2),
+                    "errors": self.errors[name],
+                }
+            )
+        return rows
+
+
+async def replay(records, header: dict, speed: float) -> dict:
+    from aiogram import Dispatcher
+    from aiogram.dispatcher.event.bases import UNHANDLED
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Update
+
+    import main
+    from bench import EchoSession, QueryCounter
+    from database import archive_engine, engine, init_db
+    from dedup import question_index
+    from repository import repo
+    from roster import admin_roster
+    from storage import bot
+
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    await init_db()
+    captured_admins = set(header["admins"])
+    for admin_id in await repo.get_admin_ids():
+        if admin_id not in captured_admins:
+            await repo.remove_admin(admin_id)
+    await repo.add_admins(captured_admins)
+    if header.get("group_id"):
+        await admin_roster.set_group_id(header["group_id"])
+    await admin_roster.load()
+    await question_index.load()
+
+    bot.session = EchoSession()
+    queries = QueryCounter(engine)
+    stats = HandlerStats(queries)
+    dp = Dispatcher(storage=MemoryStorage())
+    main.include_routers(dp)
+    dp.message.middleware(stats)
+    dp.callback_query.middleware(stats)
+
+    counters = {"updates": 0, "unhandled": 0, "failed": 0, "max_lag_ms": 0.0}
+    chat_tails = {}
+
+    async def feed(update: Update, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            result = await dp.feed_update(bot, update)
+        except Exception:
+            counters["failed"] += 1
+            return
+        if result is UNHANDLED:
+            counters["unhandled"] += 1
+
+    started = time.perf_counter()
+    for offset, data in records:
+        if speed:
+            lag = time.perf_counter() - started - offset / speed
+            if lag < 0:
+                await asyncio.sleep(-lag)
+            else:
+                counters["max_lag_ms"] = max(counters["max_lag_ms"], lag * 1000)
+        update = Update.model_validate(data, context={"bot": bot})
+        chat = update.event.chat.id if getattr(update.event, "chat", None) else None
+        if chat is None and getattr(update.event, "from_user", None):
+            chat = update.event.from_user.id
+        chat_tails[chat] = asyncio.create_task(feed(update, chat_tails.get(chat)))
+        counters["updates"] += 1
+    await asyncio.gather(*chat_tails.values())
+    elapsed = time.perf_counter() - started
+
+    await repo.writer.drain(5)
+    await engine.dispose()
+    await archive_engine.dispose()
+    return {
+        "speed": speed or "max",
+        **counters,
+        "max_lag_ms": round(counters["max_lag_ms"], 1),
+        "seconds": round(elapsed, 2),
+        "updates_per_s": round(counters["updates"] / elapsed, 1) if elapsed else 0.0,
+        "db_queries": queries.count,
+        "api_calls": bot.session.calls,
+        "handlers": stats.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных апдейтов")
+    parser.add_argument("capture", help="файл, записанный при CAPTURE_UPDATES")
+    parser.add_argument("--speed", default="1", help="множитель темпа или max")
+    parser.add_argument(
+        "--db",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_data.db"),
+        help="БД, копия которой используется (по умолчанию bot_data.db бота)",
+    )
+    args = parser.parse_args()
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    if speed < 0:
+        parser.error("--speed должен быть положительным или max")
+
+    header, records = read_capture(args.capture)
+    with tempfile.TemporaryDirectory() as scratch:
+        database_path = os.path.join(scratch, "bot_data.db")
+        if os.path.exists(args.db):
+            shutil.copyfile(args.db, database_path)
+        # До импорта модулей бота: пути БД и токен читаются при импорте
+        os.environ.update(
+            DATABASE_PATH=database_path,
+            ARCHIVE_DATABASE_PATH=os.path.join(scratch, "bot_archive.db"),
+            BOT_TOKEN=f"{header['bot_id']}:replay",
+            ADMIN_CHAT_IDS=",".join(map(str, header["admins"])) or "1",
+            GROUP_ID=str(header.get("group_id") or 1),
+            CAPTURE_UPDATES="",
+        )
+        result = asyncio.run(replay(records, header, speed))
+
+    handlers = result.pop("handlers")
+    print(result)
+    for row in handlers:
+        print(row)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
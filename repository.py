@@ -0,0 +1,700 @@
+import datetime
+from datetime import timezone
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, bindparam, cast, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from cache import TTLCache
+from database import (
+    QUESTION_REQUEST_TYPE,
+    Admin,
+    AdminMessage,
+    AnswerDraft,
+    Application,
+    AuditEvent,
+    BotSetting,
+    DailyStat,
+    Question,
+    ResponseTimeStat,
+    engine,
+    utcnow,
+)
+from write_queue import WriteQueue
+
+DRAFT_SEPARATOR = "\n\n"
+USER_HISTORY_LIMIT = 10
+ROSTER_VERSION_KEY = "roster_version"
+
+applications = Application.__table__
+questions = Question.__table__
+admin_messages = AdminMessage.__table__
+answer_drafts = AnswerDraft.__table__
+audit_events = AuditEvent.__table__
+admins = Admin.__table__
+bot_settings = BotSetting.__table__
+
+_INSERT_APPLICATION = insert(applications).returning(*applications.c)
+_SELECT_APPLICATION = select(applications).where(applications.c.id == bindparam("b_id"))
+_SET_APPLICATION_STATUS = (
+    update(applications)
+    .where(applications.c.id == bindparam("b_id"))
+    .values(
+        status=bindparam("b_status"),
+        admin_comment=func.coalesce(
+            bindparam("b_comment"), applications.c.admin_comment
+        ),
+    )
+    .returning(
+        applications.c.user_id, applications.c.request_type, applications.c.created_at
+    )
+)
+_CAS_APPLICATION_STATUS = _SET_APPLICATION_STATUS.where(
+    applications.c.status == bindparam("b_expected")
+)
+
+_INSERT_QUESTION = insert(questions).returning(questions.c.id)
+_SELECT_QUESTION = select(questions).where(questions.c.id == bindparam("b_id"))
+_SET_QUESTION_TOPIC = (
+    update(questions)
+    .where(questions.c.id == bindparam("b_id"))
+    .values(topic=bindparam("b_topic"), topic_by_admin=bindparam("b_by_admin"))
+)
+_SELECT_QUESTION_BY_ADMIN_MESSAGE = (
+    select(questions)
+    .join(
+        admin_messages,
+        (admin_messages.c.entity_type == "question")
+        & (admin_messages.c.entity_id == questions.c.id),
+    )
+    .where(
+        admin_messages.c.chat_id == bindparam("b_chat_id"),
+        admin_messages.c.message_id == bindparam("b_message_id"),
+    )
+)
+_INSERT_ADMIN_MESSAGE = insert(admin_messages)
+
+_DRAFT_FILTER = (answer_drafts.c.question_id == bindparam("b_question_id")) & (
+    answer_drafts.c.admin_id == bindparam("b_admin_id")
+)
+_INSERT_DRAFT = insert(answer_drafts)
+_DELETE_DRAFT = delete(answer_drafts).where(_DRAFT_FILTER)
+_SELECT_DRAFT = select(answer_drafts.c.text).where(_DRAFT_FILTER).order_by(answer_drafts.c.id)
+_SELECT_DRAFT_LENGTH = select(
+    func.coalesce(func.sum(func.length(answer_drafts.c.text)), 0), func.count()
+).where(_DRAFT_FILTER)
+
+
+async def record_status_change(
+    conn: AsyncConnection,
+    entity: str,
+    request_type: str,
+    status: str,
+    created_at: datetime.datetime = None,
+):
+    """
+    Инкрементально обновляет агрегаты статистики в рамках текущей транзакции.
+    Если передан created_at, учитывает время реакции с момента создания записи.
+    """
+    now = utcnow()
+    key = dict(
+        day=now.date(), entity=entity, request_type=request_type or "", status=status
+    )
+
+    stmt = sqlite_insert(DailyStat).values(count=1, **key)
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(key), set_={"count": DailyStat.count + 1}
+        )
+    )
+
+    if created_at is None:
+        return
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    seconds = max((now - created_at).total_seconds(), 0.0)
+    stmt = sqlite_insert(ResponseTimeStat).values(
+        samples=1, total_seconds=seconds, max_seconds=seconds, **key
+    )
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                "samples": ResponseTimeStat.samples + 1,
+                "total_seconds": ResponseTimeStat.total_seconds + seconds,
+                "max_seconds": func.max(ResponseTimeStat.max_seconds, seconds),
+            },
+        )
+    )
+
+
+async def _bump_roster_version(conn: AsyncConnection):
+    stmt = sqlite_insert(bot_settings).values(key=ROSTER_VERSION_KEY, value="1")
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": cast(cast(bot_settings.c.value, Integer) + 1, bot_settings.c.value.type)},
+        )
+    )
+
+
+class SQLAlchemyRepository:
+    """
+    Единая точка доступа к данным для обработчиков.
+    Горячие однострочные операции выполняются заранее построенными Core-выражениями
+    (их компиляция кэшируется SQLAlchemy), без ORM-сессии и identity map.
+    Все изменения идут через очередь групповой фиксации writer.
+    Чтобы сменить СУБД, достаточно передать другой движок.
+    """
+
+    def __init__(self, engine: AsyncEngine, batch_window: float = 0.002, batch_max: int = 100):
+        self.engine = engine
+        self.writer = WriteQueue(engine, window=batch_window, max_batch=batch_max)
+        self.application_cache = TTLCache(maxsize=1024, ttl=300)
+        self.question_cache = TTLCache(maxsize=1024, ttl=300)
+        self.user_history_cache = TTLCache(maxsize=2048, ttl=600)
+
+    def cache_stats(self) -> dict:
+        return {
+            "applications": self.application_cache.stats(),
+            "questions": self.question_cache.stats(),
+            "user_history": self.user_history_cache.stats(),
+        }
+
+    def invalidate_user_history(self, user_id: int):
+        self.user_history_cache.invalidate(user_id)
+
+    def invalidate_rows(self, entity_type: str, ids: Iterable[int]):
+        cache = self.question_cache if entity_type == "question" else self.application_cache
+        for row_id in ids:
+            cache.invalidate(row_id)
+
+    async def create_application(
+        self, user_id: int, username: str, data: dict, priority: bool = False
+    ) -> Row:
+        async def write(conn: AsyncConnection) -> Row:
+            application = (
+                await conn.execute(
+                    _INSERT_APPLICATION,
+                    {
+                        "user_id": user_id,
+                        "username": username or "",
+                        "request_type": data.get("request_type", ""),
+                        "name": data.get("name", ""),
+                        "phone": data.get("phone", ""),
+                        "description": data.get("description", ""),
+                        "email": data.get("email", ""),
+                        "tg_account": data.get("tg_account", ""),
+                        "status": "новая",
+                        "priority": priority or None,
+                    },
+                )
+            ).one()
+            await record_status_change(
+                conn, "application", application.request_type, application.status
+            )
+            return application
+
+        application = await self.writer.submit(write)
+        self.invalidate_user_history(user_id)
+        return application
+
+    async def get_application(self, app_id: int) -> Optional[Row]:
+        application = self.application_cache.get(app_id)
+        if application is not None:
+            return application
+        async with self.engine.connect() as conn:
+            application = (
+                await conn.execute(_SELECT_APPLICATION, {"b_id": app_id})
+            ).one_or_none()
+        if application is not None:
+            self.application_cache.set(app_id, application)
+        return application
+
+    async def set_application_status(
+        self,
+        app_id: int,
+        status: str,
+        admin_comment: str = None,
+        expected_status: str = None,
+    ) -> bool:
+        """
+        Переводит заявку в новый статус одним UPDATE, без предварительного чтения.
+        Если передан expected_status, статус меняется только из него (compare-and-set),
+        так что из двух одновременных решений администраторов применится одно.
+        Возвращает True, если заявка обновлена.
+        """
+        params = {"b_id": app_id, "b_status": status, "b_comment": admin_comment or None}
+        stmt = _SET_APPLICATION_STATUS
+        if expected_status is not None:
+            stmt = _CAS_APPLICATION_STATUS
+            params["b_expected"] = expected_status
+
+        async def write(conn: AsyncConnection) -> Optional[Row]:
+            row = (await conn.execute(stmt, params)).one_or_none()
+            if row is not None:
+                await record_status_change(
+                    conn, "application", row.request_type, status, created_at=row.created_at
+                )
+            return row
+
+        row = await self.writer.submit(write)
+        self.application_cache.invalidate(app_id)
+        if row is None:
+            return False
+        self.invalidate_user_history(row.user_id)
+        return True
+
+    async def create_question(
+        self, user_id: int, question_text: str, topic: str = None, priority: bool = False
+    ) -> int:
+        async def write(conn: AsyncConnection) -> int:
+            question_id = (
+                await conn.execute(
+                    _INSERT_QUESTION,
+                    {
+                        "user_id": user_id,
+                        "question_text": question_text,
+                        "topic": topic,
+                        "priority": priority or None,
+                        "status": "ожидает",
+                    },
+                )
+            ).scalar_one()
+            await record_status_change(conn, "question", QUESTION_REQUEST_TYPE, "ожидает")
+            return question_id
+
+        question_id = await self.writer.submit(write)
+        self.invalidate_user_history(user_id)
+        return question_id
+
+    async def get_question(self, question_id: int) -> Optional[Row]:
+        question = self.question_cache.get(question_id)
+        if question is not None:
+            return question
+        async with self.engine.connect() as conn:
+            question = (
+                await conn.execute(_SELECT_QUESTION, {"b_id": question_id})
+            ).one_or_none()
+        if question is not None:
+            self.question_cache.set(question_id, question)
+        return question
+
+    async def get_questions(self, ids: Sequence[int]) -> List[Row]:
+        if not ids:
+            return []
+        async with self.engine.connect() as conn:
+            result = await conn.execute(select(questions).where(questions.c.id.in_(ids)))
+            return result.all()
+
+    async def iter_question_texts(self, batch_size: int = 500) -> AsyncIterator[Tuple[int, str]]:
+        async with self.engine.connect() as conn:
+            result = await conn.stream(
+                select(questions.c.id, questions.c.question_text).execution_options(
+                    yield_per=batch_size
+                )
+            )
+            async for question_id, question_text in result:
+                yield question_id, question_text
+
+    async def add_admin_messages(
+        self, entity_type: str, entity_id: int, messages: Iterable[Tuple[int, int]]
+    ):
+        rows = [
+            {
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "chat_id": chat_id,
+                "message_id": message_id,
+            }
+            for chat_id, message_id in messages
+        ]
+        if not rows:
+            return
+
+        async def write(conn: AsyncConnection):
+            await conn.execute(_INSERT_ADMIN_MESSAGE, rows)
+
+        await self.writer.submit(write)
+
+    async def get_admin_messages(self, entity_type: str, entity_id: int) -> List[Tuple[int, int]]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(admin_messages.c.chat_id, admin_messages.c.message_id)
+                .where(
+                    admin_messages.c.entity_type == entity_type,
+                    admin_messages.c.entity_id == entity_id,
+                )
+                .order_by(admin_messages.c.id)
+            )
+            return [tuple(row) for row in result]
+
+    async def delete_archived_rows(
+        self, entity_type: str, ids: Sequence[int], condition
+    ) -> List[int]:
+        """
+        Удаляет перенесённые в архив записи вместе с их уведомлениями.
+        condition — условие отбора в архив: запись, изменившаяся после чтения
+        (например, вернувшаяся в работу), не удаляется. Возвращает id удалённых.
+        """
+        table = questions if entity_type == "question" else applications
+
+        async def write(conn: AsyncConnection) -> List[int]:
+            deleted = (
+                await conn.execute(
+                    delete(table)
+                    .where(table.c.id.in_(ids), condition)
+                    .returning(table.c.id)
+                )
+            ).scalars().all()
+            if deleted:
+                await conn.execute(
+                    delete(admin_messages).where(
+                        admin_messages.c.entity_type == entity_type,
+                        admin_messages.c.entity_id.in_(deleted),
+                    )
+                )
+            return deleted
+
+        deleted = await self.writer.submit(write)
+        self.invalidate_rows(entity_type, ids)
+        return deleted
+
+    async def get_question_by_admin_message(
+        self, chat_id: int, message_id: int
+    ) -> Optional[Row]:
+        async with self.engine.connect() as conn:
+            return (
+                await conn.execute(
+                    _SELECT_QUESTION_BY_ADMIN_MESSAGE,
+                    {"b_chat_id": chat_id, "b_message_id": message_id},
+                )
+            ).first()
+
+    async def update_question_answer(
+        self, question_id: int, answer_text: str, status: str = "отвечен"
+    ):
+        async def write(conn: AsyncConnection) -> Optional[Row]:
+            question = (
+                await conn.execute(_SELECT_QUESTION, {"b_id": question_id})
+            ).one_or_none()
+            if question is None:
+                return None
+            values = {"answer_text": answer_text}
+            if question.status != status:
+                values["status"] = status
+                if status == "завершен":
+                    values["answered_at"] = utcnow()
+                await record_status_change(
+                    conn,
+                    "question",
+                    QUESTION_REQUEST_TYPE,
+                    status,
+                    created_at=question.created_at,
+                )
+            await conn.execute(
+                update(questions).where(questions.c.id == question_id).values(**values)
+            )
+            return question
+
+        question = await self.writer.submit(write)
+        if question is None:
+            return
+        self.question_cache.invalidate(question_id)
+        self.invalidate_user_history(question.user_id)
+
+    async def iter_labeled_questions(self, batch_size: int = 500) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Пары (текст, тема) для обучения классификатора — только вопросы,
+        тему которых указал администратор. Темы, выставленные самим
+        классификатором, не берутся: иначе он закреплял бы свои же ошибки.
+        """
+        async with self.engine.connect() as conn:
+            result = await conn.stream(
+                select(questions.c.question_text, questions.c.topic)
+                .where(questions.c.topic.is_not(None), questions.c.topic_by_admin.is_(True))
+                .execution_options(yield_per=batch_size)
+            )
+            async for question_text, topic in result:
+                yield question_text or "", topic
+
+    async def get_pending_questions(self) -> List[Row]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(
+                    questions.c.id,
+                    questions.c.question_text,
+                    questions.c.topic,
+                    questions.c.topic_by_admin,
+                )
+                .where(questions.c.status == "ожидает")
+                # Срочные первыми: NULL в SQLite меньше любого значения
+                .order_by(questions.c.priority.desc(), questions.c.id)
+            )
+            return result.all()
+
+    async def set_question_topics(
+        self, topics: Sequence[Tuple[int, Optional[str]]], by_admin: bool = False
+    ):
+        """
+        Меняет темы нескольких вопросов одним executemany.
+        """
+        if not topics:
+            return
+
+        async def write(conn: AsyncConnection):
+            await conn.execute(
+                _SET_QUESTION_TOPIC,
+                [
+                    {"b_id": question_id, "b_topic": topic, "b_by_admin": by_admin or None}
+                    for question_id, topic in topics
+                ],
+            )
+
+        await self.writer.submit(write)
+        self.invalidate_rows("question", [question_id for question_id, _ in topics])
+
+    async def get_pending_questions_count(self) -> int:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(func.count(questions.c.id)).where(questions.c.status == "ожидает")
+            )
+            return result.scalar()
+
+    async def get_user_history(self, user_id: int, limit: int = USER_HISTORY_LIMIT) -> dict:
+        """
+        Возвращает последние заявки и вопросы пользователя.
+        Результат кэшируется и сбрасывается при любом изменении статуса его записей.
+        """
+        history = self.user_history_cache.get(user_id)
+        if history is not None:
+            return history
+
+        async with self.engine.connect() as conn:
+            user_applications = await conn.execute(
+                select(
+                    applications.c.id,
+                    applications.c.request_type,
+                    applications.c.status,
+                    applications.c.admin_comment,
+                    applications.c.created_at,
+                )
+                .where(applications.c.user_id == user_id)
+                .order_by(applications.c.created_at.desc())
+                .limit(limit)
+            )
+            user_questions = await conn.execute(
+                select(questions.c.id, questions.c.status, questions.c.created_at)
+                .where(questions.c.user_id == user_id)
+                .order_by(questions.c.created_at.desc())
+                .limit(limit)
+            )
+            history = {
+                "applications": [dict(row) for row in user_applications.mappings()],
+                "questions": [dict(row) for row in user_questions.mappings()],
+            }
+
+        self.user_history_cache.set(user_id, history)
+        return history
+
+    async def _get_draft_length(self, conn: AsyncConnection, params: dict) -> int:
+        total, segments = (await conn.execute(_SELECT_DRAFT_LENGTH, params)).one()
+        return total + len(DRAFT_SEPARATOR) * max(segments - 1, 0)
+
+    async def append_answer_draft(self, question_id: int, admin_id: int, text: str) -> int:
+        """
+        Добавляет фрагмент к черновику ответа и возвращает длину черновика целиком.
+        """
+        params = {"b_question_id": question_id, "b_admin_id": admin_id}
+
+        async def write(conn: AsyncConnection) -> int:
+            await conn.execute(
+                _INSERT_DRAFT,
+                {"question_id": question_id, "admin_id": admin_id, "text": text},
+            )
+            return await self._get_draft_length(conn, params)
+
+        return await self.writer.submit(write)
+
+    async def replace_answer_draft(self, question_id: int, admin_id: int, text: str) -> int:
+        async def write(conn: AsyncConnection):
+            await conn.execute(
+                _DELETE_DRAFT, {"b_question_id": question_id, "b_admin_id": admin_id}
+            )
+            await conn.execute(
+                _INSERT_DRAFT,
+                {"question_id": question_id, "admin_id": admin_id, "text": text},
+            )
+
+        await self.writer.submit(write)
+        return len(text)
+
+    async def get_answer_draft(self, question_id: int, admin_id: int) -> str:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                _SELECT_DRAFT, {"b_question_id": question_id, "b_admin_id": admin_id}
+            )
+            return DRAFT_SEPARATOR.join(result.scalars().all())
+
+    async def get_answer_draft_authors(self, question_id: int) -> List[int]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(answer_drafts.c.admin_id)
+                .where(answer_drafts.c.question_id == question_id)
+                .distinct()
+            )
+            return result.scalars().all()
+
+    async def delete_answer_drafts(self, question_id: int):
+        async def write(conn: AsyncConnection):
+            await conn.execute(
+                delete(answer_drafts).where(answer_drafts.c.question_id == question_id)
+            )
+
+        await self.writer.submit(write)
+
+    async def insert_audit_events(self, events: List[dict]):
+        async def write(conn: AsyncConnection):
+            await conn.execute(insert(audit_events), events)
+
+        await self.writer.submit(write)
+
+    async def get_audit_events(
+        self, entity_type: str, entity_id: int, limit: int = 100
+    ) -> List[Row]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(audit_events)
+                .where(
+                    audit_events.c.entity_type == entity_type,
+                    audit_events.c.entity_id == entity_id,
+                )
+                .order_by(audit_events.c.id)
+                .limit(limit)
+            )
+            return result.all()
+
+    async def get_admin_ids(self) -> List[int]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(select(admins.c.user_id).order_by(admins.c.id))
+            return result.scalars().all()
+
+    async def get_admin_topics(self) -> List[Tuple[int, Optional[str]]]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(admins.c.user_id, admins.c.topics).order_by(admins.c.id)
+            )
+            return [tuple(row) for row in result]
+
+    async def set_admin_topics(self, user_id: int, topics: Optional[str]) -> bool:
+        async def write(conn: AsyncConnection) -> bool:
+            result = await conn.execute(
+                update(admins).where(admins.c.user_id == user_id).values(topics=topics)
+            )
+            if not result.rowcount:
+                return False
+            await _bump_roster_version(conn)
+            return True
+
+        return await self.writer.submit(write)
+
+    async def add_admins(self, user_ids: Iterable[int], added_by: int = None) -> bool:
+        """
+        Добавляет администраторов, пропуская уже существующих.
+        Возвращает True, если состав изменился.
+        """
+        rows = [{"user_id": user_id, "added_by": added_by} for user_id in user_ids]
+        if not rows:
+            return False
+
+        async def write(conn: AsyncConnection) -> bool:
+            result = await conn.execute(
+                sqlite_insert(admins).on_conflict_do_nothing(index_elements=["user_id"]), rows
+            )
+            if not result.rowcount:
+                return False
+            await _bump_roster_version(conn)
+            return True
+
+        return await self.writer.submit(write)
+
+    async def remove_admin(self, user_id: int) -> bool:
+        async def write(conn: AsyncConnection) -> bool:
+            result = await conn.execute(delete(admins).where(admins.c.user_id == user_id))
+            if not result.rowcount:
+                return False
+            await _bump_roster_version(conn)
+            return True
+
+        return await self.writer.submit(write)
+
+    async def get_bot_settings(self) -> dict:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(select(bot_settings.c.key, bot_settings.c.value))
+            return dict(result.all())
+
+    async def get_bot_setting(self, key: str) -> Optional[str]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(bot_settings.c.value).where(bot_settings.c.key == key)
+            )
+            return result.scalar()
+
+    async def set_bot_setting(self, key: str, value: str):
+        stmt = sqlite_insert(bot_settings).values(key=key, value=value)
+
+        async def write(conn: AsyncConnection):
+            await conn.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={"value": stmt.excluded.value, "updated_at": utcnow()},
+                )
+            )
+            await _bump_roster_version(conn)
+
+        await self.writer.submit(write)
+
+    async def get_stats_summary(self, days: int = 7) -> dict:
+        """
+        Возвращает сводку за последние days дней, читая только агрегированные таблицы.
+        """
+        since = utcnow().date() - datetime.timedelta(days=days - 1)
+        summary = {"since": since.isoformat(), "days": days, "counts": {}, "response_time": {}}
+
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(
+                    DailyStat.request_type,
+                    DailyStat.status,
+                    func.sum(DailyStat.count),
+                )
+                .where(DailyStat.day >= since)
+                .group_by(DailyStat.entity, DailyStat.request_type, DailyStat.status)
+            )
+            for request_type, status, count in result:
+                summary["counts"].setdefault(request_type, {})[status] = count
+
+            result = await conn.execute(
+                select(
+                    ResponseTimeStat.request_type,
+                    ResponseTimeStat.status,
+                    func.sum(ResponseTimeStat.samples),
+                    func.sum(ResponseTimeStat.total_seconds),
+                    func.max(ResponseTimeStat.max_seconds),
+                )
+                .where(ResponseTimeStat.day >= since)
+                .group_by(ResponseTimeStat.request_type, ResponseTimeStat.status)
+            )
+            for request_type, status, samples, total_seconds, max_seconds in result:
+                summary["response_time"].setdefault(request_type, {})[status] = {
+                    "samples": samples,
+                    "avg_seconds": round(total_seconds / samples, 1) if samples else 0.0,
+                    "max_seconds": round(max_seconds, 1),
+                }
+
+        return summary
+
+
+repo = SQLAlchemyRepository(engine)
@@ -0,0 +1,203 @@
+"""
+Перенос старых обработанных записей в архивную базу с обезличиванием.
+
+Фоновая задача включается только явно: RETENTION_DAYS > 0.
+Перевод существующей базы в режим auto_vacuum=INCREMENTAL — отдельный
+шаг миграции с полным VACUUM, который блокирует базу; его запускают
+при остановленном боте:
+
+    python retention.py --enable-incremental-vacuum
+"""
+import argparse
+import asyncio
+import datetime
+import sys
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import get_settings
+from database import (
+    Application,
+    Question,
+    archive_engine,
+    archived_applications,
+    archived_questions,
+    engine,
+    utcnow,
+)
+from dedup import question_index
+from logger import error_logger, logger
+from repository import repo
+
+REDACTED = "[удалено]"
+INCREMENTAL_VACUUM_PAGES = 2000
+RETENTION_START_DELAY = 60
+
+RETENTION_TARGETS = (
+    (Application, archived_applications, ("принята", "отклонена"), Application.updated_at),
+    (
+        Question,
+        archived_questions,
+        ("отвечен", "завершен"),
+        func.coalesce(Question.answered_at, Question.created_at),
+    ),
+)
+
+
+def _entity_type(model) -> str:
+    return "question" if model is Question else "application"
+
+
+def redact_row(row: dict, fields) -> dict:
+    row = dict(row)
+    for field in fields:
+        if field not in row or row[field] is None:
+            continue
+        row[field] = None if field.endswith("_id") else REDACTED
+    return row
+
+
+async def _archive_batch(model, archive_table, statuses, last_activity, cutoff, batch_size):
+    table = model.__table__
+    condition = and_(model.status.in_(statuses), last_activity < cutoff)
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(*table.columns).where(condition).order_by(model.id).limit(batch_size)
+        )
+        rows = result.mappings().all()
+    if not rows:
+        return [], 0
+
+    ids = [row["id"] for row in rows]
+    archived = [redact_row(row, get_settings().retention_redact_fields) for row in rows]
+
+    async with archive_engine.begin() as conn:
+        stmt = sqlite_insert(archive_table)
+        await conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={c.name: stmt.excluded[c.name] for c in archive_table.columns if c.name != "id"},
+            ),
+            archived,
+        )
+
+    # Удаление — через очередь записи, как и все изменения основной БД
+    deleted = await repo.delete_archived_rows(_entity_type(model), ids, condition)
+    kept = set(ids).difference(deleted)
+    if kept:
+        # Записи изменились после чтения и остаются в работе: их копия в архиве устарела
+        async with archive_engine.begin() as conn:
+            await conn.execute(delete(archive_table).where(archive_table.c.id.in_(kept)))
+    return deleted, len(ids)
+
+
+async def _auto_vacuum_mode(conn) -> int:
+    return (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+
+
+async def enable_incremental_vacuum() -> bool:
+    """
+    Переводит базу в режим auto_vacuum=INCREMENTAL полным VACUUM.
+    Возвращает False, если база уже в этом режиме.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if await _auto_vacuum_mode(conn) == 2:
+            return False
+        await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        await conn.exec_driver_sql("VACUUM")
+    logger.info("База переведена в режим auto_vacuum=INCREMENTAL")
+    return True
+
+
+async def compact_database(pages: int = INCREMENTAL_VACUUM_PAGES) -> bool:
+    """
+    Возвращает освободившиеся страницы файлу БД через incremental_vacuum.
+    Полный VACUUM здесь не выполняется: если база не в режиме
+    auto_vacuum=INCREMENTAL, место не возвращается и пишется предупреждение.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if await _auto_vacuum_mode(conn) != 2:
+            logger.warning(
+                "База не в режиме auto_vacuum=INCREMENTAL, место после архивации не возвращено. "
+                "Остановите бота и выполните: python retention.py --enable-incremental-vacuum"
+            )
+            return False
+        await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+    return True
+
+
+async def archive_old_rows(days: int = None, batch_size: int = None) -> dict:
+    """
+    Переносит обработанные заявки и завершённые вопросы старше days дней
+    в архивную базу пачками по batch_size, обезличивая поля из RETENTION_REDACT_FIELDS.
+    Запись в архив идемпотентна, поэтому прерванный перенос безопасно повторить.
+    """
+    settings = get_settings()
+    days = settings.retention_days if days is None else days
+    batch_size = batch_size or settings.retention_batch_size
+    if days <= 0:
+        # Срок 0 означает «архивация выключена», а не «архивировать всё»
+        raise ValueError("Срок хранения должен быть больше нуля")
+    cutoff = utcnow() - datetime.timedelta(days=days)
+    moved = {}
+
+    for model, archive_table, statuses, last_activity in RETENTION_TARGETS:
+        total = 0
+        while True:
+            ids, selected = await _archive_batch(
+                model, archive_table, statuses, last_activity, cutoff, batch_size
+            )
+            if not selected:
+                break
+            if model is Question:
+                for row_id in ids:
+                    question_index.remove(row_id)
+            total += len(ids)
+            await asyncio.sleep(0)
+        moved[model.__tablename__] = total
+
+    if any(moved.values()):
+        await compact_database()
+    return moved
+
+
+async def run_retention_job(start_delay: float = RETENTION_START_DELAY):
+    await asyncio.sleep(start_delay)
+    while True:
+        try:
+            moved = await archive_old_rows()
+            logger.info(f"Архивация старых записей завершена: {moved}")
+        except Exception as e:
+            error_logger.error(f"Ошибка архивации старых записей: {e}", exc_info=True)
+        await asyncio.sleep(get_settings().retention_interval_hours * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание архивации старых записей")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="перевести bot_data.db в режим auto_vacuum=INCREMENTAL (полный VACUUM, бот должен быть остановлен)",
+    )
+    args = parser.parse_args()
+    if not args.enable_incremental_vacuum:
+        parser.print_help()
+        return 1
+
+    async def migrate():
+        try:
+            return await enable_incremental_vacuum()
+        finally:
+            await engine.dispose()
+            await archive_engine.dispose()
+
+    changed = asyncio.run(migrate())
+    print("Готово" if changed else "База уже в режиме auto_vacuum=INCREMENTAL")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
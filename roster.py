@@ -0,0 +1,116 @@
+import asyncio
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+from config import get_settings
+from logger import error_logger, logger
+from repository import ROSTER_VERSION_KEY, repo
+
+GROUP_ID_KEY = "group_id"
+
+
+class AdminRoster:
+    """
+    Состав администраторов и ID группы для публикаций, хранящиеся в БД.
+    Проверка членства — поиск во frozenset; любое изменение увеличивает версию
+    в bot_settings, и все процессы бота перечитывают состав, заметив новую версию.
+    При первом запуске таблица заполняется из ADMIN_CHAT_IDS и GROUP_ID.
+    У администратора могут быть темы вопросов: тогда он получает только вопросы
+    своих тем, а администраторы без тем — все вопросы.
+    """
+
+    def __init__(self):
+        self.ids: FrozenSet[int] = frozenset()
+        self.ordered: Tuple[int, ...] = ()
+        self.topics: Dict[int, FrozenSet[str]] = {}
+        self.group_id = 0
+        self.version = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ordered)
+
+    def __len__(self) -> int:
+        return len(self.ordered)
+
+    async def load(self):
+        settings = get_settings()
+        admins = await repo.get_admin_topics()
+        if not admins:
+            await repo.add_admins(settings.admin_chat_ids)
+            admins = await repo.get_admin_topics()
+        bot_settings = await repo.get_bot_settings()
+
+        self.ordered = tuple(admin_id for admin_id, _ in admins)
+        self.ids = frozenset(self.ordered)
+        self.topics = {
+            admin_id: frozenset(topics.split(",")) for admin_id, topics in admins if topics
+        }
+        self.group_id = int(bot_settings.get(GROUP_ID_KEY, settings.group_id))
+        self.version = int(bot_settings.get(ROSTER_VERSION_KEY, 0))
+        logger.info(
+            f"Состав администраторов загружен (версия {self.version}): {len(self.ids)} чел."
+        )
+
+    async def refresh(self) -> bool:
+        """
+        Перечитывает состав, если его версия в БД изменилась.
+        """
+        version = int(await repo.get_bot_setting(ROSTER_VERSION_KEY) or 0)
+        if version == self.version:
+            return False
+        await self.load()
+        return True
+
+    def recipients(self, topic: Optional[str]) -> Tuple[int, ...]:
+        """
+        Кому отправить вопрос с темой topic: администраторам без тем и тем,
+        кто ведёт эту тему. Если таких нет, вопрос получают все.
+        """
+        if topic is None:
+            return self.ordered
+        recipients = tuple(
+            admin_id
+            for admin_id in self.ordered
+            if admin_id not in self.topics or topic in self.topics[admin_id]
+        )
+        return recipients or self.ordered
+
+    async def set_topics(self, user_id: int, topics: Iterable[str]) -> bool:
+        changed = await repo.set_admin_topics(user_id, ",".join(sorted(topics)) or None)
+        await self.load()
+        return changed
+
+    async def add(self, user_id: int, added_by: int = None) -> bool:
+        changed = await repo.add_admins([user_id], added_by=added_by)
+        await self.load()
+        return changed
+
+    async def remove(self, user_id: int) -> bool:
+        changed = await repo.remove_admin(user_id)
+        await self.load()
+        return changed
+
+    async def set_group_id(self, group_id: int):
+        await repo.set_bot_setting(GROUP_ID_KEY, str(group_id))
+        await self.load()
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                error_logger.error(f"Не удалось обновить состав администраторов: {e}")
+
+    def report(self) -> dict:
+        return {
+            "version": self.version,
+            "admins": list(self.ordered),
+            "topics": {admin_id: sorted(topics) for admin_id, topics in self.topics.items()},
+            "group_id": self.group_id,
+        }
+
+
+admin_roster = AdminRoster()
@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import os
+
+from logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка лидера недоступна
+    fcntl = None
+
+RUNTIME_PROFILES = ("default", "fast")
+POLLING_LOCK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_polling.lock")
+
+
+def _available(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def resolve_runtime(settings) -> dict:
+    """
+    Выбирает реализацию цикла событий и HTTP-парсера uvicorn для профиля.
+    Профиль fast использует uvloop и httptools, если они установлены.
+    """
+    if settings.runtime_profile not in RUNTIME_PROFILES:
+        raise ValueError(
+            f"RUNTIME_PROFILE должен быть одним из: {', '.join(RUNTIME_PROFILES)}"
+        )
+    fast = settings.runtime_profile == "fast"
+    return {
+        "profile": settings.runtime_profile,
+        "loop": "uvloop" if fast and _available("uvloop") else "asyncio",
+        "http": "httptools" if fast and _available("httptools") else "h11",
+        "workers": settings.web_workers,
+        "backlog": settings.web_backlog,
+    }
+
+
+class PollingLeader:
+    """
+    Межпроцессная блокировка на файле: получать апдейты из Telegram может
+    только один воркер uvicorn, остальные обслуживают HTTP и ждут,
+    пока блокировка освободится.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_leader = False
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        self.is_leader = True
+        return True
+
+    async def wait(self, interval: float = 5):
+        while not self.try_acquire():
+            await asyncio.sleep(interval)
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.is_leader = False
+
+
+def runtime_report(settings, leader: PollingLeader) -> dict:
+    """
+    Какие быстрые пути реально работают в этом процессе.
+    """
+    from http_session import orjson
+
+    runtime = resolve_runtime(settings)
+    loop = asyncio.get_running_loop()
+    loop_module = type(loop).__module__.split(".")[0]
+    return {
+        **runtime,
+        "pid": os.getpid(),
+        "running_loop": loop_module if loop_module == "uvloop" else "asyncio",
+        "httptools_installed": _available("httptools"),
+        "orjson": orjson is not None and settings.bot_json != "json",
+        "polling_leader": leader.is_leader,
+    }
+
+
+def log_runtime_report(report: dict):
+    logger.info(
+        f"Профиль запуска {report['profile']}: цикл {report['running_loop']}, "
+        f"HTTP {report['http']}, воркеров {report['workers']}, backlog {report['backlog']}, "
+        f"JSON {'orjson' if report['orjson'] else 'json'}, "
+        f"опрос Telegram {'в этом процессе' if report['polling_leader'] else 'в другом воркере'} "
+        f"(pid {report['pid']})"
+    )
+    if report["profile"] == "fast" and report["running_loop"] != "uvloop":
+        logger.warning("Профиль fast: uvloop не установлен или не включён, работает asyncio")
+
+
+polling_leader = PollingLeader(POLLING_LOCK_PATH)
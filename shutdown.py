@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from logger import logger
+
+
+class UpdateDrain:
+    """
+    Внешний middleware aiogram, считающий апдейты в обработке.
+    После begin() новые апдейты не принимаются, а wait() дожидается,
+    пока уже начатые обработчики (сохранение заявки, рассылка администраторам)
+    доработают до конца.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.in_flight = 0
+        self.rejected = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(self, handler, event, data):
+        if self.draining:
+            self.rejected += 1
+            return None
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.set()
+
+    def begin(self):
+        self.draining = True
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Ждёт завершения апдейтов в обработке не дольше timeout секунд.
+        Возвращает False, если к дедлайну что-то ещё выполнялось.
+        """
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Остановка: за {timeout:.0f} с не завершились {self.in_flight} апдейтов"
+            )
+            return False
+        logger.info(
+            f"Остановка: апдейты в обработке завершены за {time.monotonic() - started:.2f} с"
+        )
+        return True
+
+
+update_drain = UpdateDrain()
@@ -0,0 +1,59 @@
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+class StartupProfiler:
+    """
+    Замеряет время этапов запуска: импорты, инициализацию БД, первый апдейт.
+    Отчёт пишется в лог только при STARTUP_PROFILE=1.
+    """
+
+    def __init__(self, enabled: bool = STARTUP_PROFILE):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.first_update_seen = False
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        duration, self.last = now - self.last, now
+        self.phases.append((phase, duration, now - self.started))
+        if self.enabled:
+            logger.info(
+                f"[startup] {phase}: {duration * 1000:.1f} мс "
+                f"(с начала {(now - self.started) * 1000:.1f} мс)"
+            )
+
+    def import_module(self, name: str):
+        module = importlib.import_module(name)
+        self.mark(f"import {name}")
+        return module
+
+    def report(self) -> dict:
+        return {
+            "total_ms": round((self.last - self.started) * 1000, 1),
+            "phases": [
+                {"phase": phase, "ms": round(duration * 1000, 1), "at_ms": round(at * 1000, 1)}
+                for phase, duration, at in self.phases
+            ],
+        }
+
+    async def first_update_middleware(self, handler, event, data):
+        if not self.first_update_seen:
+            self.first_update_seen = True
+            try:
+                return await handler(event, data)
+            finally:
+                self.mark("first update processed")
+                logger.info(f"[startup] отчёт: {self.report()}")
+        return await handler(event, data)
+
+
+startup_profiler = StartupProfiler()
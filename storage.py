@@ -1,8 +1,10 @@
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, get_settings
+from http_session import create_bot_session
+from tracing import TracedStorage, tracer
 
-storage = MemoryStorage()
-bot = Bot(token=BOT_TOKEN)
+storage = TracedStorage(MemoryStorage()) if tracer.enabled else MemoryStorage()
+bot = Bot(token=BOT_TOKEN, session=create_bot_session(get_settings()))
 dp = Dispatcher(bot=bot, storage=storage)
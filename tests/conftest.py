@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# До импорта модулей бота: пути БД, токен и состав администраторов
+# читаются при импорте database.py и при первом get_settings()
+_scratch = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.update(
+    BOT_TOKEN="1:test",
+    ADMIN_CHAT_IDS="1,2",
+    GROUP_ID="-100",
+    API_TOKEN="test",
+    DATABASE_PATH=os.path.join(_scratch, "bot_data.db"),
+    ARCHIVE_DATABASE_PATH=os.path.join(_scratch, "bot_archive.db"),
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Логгеры бота создают файлы логов в текущем каталоге
+os.chdir(_scratch)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    # Движки SQLAlchemy и очередь записи привязываются к циклу событий,
+    # поэтому все тесты работают в одном цикле
+    loop = asyncio.new_event_loop()
+    yield loop
+    from database import archive_engine, engine
+    from repository import repo
+
+    loop.run_until_complete(repo.writer.drain(5))
+    loop.run_until_complete(engine.dispose())
+    loop.run_until_complete(archive_engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def db(run):
+    """
+    Пустая БД с актуальной схемой; после теста все таблицы очищаются.
+    """
+    from database import Base, archive_engine, archive_metadata, engine, init_db
+    from repository import repo
+
+    run(init_db())
+    yield repo
+
+    async def clear():
+        await repo.writer.drain(5)
+        for target, metadata in ((engine, Base.metadata), (archive_engine, archive_metadata)):
+            async with target.begin() as conn:
+                for table in reversed(metadata.sorted_tables):
+                    await conn.execute(table.delete())
+
+    run(clear())
+    repo.application_cache.clear()
+    repo.question_cache.clear()
+    repo.user_history_cache.clear()
@@ -0,0 +1,100 @@
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import EditMessageText
+
+from notifications import AdminMessageSync
+
+APPLICATION = {
+    "request_type": "Запросить бесплатную видеоконсультацию",
+    "name": "Иван",
+    "description": "Не могу уснуть",
+}
+
+
+class EditingBot:
+    """
+    Запоминает правки сообщений. errors — исключения, которые по очереди
+    выбрасываются вместо правки указанного сообщения.
+    """
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.edits = []
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        pending = self.errors.get((chat_id, message_id))
+        if pending:
+            raise pending.pop(0)
+        self.edits.append((chat_id, message_id, text, kwargs["reply_markup"], time.monotonic()))
+
+
+def _method(chat_id=1, message_id=1):
+    return EditMessageText(chat_id=chat_id, message_id=message_id, text="")
+
+
+def _decided_application(run, db):
+    application = run(db.create_application(42, "ivan", APPLICATION))
+    run(db.add_admin_messages("application", application.id, [(1, 10), (2, 20)]))
+    assert run(db.set_application_status(application.id, "принята", expected_status="новая"))
+    return application.id
+
+
+def test_every_copy_gets_the_final_status_without_buttons(run, db):
+    app_id = _decided_application(run, db)
+    sync, bot = AdminMessageSync(), EditingBot()
+
+    async def scenario():
+        await sync.sync_application(bot, app_id, actor_id=1, extra=[(1, 10), (3, 30)])
+        return await sync.drain(1)
+
+    assert run(scenario())
+    assert [(chat_id, message_id) for chat_id, message_id, *_ in bot.edits] == [
+        (1, 10), (2, 20), (3, 30)
+    ]
+    for _, _, text, markup, _ in bot.edits:
+        assert "Статус</b>: принята" in text
+        assert "администратор <code>1</code>" in text
+        assert markup is None
+    assert sync.report()["edited"] == 3
+
+
+def test_edits_respect_the_configured_rate(run, db):
+    app_id = _decided_application(run, db)
+    sync, bot = AdminMessageSync(), EditingBot()
+    sync.configure(rate=20)
+
+    async def scenario():
+        await sync.sync_application(bot, app_id, extra=[(3, 30), (4, 40)])
+        await sync.drain(2)
+
+    run(scenario())
+    stamps = [edit[-1] for edit in bot.edits]
+    assert len(stamps) == 4
+    assert all(later - earlier >= 0.045 for earlier, later in zip(stamps, stamps[1:]))
+
+
+def test_retry_after_is_honoured_and_deleted_messages_are_skipped(run, db):
+    app_id = _decided_application(run, db)
+    bot = EditingBot(
+        errors={
+            (1, 10): [TelegramRetryAfter(_method(), "Too Many Requests", retry_after=0)],
+            (2, 20): [TelegramBadRequest(_method(), "message to edit not found")],
+        }
+    )
+    sync = AdminMessageSync(rate=0)
+
+    async def scenario():
+        await sync.sync_application(bot, app_id)
+        await sync.drain(1)
+
+    run(scenario())
+    assert [(chat_id, message_id) for chat_id, message_id, *_ in bot.edits] == [(1, 10)]
+    assert sync.report()["failed"] == 0
+
+
+def test_unknown_application_queues_nothing(run, db):
+    sync = AdminMessageSync()
+    run(sync.sync_application(EditingBot(), 999))
+    assert sync.report()["queued"] == 0
+    assert run(sync.drain(0.1))
@@ -0,0 +1,77 @@
+import asyncio
+
+from audit import AuditLog
+from repository import repo
+
+
+def test_events_are_buffered_until_flush(run, db):
+    audit = AuditLog()
+    audit.record("accept", "application", 7, actor_id=1)
+    audit.record("reject", "application", 7, actor_id=2, reason="дубль")
+    audit.record("accept", "application", 8, actor_id=1)
+    assert run(repo.get_audit_events("application", 7, 10)) == []
+
+    events = run(audit.get_events("application", 7))
+    assert [(e.action, e.actor_id) for e in events] == [("accept", 1), ("reject", 2)]
+    assert events[0].payload is None
+    assert events[1].payload == {"reason": "дубль"}
+    assert audit._buffer == []
+
+
+def test_full_batch_wakes_the_writer(run, db):
+    audit = AuditLog(batch_size=3, flush_interval=60)
+
+    async def scenario():
+        task = asyncio.create_task(audit.run())
+        for step in range(3):
+            audit.record("answer_append", "question", 5, actor_id=1, step=step)
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return await repo.get_audit_events("question", 5, 10)
+
+    events = run(scenario())
+    assert [e.payload["step"] for e in events] == [0, 1, 2]
+
+
+def test_failed_flush_keeps_a_bounded_buffer(run, db, monkeypatch):
+    audit = AuditLog(max_buffer=3)
+
+    async def broken(events):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(repo, "insert_audit_events", broken)
+    for step in range(5):
+        audit.record("edit", "question", 1, step=step)
+    run(audit.flush())
+    assert [event["payload"]["step"] for event in audit._buffer] == [2, 3, 4]
+
+    monkeypatch.undo()
+    run(audit.flush())
+    assert len(run(repo.get_audit_events("question", 1, 10))) == 3
+
+
+def test_stop_during_a_flush_keeps_every_event(run, db, monkeypatch):
+    audit = AuditLog(batch_size=2, flush_interval=60)
+    insert_events = repo.insert_audit_events
+    flushing = asyncio.Event()
+
+    async def slow_insert(events):
+        flushing.set()
+        await asyncio.sleep(0.05)
+        await insert_events(events)
+
+    monkeypatch.setattr(repo, "insert_audit_events", slow_insert)
+
+    async def scenario():
+        task = asyncio.create_task(audit.run())
+        audit.record("accept", "application", 3, step=0)
+        audit.record("accept", "application", 3, step=1)
+        await flushing.wait()
+        audit.record("accept", "application", 3, step=2)
+        audit.stop()
+        await task
+        await audit.flush()
+        return await repo.get_audit_events("application", 3, 10)
+
+    events = run(scenario())
+    assert [event.payload["step"] for event in events] == [0, 1, 2]
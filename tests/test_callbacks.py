@@ -0,0 +1,65 @@
+import base64
+
+from aiogram.types import CallbackQuery, User
+
+from callbacks import (
+    CALLBACK_PREFIX,
+    Action,
+    ActionData,
+    ActionRegistry,
+    Entity,
+    _LAYOUT,
+    action_button,
+)
+
+
+def test_pack_round_trip_fits_telegram_limit():
+    data = ActionData(Action.REJECT, Entity.QUESTION, 2**32 - 1, page=65535)
+    packed = data.pack()
+    assert packed.startswith(CALLBACK_PREFIX)
+    assert len(packed.encode()) <= 64
+    assert ActionData.unpack(packed) == data
+
+
+def test_legacy_buttons_are_still_understood():
+    assert ActionData.unpack("accept_15") == ActionData(Action.ACCEPT, Entity.APPLICATION, 15)
+    assert ActionData.unpack("reject_7") == ActionData(Action.REJECT, Entity.APPLICATION, 7)
+    assert ActionData.unpack("accept_") is None
+    assert ActionData.unpack("delete_7") is None
+
+
+def test_foreign_damaged_and_outdated_data_is_ignored():
+    outdated = CALLBACK_PREFIX + base64.urlsafe_b64encode(
+        _LAYOUT.pack(99, Action.ACCEPT, Entity.APPLICATION, 1, 0)
+    ).decode()
+    unknown_action = CALLBACK_PREFIX + base64.urlsafe_b64encode(
+        _LAYOUT.pack(1, 42, Entity.APPLICATION, 1, 0)
+    ).decode()
+    for data in ("", None, "~", "~abc", "~" + "A" * 20, outdated, unknown_action, "free_consult"):
+        assert ActionData.unpack(data) is None
+
+
+def test_filter_resolves_the_registered_handler(run):
+    registry = ActionRegistry()
+
+    @registry.register(Action.ACCEPT)
+    async def accept(callback, action_data):
+        return action_data
+
+    def callback(data):
+        return CallbackQuery(
+            id="1",
+            from_user=User(id=1, is_bot=False, first_name="Тест"),
+            chat_instance="x",
+            data=data,
+        )
+
+    button = action_button("Принять", Action.ACCEPT, Entity.APPLICATION, 5)
+    result = run(registry.filter()(callback(button.callback_data)))
+    assert result == {
+        "action_data": ActionData(Action.ACCEPT, Entity.APPLICATION, 5),
+        "action_handler": accept,
+    }
+    rejected = ActionData(Action.REJECT, Entity.APPLICATION, 5).pack()
+    assert run(registry.filter()(callback(rejected))) is False
+    assert run(registry.filter()(callback("menu"))) is False
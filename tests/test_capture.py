@@ -0,0 +1,149 @@
+import datetime
+import gzip
+import json
+
+from aiogram.types import (
+    CallbackQuery,
+    Chat,
+    Contact,
+    Location,
+    Message,
+    MessageEntity,
+    Update,
+    User,
+    Venue,
+)
+
+from callbacks import Action, ActionData, Entity
+from capture import Anonymizer, UpdateCapture, read_capture
+
+USER = User(id=555001, is_bot=False, first_name="Мария", last_name="Петрова", username="mpetrova")
+CHAT = Chat(id=555001, type="private", first_name="Мария", username="mpetrova")
+SECRETS = (
+    "555001", "Мария", "Петрова", "mpetrova", "79161234567", "example.org", "BEGIN:VCARD",
+    "Тверская", "55.7558", "37.6173", "4b5b", "ChIJ", "старый_формат", "тревога",
+)
+
+
+def _message(**fields):
+    return Message(
+        message_id=10,
+        date=datetime.datetime(2026, 1, 1),
+        chat=CHAT,
+        from_user=USER,
+        **fields,
+    )
+
+
+def _updates():
+    return [
+        Update(
+            update_id=1,
+            message=_message(
+                text="Меня мучает тревога, вот статья example.org",
+                entities=[
+                    MessageEntity(type="text_link", offset=0, length=4, url="https://example.org/a"),
+                    MessageEntity(type="text_mention", offset=5, length=5, user=USER),
+                ],
+            ),
+        ),
+        Update(
+            update_id=2,
+            message=_message(
+                contact=Contact(
+                    phone_number="+79161234567",
+                    first_name="Мария",
+                    user_id=555001,
+                    vcard="BEGIN:VCARD\nFN:Мария Петрова\nEND:VCARD",
+                )
+            ),
+        ),
+        Update(
+            update_id=3,
+            message=_message(
+                venue=Venue(
+                    location=Location(latitude=55.7558, longitude=37.6173),
+                    title="Мария дома",
+                    address="Тверская 1",
+                    foursquare_id="4b5b",
+                    google_place_id="ChIJ",
+                )
+            ),
+        ),
+        Update(
+            update_id=4,
+            callback_query=CallbackQuery(
+                id="cb1", from_user=USER, chat_instance="ci", data="старый_формат_555001"
+            ),
+        ),
+    ]
+
+
+def _dump(update):
+    return update.model_dump(mode="json", exclude_none=True, by_alias=True)
+
+
+def test_no_original_ids_or_text_remain():
+    anonymizer = Anonymizer()
+    records = [anonymizer.update(_dump(update)) for update in _updates()]
+    dumped = json.dumps(records, ensure_ascii=False)
+    for secret in SECRETS:
+        assert secret not in dumped, secret
+    for record in records:
+        Update.model_validate(record)
+
+    message = records[0]["message"]
+    assert message["from"]["id"] == message["chat"]["id"] == message["entities"][1]["user"]["id"]
+    assert "url" not in message["entities"][0]
+    assert records[1]["message"]["contact"]["user_id"] == message["from"]["id"]
+    assert records[2]["message"]["venue"]["location"] == {"latitude": 0.0, "longitude": 0.0}
+
+
+def test_routing_data_survives_anonymization():
+    anonymizer = Anonymizer(keep_texts=["Задать вопрос психологу"])
+    own = ActionData(Action.ACCEPT, Entity.APPLICATION, 7).pack()
+    assert anonymizer.callback_data(own) == own
+    assert anonymizer.callback_data("accept_7") == "accept_7"
+    assert anonymizer.text("Задать вопрос психологу") == "Задать вопрос психологу"
+    assert anonymizer.text("Пропустить") == "Пропустить"
+    assert anonymizer.text("/admins add 555001") == f"/admins add {anonymizer.user_id(555001)}"
+
+    phone = anonymizer.text("+79161234567")
+    assert phone.startswith("+79") and len(phone) == 12 and phone != "+79161234567"
+    assert anonymizer.text("Мария") == anonymizer.text("Мария")
+    assert Anonymizer().text("Мария") != anonymizer.text("Мария")
+
+
+def test_capture_round_trip(run, tmp_path):
+    path = str(tmp_path / "updates.jsonl.gz")
+    capture = UpdateCapture()
+    capture.open(path, bot_id=1, admin_ids=[555001, 2], group_id=-100500)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.update_id)
+
+    for update in _updates():
+        run(capture(handler, update, {}))
+    capture.close()
+
+    header, records = read_capture(path)
+    records = list(records)
+    assert handled == [1, 2, 3, 4]
+    assert capture.report()["recorded"] == 4
+    assert header["bot_id"] == 1
+    assert 555001 not in header["admins"]
+    assert header["group_id"] < 0
+    assert [update["update_id"] for _, update in records] == [1, 2, 3, 4]
+    assert records[0][1]["message"]["from"]["id"] == header["admins"][0]
+    assert all(offset >= 0 for offset, _ in records)
+
+
+def test_truncated_capture_is_read_up_to_the_break(tmp_path):
+    path = str(tmp_path / "updates.jsonl.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as capture_file:
+        capture_file.write(json.dumps({"capture": 1, "bot_id": 1}) + "\n")
+        capture_file.write(json.dumps({"t": 0.1, "update": {"update_id": 1}}) + "\n")
+        capture_file.write('{"t": 0.2, "upd')
+    header, records = read_capture(path)
+    assert [update["update_id"] for _, update in records] == [1]
@@ -0,0 +1,71 @@
+import pytest
+
+from crisis import DEFAULT_LEXICON, CrisisMatcher, expand
+
+
+def test_alternatives_expand_into_every_variant():
+    assert expand("поконч{ить,у} с {собой,жизнью}") == [
+        "покончить с собой",
+        "покончить с жизнью",
+        "покончу с собой",
+        "покончу с жизнью",
+    ]
+    assert expand("суицид*") == ["суицид*"]
+
+
+def test_default_lexicon_finds_phrases_in_any_case_and_punctuation():
+    matcher = CrisisMatcher()
+    assert matcher.scan("Я больше НЕ ХОЧУ ЖИТЬ... Думаю, что покончу с собой.") == [
+        "не хочу жить",
+        "покончу с собой",
+    ]
+    assert matcher.scan("Мысли о суициде не отпускают") == ["суицид"]
+    assert matcher.scan("Всё ещё живу, просто устала от работы") == []
+
+
+def test_phrases_match_whole_words_and_prefixes_only_with_star():
+    matcher = CrisisMatcher(["убить себя", "суицид*"])
+    assert matcher.scan("хочу убить себя") == ["убить себя"]
+    assert matcher.scan("хочу убить себялюбие") == []
+    assert matcher.scan("суицидальные мысли") == ["суицид"]
+    assert matcher.scan("антисуицидальный центр") == []
+
+
+def test_bad_entries_are_rejected_and_keep_the_previous_automaton():
+    matcher = CrisisMatcher(["убить себя"])
+    for entry in ("***", "су*ицид", "{,}"):
+        with pytest.raises(ValueError):
+            matcher.load([entry])
+    assert matcher.scan("убить себя") == ["убить себя"]
+
+
+def test_lexicon_file_replaces_the_default(tmp_path):
+    path = tmp_path / "lexicon.txt"
+    path.write_text("# местный словарь\n\nне вижу выхода\n", encoding="utf-8")
+    matcher = CrisisMatcher()
+    matcher.load_file(str(path))
+    assert matcher.lexicon == ("не вижу выхода",)
+    assert matcher.scan("Я не вижу выхода") == ["не вижу выхода"]
+    assert matcher.scan("хочу умереть") == []
+
+
+@pytest.mark.parametrize("content", [None, "", "# только комментарий\n", "су*ицид\n"])
+def test_broken_lexicon_file_falls_back_to_the_default(tmp_path, caplog, content):
+    path = tmp_path / "lexicon.txt"
+    if content is not None:
+        path.write_text(content, encoding="utf-8")
+    matcher = CrisisMatcher(["не вижу выхода"])
+    with caplog.at_level("WARNING"):
+        matcher.load_file(str(path))
+    assert matcher.lexicon == DEFAULT_LEXICON
+    assert matcher.scan("хочу умереть") == ["хочу умереть"]
+    assert "используется встроенный" in caplog.text
+
+
+def test_report_counts_scans():
+    matcher = CrisisMatcher()
+    matcher.scan("хочу умереть")
+    matcher.scan("всё хорошо")
+    report = matcher.report()
+    assert report["lexicon"] == len(DEFAULT_LEXICON)
+    assert (report["scanned"], report["matched"]) == (2, 1)
@@ -0,0 +1,89 @@
+from dedup import (
+    SIMILARITY_THRESHOLD,
+    QuestionIndex,
+    estimate_similarity,
+    find_duplicate_question,
+    jaccard,
+    minhash,
+    question_index,
+    shingles,
+)
+
+QUESTION = (
+    "Здравствуйте! Последние полгода постоянно тревожусь перед работой, "
+    "плохо сплю и просыпаюсь в четыре утра с мыслями о делах. Как с этим справиться?"
+)
+REWORDED = (
+    "Здравствуйте. Последние полгода постоянно тревожусь перед работой, "
+    "плохо сплю и просыпаюсь в пять утра с мыслями о делах. Как с этим справиться?"
+)
+UNRELATED = "Как помочь сыну-подростку, который перестал общаться с друзьями и не выходит из комнаты?"
+
+
+def test_near_duplicate_found_and_unrelated_missed():
+    index = QuestionIndex()
+    index.add(1, QUESTION)
+    index.add(2, UNRELATED)
+
+    matches = index.find_similar(REWORDED)
+    assert [question_id for question_id, _ in matches] == [1]
+    assert matches[0][1] >= SIMILARITY_THRESHOLD
+    assert index.find_similar("Что делать, если муж не помогает с ребёнком по вечерам?") == []
+
+
+def test_punctuation_and_case_do_not_matter():
+    index = QuestionIndex()
+    index.add(1, QUESTION)
+    assert index.find_similar(QUESTION.upper().replace(",", "").replace("!", "?")) == [(1, 1.0)]
+
+
+def test_remove_drops_question_from_buckets():
+    index = QuestionIndex()
+    index.add(1, QUESTION)
+    index.add(2, QUESTION)
+    index.remove(1)
+
+    assert len(index) == 1
+    assert index.find_similar(QUESTION) == [(2, 1.0)]
+    index.remove(2)
+    assert index.find_similar(QUESTION) == []
+    assert not index._buckets
+
+
+def test_index_keeps_only_signatures():
+    index = QuestionIndex()
+    index.add(1, QUESTION * 20)
+    assert set(vars(index)) == {"_buckets", "_signatures"}
+    assert index._signatures[1].itemsize * len(index._signatures[1]) == 256
+
+
+def test_estimate_tracks_exact_jaccard():
+    for first, second in ((QUESTION, REWORDED), (QUESTION, UNRELATED), (QUESTION, QUESTION)):
+        estimate = estimate_similarity(minhash(shingles(first)), minhash(shingles(second)))
+        assert abs(estimate - jaccard(first, second)) < 0.2
+
+
+def test_empty_text_is_not_indexed():
+    index = QuestionIndex()
+    index.add(1, "?!")
+    assert len(index) == 0
+    assert index.find_similar("...") == []
+
+
+def test_find_duplicate_prefers_answered_question(db, run):
+    first = run(db.create_question(10, QUESTION))
+    second = run(db.create_question(11, QUESTION + " Спасибо."))
+    run(db.update_question_answer(second, "Попробуйте дневник тревоги."))
+    run(db.create_question(12, UNRELATED))
+    run(question_index.load())
+
+    question, similarity = run(find_duplicate_question(REWORDED))
+    assert question.id == second and question.id != first
+    assert similarity == jaccard(REWORDED, question.question_text)
+    assert similarity >= SIMILARITY_THRESHOLD
+
+
+def test_find_duplicate_miss(db, run):
+    run(db.create_question(10, QUESTION))
+    run(question_index.load())
+    assert run(find_duplicate_question(UNRELATED)) is None
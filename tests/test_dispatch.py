@@ -0,0 +1,60 @@
+import datetime
+import importlib
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from dispatch import MENU_TEXTS, DispatchFilter, MessageDispatch, message_dispatch
+from states import Form
+
+
+def _message(text):
+    return Message(
+        message_id=1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=10, type="private"),
+        from_user=User(id=10, is_bot=False, first_name="Тест"),
+        text=text,
+    )
+
+
+async def on_menu(message, state):
+    pass
+
+
+async def on_name(message, state):
+    pass
+
+
+def test_menu_button_wins_over_the_current_state():
+    dispatch = MessageDispatch()
+    dispatch.menu("Задать вопрос психологу")(on_menu)
+    dispatch.state(Form.waiting_for_name_free)(on_name)
+
+    assert dispatch.resolve("Задать вопрос психологу", Form.waiting_for_name_free.state) is on_menu
+    assert dispatch.resolve("Иван", Form.waiting_for_name_free.state) is on_name
+    assert dispatch.resolve("Иван", None) is None
+    assert dispatch.resolve(None, Form.waiting_for_question.state) is None
+
+
+def test_unknown_menu_button_is_rejected():
+    with pytest.raises(ValueError):
+        MessageDispatch().menu("Несуществующая кнопка")
+
+
+def test_filter_passes_the_handler_to_the_router(run):
+    dispatch = MessageDispatch()
+    dispatch.state(Form.waiting_for_name_free)(on_name)
+    dispatch_filter = DispatchFilter(dispatch)
+
+    result = run(dispatch_filter(_message("Иван"), raw_state=Form.waiting_for_name_free.state))
+    assert result == {"dispatch_handler": on_name}
+    assert run(dispatch_filter(_message("Иван"))) is False
+
+
+def test_every_menu_button_has_a_handler():
+    for module in ("handlers.free_consult", "handlers.paid_consult", "handlers.question"):
+        importlib.import_module(module)
+
+    assert set(message_dispatch.by_text) == MENU_TEXTS
+    assert Form.waiting_for_personal_data_agreement_paid.state in message_dispatch.by_state
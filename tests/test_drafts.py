@@ -0,0 +1,35 @@
+from repository import DRAFT_SEPARATOR
+
+
+def test_append_joins_fragments_and_reports_length(run, db):
+    question_id = run(db.create_question(10, "Как справиться с тревогой?"))
+    assert run(db.append_answer_draft(question_id, 1, "Первая часть")) == len("Первая часть")
+    length = run(db.append_answer_draft(question_id, 1, "Вторая часть"))
+
+    draft = run(db.get_answer_draft(question_id, 1))
+    assert draft == "Первая часть" + DRAFT_SEPARATOR + "Вторая часть"
+    assert length == len(draft)
+
+
+def test_replace_keeps_one_fragment(run, db):
+    question_id = run(db.create_question(10, "Вопрос"))
+    run(db.append_answer_draft(question_id, 1, "старый"))
+    run(db.append_answer_draft(question_id, 1, "текст"))
+    assert run(db.replace_answer_draft(question_id, 1, "новый ответ")) == len("новый ответ")
+    assert run(db.get_answer_draft(question_id, 1)) == "новый ответ"
+
+
+def test_drafts_are_per_admin_and_deleted_with_the_question(run, db):
+    question_id = run(db.create_question(10, "Вопрос"))
+    other_id = run(db.create_question(11, "Другой вопрос"))
+    run(db.replace_answer_draft(question_id, 1, "ответ первого"))
+    run(db.replace_answer_draft(question_id, 2, "ответ второго"))
+    run(db.replace_answer_draft(other_id, 1, "ответ на другой"))
+
+    assert sorted(run(db.get_answer_draft_authors(question_id))) == [1, 2]
+    assert run(db.get_answer_draft(question_id, 2)) == "ответ второго"
+
+    run(db.delete_answer_drafts(question_id))
+    assert run(db.get_answer_draft_authors(question_id)) == []
+    assert run(db.get_answer_draft(question_id, 1)) == ""
+    assert run(db.get_answer_draft(other_id, 1)) == "ответ на другой"
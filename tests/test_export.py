@@ -0,0 +1,75 @@
+import csv
+import json
+import os
+
+import pytest
+
+import export
+from export import export_to_files, iter_export
+
+FORM = {"request_type": "Запросить бесплатную видеоконсультацию", "name": "Иван", "email": "i@example.com"}
+
+
+@pytest.fixture
+def applications(db, run, monkeypatch):
+    # Пачки по две строки, чтобы выгрузка шла несколькими кусками
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    ids = []
+    for user_id in range(1, 8):
+        data = {**FORM, "description": f"строка\nномер {user_id}"}
+        ids.append(run(db.create_application(user_id, f"user{user_id}", data)).id)
+    run(db.set_application_status(ids[0], "принята"))
+    return ids
+
+
+def _read_parts(paths):
+    try:
+        parts = []
+        for path in paths:
+            with open(path, encoding="utf-8", newline="") as part:
+                parts.append(list(csv.reader(part)))
+        return parts
+    finally:
+        for path in paths:
+            os.unlink(path)
+
+
+def test_csv_parts_repeat_header_and_keep_every_row(run, applications):
+    paths = run(export_to_files("applications", "csv", part_size=600))
+    parts = _read_parts(paths)
+
+    assert len(parts) > 1
+    header = parts[0][0]
+    assert header[:3] == ["id", "user_id", "username"]
+    assert all(part[0] == header for part in parts)
+    rows = [row for part in parts for row in part[1:]]
+    assert [int(row[0]) for row in rows] == applications
+    assert rows[0][header.index("description")] == "строка\nномер 1"
+
+
+def test_single_part_when_under_limit(run, applications):
+    parts = _read_parts(run(export_to_files("applications", "csv")))
+    assert len(parts) == 1 and len(parts[0]) == len(applications) + 1
+
+
+def test_status_filter_and_jsonl(run, applications):
+    async def collect():
+        return "".join([chunk async for chunk in iter_export("applications", "jsonl", status="принята")])
+
+    records = [json.loads(line) for line in run(collect()).splitlines()]
+    assert [record["id"] for record in records] == applications[:1]
+    assert records[0]["status"] == "принята"
+
+
+def test_unknown_format_rejected(run, db):
+    async def collect():
+        return [chunk async for chunk in iter_export("applications", "xml")]
+
+    with pytest.raises(ValueError):
+        run(collect())
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_no_parts_when_nothing_matches(run, applications, fmt):
+    assert run(export_to_files("applications", fmt, status="на_доработке")) == []
+    assert run(export_to_files("questions", fmt)) == []
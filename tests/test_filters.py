@@ -0,0 +1,33 @@
+import datetime
+
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from filters import IsAdmin
+from roster import admin_roster
+
+
+def _message(user_id=None):
+    return Message(
+        message_id=1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=user_id or -100, type="private" if user_id else "channel"),
+        from_user=User(id=user_id, is_bot=False, first_name="Тест") if user_id else None,
+        text="/stats",
+    )
+
+
+def test_only_roster_members_pass(run, monkeypatch):
+    monkeypatch.setattr(admin_roster, "ids", frozenset({1, 2}))
+    is_admin = IsAdmin()
+    assert run(is_admin(_message(1)))
+    assert not run(is_admin(_message(3)))
+
+    callback = CallbackQuery(
+        id="1", from_user=User(id=2, is_bot=False, first_name="Тест"), chat_instance="x", data="a"
+    )
+    assert run(is_admin(callback))
+
+
+def test_events_without_a_sender_are_rejected(run, monkeypatch):
+    monkeypatch.setattr(admin_roster, "ids", frozenset({1}))
+    assert not run(IsAdmin()(_message()))
@@ -0,0 +1,84 @@
+import asyncio
+import importlib.util
+
+import pytest
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramNetworkError
+from aiohttp import web
+
+from http_session import TunedAiohttpSession
+
+ME = {"id": 1, "is_bot": True, "first_name": "Бот", "username": "test_bot"}
+
+
+async def _bot_api(session: TunedAiohttpSession):
+    """
+    Локальный сервер в роли Bot API: getMe отвечает сразу,
+    sendChatAction — через секунду.
+    """
+
+    async def handle(request):
+        if request.match_info["method"] == "sendChatAction":
+            await asyncio.sleep(1)
+        return web.json_response({"ok": True, "result": ME})
+
+    app = web.Application()
+    app.router.add_route("POST", "/bot{token}/{method}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    session.api = TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")
+    return runner
+
+
+def test_requests_reuse_the_keep_alive_connection(run):
+    session = TunedAiohttpSession(limit=4, json_backend="json")
+    bot = Bot("1:test", session=session)
+
+    async def scenario():
+        runner = await _bot_api(session)
+        try:
+            for _ in range(3):
+                me = await bot.get_me()
+        finally:
+            await session.close()
+            await runner.cleanup()
+        return me
+
+    assert run(scenario()).username == "test_bot"
+    stats = session.stats()
+    assert stats["json"] == "json"
+    assert stats["requests"] == 3
+    assert stats["errors"] == 0
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 2
+    assert stats["limit"] == 4
+
+
+def test_per_method_timeout_applies(run):
+    session = TunedAiohttpSession(method_timeouts={"sendChatAction": 0.1})
+    bot = Bot("1:test", session=session)
+
+    async def scenario():
+        runner = await _bot_api(session)
+        try:
+            with pytest.raises(TelegramNetworkError):
+                await bot.send_chat_action(1, "typing")
+        finally:
+            await session.close()
+            await runner.cleanup()
+
+    run(scenario())
+    assert session.stats()["errors"] == 1
+
+
+def test_json_backend_selection():
+    assert TunedAiohttpSession(json_backend="json").json_backend == "json"
+    if importlib.util.find_spec("orjson") is None:
+        with pytest.raises(RuntimeError):
+            TunedAiohttpSession(json_backend="orjson")
+    else:
+        assert TunedAiohttpSession(json_backend="auto").json_backend == "orjson"
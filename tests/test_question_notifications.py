@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from notifications import format_question, notify_admins_about_question
+
+
+class RecordingBot:
+    """
+    Запоминает отправленные сообщения; администраторам из blocked
+    отправка не удаётся.
+    """
+
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.blocked:
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=1000 + len(self.sent))
+
+
+def test_every_admin_gets_the_numbered_question_in_one_send(run, db):
+    question_id = run(db.create_question(42, "Как справиться с тревогой?"))
+    text = format_question(question_id, "Как справиться с тревогой?")
+    bot = RecordingBot()
+
+    delivered = run(notify_admins_about_question(bot, question_id, text, [1, 2]))
+    assert delivered == [1, 2]
+    assert [chat_id for chat_id, _ in bot.sent] == [1, 2]
+    assert all(f"вопрос №{question_id}" in sent_text for _, sent_text in bot.sent)
+    assert run(db.get_admin_messages("question", question_id)) == [(1, 1001), (2, 1002)]
+
+
+def test_failed_delivery_does_not_stop_the_fan_out(run, db):
+    question_id = run(db.create_question(42, "Вопрос"))
+    bot = RecordingBot(blocked={1})
+
+    delivered = run(notify_admins_about_question(bot, question_id, "текст", [1, 2, 3]))
+    assert delivered == [2, 3]
+    assert run(db.get_question_by_admin_message(3, 1002)).id == question_id
+
+
+def test_question_card_shows_topic_and_note():
+    text = format_question(7, "Вопрос", topic="anxiety", confidence=0.83, note="⚠️ Похожий вопрос\n\n")
+    assert text.startswith("🆕 Новый анонимный вопрос №7")
+    assert "(83%)" in text
+    assert "⚠️ Похожий вопрос" in text
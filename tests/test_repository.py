@@ -0,0 +1,62 @@
+from sqlalchemy import insert
+
+from database import Question, engine, init_db
+
+APPLICATION = {
+    "request_type": "Запросить бесплатную видеоконсультацию",
+    "name": "Иван",
+    "phone": "+79990000000",
+    "description": "Не могу уснуть",
+}
+
+
+def test_create_application_returns_the_inserted_row(run, db):
+    application = run(db.create_application(42, None, APPLICATION))
+    assert application.user_id == 42
+    assert application.username == ""
+    assert application.status == "новая"
+    assert application.email == ""
+    assert run(db.get_application(application.id)) == application
+
+
+def test_compare_and_set_rejects_a_second_decision(run, db):
+    application = run(db.create_application(42, "ivan", APPLICATION))
+    assert run(db.set_application_status(application.id, "принята", expected_status="новая"))
+    assert not run(
+        db.set_application_status(application.id, "отклонена", "Поздно", expected_status="новая")
+    )
+    row = run(db.get_application(application.id))
+    assert row.status == "принята"
+    assert row.admin_comment is None
+
+
+def test_status_change_of_a_missing_application(run, db):
+    assert not run(db.set_application_status(999, "принята"))
+
+
+def test_admin_messages_resolve_back_to_the_question(run, db):
+    question_id = run(db.create_question(42, "Вопрос"))
+    run(db.add_admin_messages("question", question_id, [(1, 100), (2, 200)]))
+    assert run(db.get_admin_messages("question", question_id)) == [(1, 100), (2, 200)]
+    assert run(db.get_question_by_admin_message(2, 200)).id == question_id
+    assert run(db.get_question_by_admin_message(2, 100)) is None
+
+
+def test_legacy_admin_messages_are_back_filled(run, db):
+    async def legacy_question():
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                insert(Question).values(
+                    user_id=42,
+                    question_text="Старый вопрос",
+                    status="ожидает",
+                    admin_messages=[{"admin_id": 1, "message_id": 7}],
+                )
+            )
+            return result.inserted_primary_key[0]
+
+    question_id = run(legacy_question())
+    run(init_db())
+    run(init_db())
+    assert run(db.get_admin_messages("question", question_id)) == [(1, 7)]
+    assert run(db.get_question_by_admin_message(1, 7)).id == question_id
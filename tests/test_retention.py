@@ -0,0 +1,137 @@
+import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from database import (
+    AdminMessage,
+    Application,
+    Question,
+    archive_engine,
+    archived_applications,
+    engine,
+    utcnow,
+)
+from repository import repo
+from retention import REDACTED, archive_old_rows, compact_database, enable_incremental_vacuum
+
+OLD = utcnow() - datetime.timedelta(days=400)
+RECENT = utcnow() - datetime.timedelta(days=2)
+PERSONAL = {
+    "username": "ivan",
+    "name": "Иван",
+    "phone": "+79990000000",
+    "email": "i@example.com",
+    "tg_account": "@ivan",
+}
+
+
+def _application(user_id, status, updated_at):
+    return {
+        "user_id": user_id,
+        "request_type": "Запросить бесплатную видеоконсультацию",
+        "description": "Не могу уснуть",
+        "status": status,
+        "created_at": updated_at,
+        "updated_at": updated_at,
+        **PERSONAL,
+    }
+
+
+@pytest.fixture
+def history(db, run):
+    async def seed():
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(Application),
+                [
+                    _application(1, "принята", OLD),
+                    _application(2, "отклонена", OLD),
+                    _application(3, "новая", OLD),
+                    _application(4, "принята", RECENT),
+                ],
+            )
+            await conn.execute(
+                insert(Question),
+                [
+                    {"user_id": 5, "question_text": "старый", "status": "завершен", "answered_at": OLD},
+                    {"user_id": 6, "question_text": "новый", "status": "завершен", "answered_at": RECENT},
+                ],
+            )
+            await conn.execute(
+                insert(AdminMessage),
+                [{"entity_type": "application", "entity_id": 1, "chat_id": 1, "message_id": 10}],
+            )
+
+    run(seed())
+
+
+def _ids(run, target, table):
+    async def read():
+        async with target.connect() as conn:
+            return [row.id for row in await conn.execute(select(table).order_by(table.c.id))]
+
+    return run(read())
+
+
+def test_old_processed_rows_moved_and_redacted(run, history):
+    assert run(archive_old_rows(days=365, batch_size=1)) == {"applications": 2, "questions": 1}
+
+    assert _ids(run, engine, Application.__table__) == [3, 4]
+    assert _ids(run, engine, Question.__table__) == [2]
+    assert _ids(run, engine, AdminMessage.__table__) == []
+
+    async def archived():
+        async with archive_engine.connect() as conn:
+            result = await conn.execute(
+                select(archived_applications).order_by(archived_applications.c.id)
+            )
+            return result.all()
+
+    rows = run(archived())
+    assert [row.id for row in rows] == [1, 2]
+    for row in rows:
+        assert {field: getattr(row, field) for field in PERSONAL} == dict.fromkeys(PERSONAL, REDACTED)
+        assert row.description == "Не могу уснуть" and row.status in ("принята", "отклонена")
+
+
+def test_row_reopened_after_read_stays_and_leaves_no_archive_copy(run, history, monkeypatch):
+    delete_archived_rows = repo.delete_archived_rows
+
+    async def reopen_then_delete(entity_type, ids, condition):
+        if entity_type == "application":
+            # Администратор вернул заявку в работу между чтением и удалением
+            await repo.set_application_status(1, "на_доработке")
+        return await delete_archived_rows(entity_type, ids, condition)
+
+    monkeypatch.setattr(repo, "delete_archived_rows", reopen_then_delete)
+    operations = repo.writer.report()["operations"]
+    assert run(archive_old_rows(days=365)) == {"applications": 1, "questions": 1}
+
+    assert _ids(run, engine, Application.__table__) == [1, 3, 4]
+    assert _ids(run, archive_engine, archived_applications) == [2]
+    assert _ids(run, engine, AdminMessage.__table__) == [1]
+    # Удаления прошли через очередь записи: по одному на пачку заявок и вопросов
+    assert repo.writer.report()["operations"] >= operations + 3
+
+
+def test_rerun_is_noop(run, history):
+    run(archive_old_rows(days=365))
+    assert run(archive_old_rows(days=365)) == {"applications": 0, "questions": 0}
+
+
+def test_zero_days_never_archives_everything(run, history):
+    with pytest.raises(ValueError):
+        run(archive_old_rows(days=0))
+    assert _ids(run, engine, Application.__table__) == [1, 2, 3, 4]
+
+
+def test_new_database_created_in_incremental_mode(run, db):
+    assert run(enable_incremental_vacuum()) is False
+    assert run(compact_database()) is True
+
+
+def test_retention_is_opt_in():
+    from config import Settings
+
+    assert Settings.retention_days == 0
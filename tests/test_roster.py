@@ -0,0 +1,28 @@
+from roster import AdminRoster
+
+
+def test_first_load_seeds_admins_and_group_from_settings(run, db):
+    roster = AdminRoster()
+    run(roster.load())
+    assert list(roster) == [1, 2]
+    assert 1 in roster and 3 not in roster
+    assert roster.group_id == -100
+    assert roster.version == 1
+
+
+def test_changes_bump_the_version_seen_by_other_processes(run, db):
+    roster, other = AdminRoster(), AdminRoster()
+    run(roster.load())
+    run(other.load())
+    assert not run(other.refresh())
+
+    assert run(roster.add(3, added_by=1))
+    assert not run(roster.add(3, added_by=1))
+    assert run(roster.remove(1))
+    assert not run(roster.remove(1))
+    run(roster.set_group_id(-200))
+
+    assert run(other.refresh())
+    assert list(other) == [2, 3]
+    assert other.group_id == -200
+    assert other.version == roster.version
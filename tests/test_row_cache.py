@@ -0,0 +1,54 @@
+from sqlalchemy import update
+
+from database import Application, engine
+
+APPLICATION = {
+    "request_type": "Запросить бесплатную видеоконсультацию",
+    "name": "Иван",
+    "description": "Не могу уснуть",
+}
+
+
+def test_application_row_is_cached_and_invalidated_on_status_change(run, db):
+    application = run(db.create_application(42, "ivan", APPLICATION))
+    first = run(db.get_application(application.id))
+    hits = db.application_cache.hits
+    assert run(db.get_application(application.id)) is first
+    assert db.application_cache.hits == hits + 1
+
+    assert run(db.set_application_status(application.id, "принята", expected_status="новая"))
+    assert run(db.get_application(application.id)).status == "принята"
+
+
+def test_missing_rows_are_not_cached(run, db):
+    assert run(db.get_application(999)) is None
+    assert run(db.get_question(999)) is None
+    assert len(db.application_cache) == 0
+    assert len(db.question_cache) == 0
+
+
+def test_question_row_is_invalidated_on_answer(run, db):
+    question_id = run(db.create_question(42, "Как справиться с тревогой?"))
+    assert run(db.get_question(question_id)).answer_text is None
+    run(db.update_question_answer(question_id, "Попробуйте дыхательные упражнения"))
+    question = run(db.get_question(question_id))
+    assert question.status == "отвечен"
+    assert question.answer_text == "Попробуйте дыхательные упражнения"
+
+
+def test_invalidate_rows_drops_rows_changed_outside_the_repository(run, db):
+    application = run(db.create_application(42, "ivan", APPLICATION))
+    run(db.get_application(application.id))
+
+    async def rename():
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(Application.__table__)
+                .where(Application.__table__.c.id == application.id)
+                .values(name="REDACTED")
+            )
+
+    run(rename())
+    assert run(db.get_application(application.id)).name == "Иван"
+    db.invalidate_rows("application", [application.id])
+    assert run(db.get_application(application.id)).name == "REDACTED"
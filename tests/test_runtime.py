@@ -0,0 +1,47 @@
+import importlib.util
+from dataclasses import replace
+
+import pytest
+
+from config import get_settings
+from runtime import PollingLeader, resolve_runtime, runtime_report
+
+
+def test_default_profile_uses_stock_loop_and_parser():
+    runtime = resolve_runtime(replace(get_settings(), runtime_profile="default"))
+    assert runtime["loop"] == "asyncio"
+    assert runtime["http"] == "h11"
+
+
+def test_fast_profile_uses_only_installed_accelerators():
+    runtime = resolve_runtime(replace(get_settings(), runtime_profile="fast"))
+    uvloop = importlib.util.find_spec("uvloop") is not None
+    httptools = importlib.util.find_spec("httptools") is not None
+    assert runtime["loop"] == ("uvloop" if uvloop else "asyncio")
+    assert runtime["http"] == ("httptools" if httptools else "h11")
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_runtime(replace(get_settings(), runtime_profile="turbo"))
+
+
+def test_only_one_worker_leads_polling(run, tmp_path):
+    path = str(tmp_path / "bot_polling.lock")
+    leader, follower = PollingLeader(path), PollingLeader(path)
+    assert leader.try_acquire()
+    assert not follower.try_acquire()
+
+    report = run(_report(follower))
+    assert report["polling_leader"] is False
+    # aiogram при импорте включает uvloop, если он установлен
+    assert report["running_loop"] in ("asyncio", "uvloop")
+
+    leader.release()
+    run(follower.wait(interval=0.01))
+    assert follower.is_leader
+    follower.release()
+
+
+async def _report(leader):
+    return runtime_report(get_settings(), leader)
@@ -0,0 +1,64 @@
+import asyncio
+
+from shutdown import UpdateDrain
+
+
+def test_wait_lets_in_flight_updates_finish_and_rejects_new_ones(run):
+    drain = UpdateDrain()
+    finished = []
+
+    async def slow_handler(event, data):
+        await asyncio.sleep(0.05)
+        finished.append(event)
+        return event
+
+    async def scenario():
+        task = asyncio.create_task(drain(slow_handler, "saved", {}))
+        await asyncio.sleep(0)
+        assert drain.in_flight == 1
+        drain.begin()
+        assert await drain(slow_handler, "late", {}) is None
+        assert await drain.wait(1)
+        return await task
+
+    assert run(scenario()) == "saved"
+    assert finished == ["saved"]
+    assert drain.rejected == 1
+    assert drain.in_flight == 0
+
+
+def test_wait_times_out_on_a_stuck_handler(run):
+    drain = UpdateDrain()
+    release = asyncio.Event()
+
+    async def stuck_handler(event, data):
+        await release.wait()
+
+    async def scenario():
+        task = asyncio.create_task(drain(stuck_handler, "update", {}))
+        await asyncio.sleep(0)
+        drain.begin()
+        completed = await drain.wait(0.05)
+        release.set()
+        await task
+        return completed
+
+    assert run(scenario()) is False
+    assert drain.in_flight == 0
+
+
+def test_failing_handler_does_not_leak_the_counter(run):
+    drain = UpdateDrain()
+
+    async def broken_handler(event, data):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        try:
+            await drain(broken_handler, "update", {})
+        except RuntimeError:
+            pass
+        return await drain.wait(0.01)
+
+    assert run(scenario())
+    assert drain.in_flight == 0
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from config import Settings
+from startup import StartupProfiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUIRED = ("BOT_TOKEN", "ADMIN_CHAT_IDS", "GROUP_ID")
+
+# Модули, которые main и фоновые задачи импортируют до проверки настроек
+IMPORT_SAFE = (
+    "main",
+    "repository",
+    "write_queue",
+    "tracing",
+    "notifications",
+    "crisis",
+    "audit",
+    "roster",
+    "topics",
+    "dedup",
+    "capture",
+    "retention",
+)
+
+
+def test_modules_import_without_settings(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key not in REQUIRED}
+    env.update(PYTHONPATH=ROOT, DATABASE_PATH=str(tmp_path / "bot_data.db"))
+    script = (
+        "import importlib, config\n"
+        f"for name in {IMPORT_SAFE!r}:\n"
+        "    importlib.import_module(name)\n"
+        "assert config.get_settings.cache_info().currsize == 0\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_missing_required_variables_are_named(monkeypatch):
+    for name in REQUIRED:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("BOT_TOKEN", "1:test")
+    with pytest.raises(ValueError, match="ADMIN_CHAT_IDS, GROUP_ID"):
+        Settings.from_env()
+
+
+def test_profiler_reports_phases_in_order():
+    profiler = StartupProfiler(enabled=False)
+    profiler.mark("import main")
+    profiler.import_module("json")
+    report = profiler.report()
+    assert [phase["phase"] for phase in report["phases"]] == ["import main", "import json"]
+    assert report["total_ms"] >= report["phases"][0]["at_ms"]
@@ -0,0 +1,106 @@
+import datetime
+
+from sqlalchemy import insert
+
+from database import QUESTION_REQUEST_TYPE, Application, engine, init_db, utcnow
+
+FREE = "Запросить бесплатную видеоконсультацию"
+FORM = {"request_type": FREE, "name": "Иван", "description": "Не могу уснуть", "email": "i@example.com"}
+
+
+def test_transitions_update_rollups(db, run):
+    first = run(db.create_application(10, "ivan", FORM))
+    second = run(db.create_application(11, "petr", FORM))
+    run(db.set_application_status(first.id, "принята"))
+    run(db.set_application_status(second.id, "отклонена", admin_comment="нет мест"))
+    question_id = run(db.create_question(12, "Как справиться с тревогой?"))
+    run(db.update_question_answer(question_id, "Ответ", status="завершен"))
+
+    summary = run(db.get_stats_summary(days=1))
+    assert summary["counts"][FREE] == {"новая": 2, "принята": 1, "отклонена": 1}
+    assert summary["counts"][QUESTION_REQUEST_TYPE] == {"ожидает": 1, "завершен": 1}
+    accepted = summary["response_time"][FREE]["принята"]
+    assert accepted["samples"] == 1 and accepted["avg_seconds"] >= 0
+    assert summary["response_time"][QUESTION_REQUEST_TYPE]["завершен"]["samples"] == 1
+
+
+def test_window_excludes_older_days(db, run):
+    run(db.create_application(10, "ivan", FORM))
+    assert run(db.get_stats_summary(days=7))["since"] == (
+        utcnow().date() - datetime.timedelta(days=6)
+    ).isoformat()
+    assert run(db.get_stats_summary(days=1))["counts"][FREE]["новая"] == 1
+
+
+def test_rollups_backfilled_from_history(db, run):
+    created = utcnow() - datetime.timedelta(hours=2)
+
+    async def seed_history():
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(Application),
+                [
+                    {
+                        "user_id": 1,
+                        "request_type": FREE,
+                        "status": "новая",
+                        "created_at": created,
+                        "updated_at": created,
+                    },
+                    {
+                        "user_id": 2,
+                        "request_type": FREE,
+                        "status": "принята",
+                        "created_at": created,
+                        "updated_at": created + datetime.timedelta(hours=1),
+                    },
+                ],
+            )
+
+    run(seed_history())
+    run(init_db())
+
+    summary = run(db.get_stats_summary(days=2))
+    assert summary["counts"][FREE]["новая"] == 2
+    assert summary["counts"][FREE]["принята"] == 1
+    assert summary["response_time"][FREE]["принята"]["avg_seconds"] == 3600.0
+
+
+def test_backfill_merges_null_and_empty_request_types(db, run):
+    created = utcnow() - datetime.timedelta(hours=2)
+
+    async def seed_history():
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(Application),
+                [
+                    {
+                        "user_id": user_id,
+                        "request_type": request_type,
+                        "status": "принята",
+                        "created_at": created,
+                        "updated_at": created + datetime.timedelta(hours=1),
+                    }
+                    for user_id, request_type in ((1, None), (2, ""), (3, None))
+                ],
+            )
+
+    run(seed_history())
+    run(init_db())
+
+    summary = run(db.get_stats_summary(days=2))
+    assert summary["counts"][""] == {"новая": 3, "принята": 3}
+    assert summary["response_time"][""]["принята"]["samples"] == 3
+
+
+def test_stats_endpoint_requires_the_api_token(db):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    client = TestClient(app)
+    assert client.get("/stats").status_code == 403
+    assert client.get("/stats", headers={"X-API-Token": "wrong"}).status_code == 403
+    response = client.get("/stats?days=1", headers={"X-API-Token": "test"})
+    assert response.status_code == 200
+    assert "counts" in response.json()
@@ -0,0 +1,65 @@
+from roster import AdminRoster
+from topics import NaiveBayesModel, TopicClassifier, tokenize, topic_title
+
+
+def test_tokens_are_stemmed_without_stopwords():
+    assert tokenize("Мне очень тревожно, тревога!") == ["трево", "трево"]
+
+
+def test_seed_words_classify_before_training():
+    classifier = TopicClassifier()
+    topic, confidence = classifier.classify("Постоянная тревога и панические атаки по ночам")
+    assert topic == "anxiety"
+    assert confidence >= 0.5
+    assert classifier.classify("Здравствуйте") == (None, 0.0)
+    assert topic_title(None) == "без темы"
+
+
+def test_low_confidence_leaves_the_question_unrouted():
+    topic, confidence = TopicClassifier(min_confidence=1.01).classify("тревога")
+    assert topic is None
+    assert confidence > 0
+
+
+def test_training_learns_only_topics_set_by_admins(run, db):
+    question = "Гемблинг затянул, проигрываю всю зарплату"
+    assert NaiveBayesModel.fit(()).predict("гемблинг")[0] is None
+    for number in range(3):
+        question_id = run(db.create_question(number, question))
+        run(db.set_question_topics([(question_id, "addiction")], by_admin=True))
+    for number in range(5):
+        guessed = run(db.create_question(10 + number, "Гемблинг", topic="work"))
+        run(db.update_question_answer(guessed, "Ответ", status="завершен"))
+
+    classifier = TopicClassifier()
+    report = run(classifier.train())
+    assert report["samples"] == 3
+    assert classifier.classify("гемблинг")[0] == "addiction"
+
+
+def test_rescore_keeps_topics_set_by_admins(run, db):
+    classifier = TopicClassifier()
+    guessed = run(db.create_question(1, "Боюсь, панические атаки", topic="work"))
+    by_admin = run(db.create_question(2, "Боюсь, панические атаки"))
+    run(db.set_question_topics([(by_admin, "family")], by_admin=True))
+    unchanged = run(db.create_question(3, "Начальник давит на работе", topic="work"))
+
+    changed = run(classifier.rescore_backlog())
+    assert [(question_id, topic) for question_id, topic, _ in changed] == [(guessed, "anxiety")]
+    assert run(db.get_question(guessed)).topic == "anxiety"
+    assert run(db.get_question(by_admin)).topic == "family"
+    assert run(db.get_question(unchanged)).topic == "work"
+
+
+def test_questions_go_to_admins_of_the_topic(run, db):
+    roster = AdminRoster()
+    run(roster.load())
+    run(roster.add(3))
+    run(roster.set_topics(2, ["anxiety", "grief"]))
+    run(roster.set_topics(3, ["work"]))
+
+    assert roster.recipients("anxiety") == (1, 2)
+    assert roster.recipients("work") == (1, 3)
+    assert roster.recipients(None) == (1, 2, 3)
+    run(roster.remove(1))
+    assert roster.recipients("family") == (2, 3)
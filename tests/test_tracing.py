@@ -0,0 +1,123 @@
+import asyncio
+import datetime
+import json
+import threading
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from tracing import TracedStorage, Tracer, _current_trace, span, untraced_task
+
+
+def _update(update_id=1):
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=1,
+            date=datetime.datetime.now(),
+            chat=Chat(id=10, type="private"),
+            from_user=User(id=10, is_bot=False, first_name="Тест"),
+            text="/start",
+        ),
+    )
+
+
+async def start_handler(event, data):
+    pass
+
+
+def test_sampled_update_collects_handler_fsm_and_db_spans(run, tmp_path):
+    tracer = Tracer(sample_rate=1, slow_ms=0, path=str(tmp_path / "traces.jsonl"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/trace.db")
+    tracer.instrument_engine(engine)
+    storage = TracedStorage(MemoryStorage())
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+    async def handler(event, data):
+        await storage.set_state(key, "Form:waiting_for_question")
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def scenario():
+        await tracer.update_middleware(
+            lambda event, data: tracer.handler_middleware(handler, event, data),
+            _update(),
+            {"dispatch_handler": start_handler},
+        )
+        await engine.dispose()
+        await tracer.drain()
+
+    run(scenario())
+    [trace] = tracer.recent()
+    assert trace["update_id"] == 1
+    assert trace["event_type"] == "message"
+    assert trace["handler"] == "start_handler"
+    kinds = {item["kind"]: item["name"] for item in trace["spans"]}
+    assert kinds["handler"] == "start_handler"
+    assert kinds["fsm"] == "set_state"
+    assert kinds["db"] == "SELECT 1"
+    with open(tmp_path / "traces.jsonl", encoding="utf-8") as trace_file:
+        assert json.loads(trace_file.readline())["trace_id"] == trace["trace_id"]
+
+
+def test_only_slow_updates_are_kept_without_sampling(run):
+    tracer = Tracer(sample_rate=0, slow_ms=30)
+
+    async def slow(event, data):
+        await asyncio.sleep(0.05)
+
+    run(tracer.update_middleware(start_handler, _update(1), {}))
+    run(tracer.update_middleware(slow, _update(2), {}))
+    assert [trace["update_id"] for trace in tracer.recent()] == [2]
+    assert tracer.recent(min_ms=1000) == []
+    assert tracer.report()["started"] == 2
+
+
+def test_trace_file_is_written_off_the_loop_in_batches(run, tmp_path, monkeypatch):
+    tracer = Tracer(sample_rate=1, slow_ms=0, path=str(tmp_path / "traces.jsonl"))
+    writes = []
+    append = Tracer._append
+
+    def recording_append(path, lines):
+        writes.append((threading.current_thread(), len(lines)))
+        append(path, lines)
+
+    monkeypatch.setattr(tracer, "_append", recording_append)
+
+    async def scenario():
+        for update_id in range(3):
+            await tracer.update_middleware(start_handler, _update(update_id), {})
+        await tracer.drain()
+
+    run(scenario())
+    assert all(thread is not threading.main_thread() for thread, _ in writes)
+    assert sum(count for _, count in writes) == 3
+    with open(tmp_path / "traces.jsonl", encoding="utf-8") as trace_file:
+        assert [json.loads(line)["update_id"] for line in trace_file] == [0, 1, 2]
+
+
+def test_configure_resizes_the_buffer(run):
+    tracer = Tracer(sample_rate=1, slow_ms=0, buffer_size=5)
+    for update_id in range(4):
+        run(tracer.update_middleware(start_handler, _update(update_id), {}))
+    tracer.configure(sample_rate=0, slow_ms=0, buffer_size=2)
+    assert not tracer.enabled
+    assert [trace["update_id"] for trace in tracer.recent()] == [3, 2]
+    assert tracer.traces.maxlen == 2
+
+
+def test_spans_outside_a_trace_and_background_tasks_are_ignored(run):
+    with span("db", "outside"):
+        pass
+
+    async def background():
+        return _current_trace.get()
+
+    async def handler(event, data):
+        return await untraced_task(background())
+
+    tracer = Tracer(sample_rate=1, slow_ms=0)
+    assert run(tracer.update_middleware(handler, _update(), {})) is None
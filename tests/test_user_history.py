@@ -0,0 +1,53 @@
+from cache import TTLCache
+
+APPLICATION = {
+    "request_type": "Запросить бесплатную видеоконсультацию",
+    "name": "Иван",
+    "phone": "+79990000000",
+    "description": "Не могу уснуть",
+}
+
+
+def test_ttl_cache_expires_and_evicts_least_recent(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    assert cache.stats() == {"size": 1, "maxsize": 2, "hits": 2, "misses": 2, "hit_rate": 0.5}
+
+
+def test_history_is_cached_until_a_status_change(run, db):
+    application = run(db.create_application(42, "ivan", APPLICATION))
+    question_id = run(db.create_question(42, "Как справиться с тревогой?"))
+    run(db.create_question(43, "Чужой вопрос"))
+
+    history = run(db.get_user_history(42))
+    assert [app["status"] for app in history["applications"]] == ["новая"]
+    assert [question["id"] for question in history["questions"]] == [question_id]
+
+    hits = db.user_history_cache.hits
+    assert run(db.get_user_history(42)) is history
+    assert db.user_history_cache.hits == hits + 1
+
+    run(db.set_application_status(application.id, "отклонена", "Нет свободных слотов"))
+    refreshed = run(db.get_user_history(42))
+    assert refreshed is not history
+    assert refreshed["applications"][0]["status"] == "отклонена"
+    assert refreshed["applications"][0]["admin_comment"] == "Нет свободных слотов"
+
+
+def test_history_is_limited_to_recent_records(run, db):
+    for number in range(4):
+        run(db.create_question(42, f"Вопрос {number}"))
+    history = run(db.get_user_history(42, limit=2))
+    assert len(history["questions"]) == 2
+    assert history["applications"] == []
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from watchdog import HandlerContextMiddleware, LoopWatchdog
+
+
+async def blocking_handler(event, data):
+    time.sleep(0.3)
+    return "done"
+
+
+def test_stall_captures_handler_and_state(run):
+    watchdog = LoopWatchdog(interval=0.02, threshold=0.1)
+    middleware = HandlerContextMiddleware()
+
+    async def scenario():
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        result = await middleware(
+            blocking_handler, object(),
+            {"dispatch_handler": blocking_handler, "raw_state": "Form:description"},
+        )
+        # Поток-сторож закрывает эпизод, когда цикл снова отвечает
+        await asyncio.sleep(0.15)
+        await watchdog.stop()
+        return result
+
+    assert run(scenario()) == "done"
+    report = watchdog.report()
+    assert len(report["stalls"]) == 1
+    stall = report["stalls"][0]
+    assert stall["blocked_ms"] >= 100
+    assert stall["context"] == {"handler": "blocking_handler", "state": "Form:description"}
+    assert any("blocking_handler" in line for line in stall["stack"])
+    assert report["max_lag_ms"] >= 100
+    assert not report["blocked_now"]
+
+
+def test_responsive_loop_records_no_stalls(run):
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.2)
+
+    async def scenario():
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        await watchdog.stop()
+
+    run(scenario())
+    report = watchdog.report()
+    assert report["stalls"] == []
+    assert report["samples"] > 0
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import Admin, Base
+from repository import SQLAlchemyRepository
+from write_queue import WriteQueue
+
+APPLICATION = {
+    "request_type": "Запросить бесплатную видеоконсультацию",
+    "name": "Иван",
+    "description": "Не могу уснуть",
+}
+
+
+@pytest.fixture
+def scratch_engine(run, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/writes.db")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    run(create())
+    yield engine
+    run(engine.dispose())
+
+
+def _add_admin(user_id):
+    async def write(conn):
+        await conn.execute(insert(Admin), {"user_id": user_id})
+        return user_id
+
+    return write
+
+
+def test_concurrent_writes_share_transactions(run, scratch_engine):
+    repo = SQLAlchemyRepository(scratch_engine, batch_window=0.01, batch_max=8)
+
+    async def scenario():
+        rows = await asyncio.gather(
+            *(repo.create_application(user_id, "u", APPLICATION) for user_id in range(20))
+        )
+        await repo.writer.drain(1)
+        return rows
+
+    rows = run(scenario())
+    assert len({row.id for row in rows}) == 20
+    assert [row.user_id for row in rows] == list(range(20))
+    report = repo.writer.report()
+    assert report["operations"] == 20
+    assert report["batches"] < 20
+    assert report["largest_batch"] <= 8
+    assert report["fallbacks"] == 0
+
+
+def test_failed_operation_only_fails_its_caller(run, scratch_engine):
+    writer = WriteQueue(scratch_engine, window=0.01)
+
+    async def scenario():
+        results = await asyncio.gather(
+            writer.submit(_add_admin(1)),
+            writer.submit(_add_admin(1)),
+            writer.submit(_add_admin(2)),
+            return_exceptions=True,
+        )
+        await writer.drain(1)
+        return results
+
+    results = run(scenario())
+    assert results[0] == 1
+    assert isinstance(results[1], IntegrityError)
+    assert results[2] == 2
+    assert writer.report()["fallbacks"] == 1
+
+
+def test_configure_applies_before_the_first_write(run, scratch_engine):
+    writer = WriteQueue(scratch_engine)
+    writer.configure(window=0, max_batch=1)
+
+    async def scenario():
+        await asyncio.gather(*(writer.submit(_add_admin(user_id)) for user_id in range(5)))
+        await writer.drain(1)
+
+    run(scenario())
+    report = writer.report()
+    assert report["window_ms"] == 0
+    assert report["batches"] == 5
+
+
+def test_cancelled_caller_is_skipped(run, scratch_engine):
+    writer = WriteQueue(scratch_engine, window=0.05)
+
+    async def scenario():
+        cancelled = asyncio.ensure_future(writer.submit(_add_admin(1)))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        kept = await writer.submit(_add_admin(2))
+        await writer.drain(1)
+        return kept
+
+    assert run(scenario()) == 2
+    assert writer.report()["operations"] == 1
@@ -0,0 +1,219 @@
+import asyncio
+import math
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dedup import normalize_text
+from logger import logger
+from repository import repo
+
+# Ключ темы -> (название, слова-затравки). Затравки позволяют классифицировать
+# вопросы, пока администраторы разметили мало вопросов, и не дают пропасть редким темам.
+TOPICS: Dict[str, Tuple[str, str]] = {
+    "anxiety": (
+        "Тревога и страхи",
+        "тревога тревожность тревожно страх страшно боюсь паника панические атаки "
+        "волнуюсь беспокойство нервничаю фобия навязчивые мысли",
+    ),
+    "depression": (
+        "Депрессия и настроение",
+        "депрессия апатия грусть тоска пустота нет сил ничего не хочется плачу "
+        "бессонница усталость выгорание одиночество",
+    ),
+    "relationships": (
+        "Отношения",
+        "отношения партнер парень девушка муж жена любовь расставание измена "
+        "ревность развод свидания бывший бывшая",
+    ),
+    "family": (
+        "Семья и дети",
+        "родители мама папа мать отец ребенок дети сын дочь семья воспитание "
+        "подросток свекровь брат сестра",
+    ),
+    "grief": (
+        "Утрата и горе",
+        "умер умерла смерть похороны утрата горе потеря погиб погибла скорбь траур",
+    ),
+    "self": (
+        "Самооценка",
+        "самооценка уверенность неуверенность стыд вина ненавижу себя внешность "
+        "перфекционизм критика сравниваю",
+    ),
+    "work": (
+        "Работа и учёба",
+        "работа начальник коллеги карьера учеба экзамены университет школа "
+        "увольнение зарплата деньги прокрастинация",
+    ),
+    "addiction": (
+        "Зависимости",
+        "алкоголь пьет пью выпивает зависимость наркотики курение игры игромания "
+        "созависимость",
+    ),
+}
+TOPIC_KEYS = tuple(TOPICS)
+
+STEM_LENGTH = 5
+SEED_WEIGHT = 3
+MIN_CONFIDENCE = 0.5
+STOPWORDS = frozenset(
+    "как что это мне меня мой моя мои все всё так его она они оно или если уже "
+    "когда был была было были очень есть нет еще ещё для чтобы тоже только даже "
+    "там тут где вот при про без под над через после может можно надо".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Слова нормализованного текста, урезанные до STEM_LENGTH символов:
+    грубая, но дешёвая замена стемминга («тревога», «тревожно» -> «трево»).
+    """
+    return [
+        word[:STEM_LENGTH]
+        for word in normalize_text(text).split()
+        if len(word) > 2 and word not in STOPWORDS
+    ]
+
+
+class NaiveBayesModel:
+    """
+    Мультиномиальный наивный Байес. Для каждого слова словаря хранится
+    вектор логарифмов вероятностей по всем темам, так что оценка вопроса —
+    поэлементная сумма нескольких векторов без обращения к счётчикам.
+    """
+
+    def __init__(self, priors: Sequence[float], log_probs: Dict[str, Tuple[float, ...]], samples: int):
+        self.priors = tuple(priors)
+        self.log_probs = log_probs
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, samples: Iterable[Tuple[str, str]], alpha: float = 1.0) -> "NaiveBayesModel":
+        """
+        Обучение за один проход подсчёта: samples — пары (текст, ключ темы).
+        """
+        index = {topic: i for i, topic in enumerate(TOPIC_KEYS)}
+        token_counts = [Counter() for _ in TOPIC_KEYS]
+        documents = [0] * len(TOPIC_KEYS)
+
+        for topic, (_, seeds) in TOPICS.items():
+            seed_tokens = tokenize(seeds)
+            for _ in range(SEED_WEIGHT):
+                token_counts[index[topic]].update(seed_tokens)
+            documents[index[topic]] += 1
+
+        total = 0
+        for text, topic in samples:
+            i = index.get(topic)
+            if i is None:
+                continue
+            token_counts[i].update(tokenize(text))
+            documents[i] += 1
+            total += 1
+
+        vocabulary = set().union(*token_counts)
+        denominators = [
+            math.log(sum(counts.values()) + alpha * len(vocabulary)) for counts in token_counts
+        ]
+        log_probs = {
+            token: tuple(
+                math.log(counts[token] + alpha) - denominator
+                for counts, denominator in zip(token_counts, denominators)
+            )
+            for token in vocabulary
+        }
+        all_documents = sum(documents)
+        priors = [math.log(count / all_documents) for count in documents]
+        return cls(priors, log_probs, total)
+
+    def scores(self, text: str) -> Optional[List[float]]:
+        scores = list(self.priors)
+        known = False
+        for token in tokenize(text):
+            vector = self.log_probs.get(token)
+            if vector is None:
+                continue
+            known = True
+            scores = [score + value for score, value in zip(scores, vector)]
+        return scores if known else None
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Возвращает (ключ темы, вероятность). Если в тексте нет знакомых слов,
+        возвращает (None, 0.0).
+        """
+        scores = self.scores(text)
+        if scores is None:
+            return None, 0.0
+        best = max(range(len(scores)), key=scores.__getitem__)
+        top = scores[best]
+        confidence = 1 / sum(math.exp(score - top) for score in scores)
+        return TOPIC_KEYS[best], confidence
+
+
+class TopicClassifier:
+    """
+    Определяет тему анонимного вопроса, чтобы направить его психологам,
+    которые её ведут. Обучается на темах, указанных администраторами,
+    и словах-затравках; до первого обучения работает только на затравках.
+    """
+
+    def __init__(self, min_confidence: float = MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.model = NaiveBayesModel.fit(())
+        self.trained_at: Optional[float] = None
+        self.train_ms = 0.0
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Тема и уверенность; при уверенности ниже min_confidence тема не
+        назначается и вопрос получают все администраторы.
+        """
+        topic, confidence = self.model.predict(text)
+        if confidence < self.min_confidence:
+            return None, confidence
+        return topic, confidence
+
+    async def train(self) -> dict:
+        samples = [sample async for sample in repo.iter_labeled_questions()]
+        started = time.perf_counter()
+        # Подсчёт на тысячах вопросов — десятки миллисекунд, не держим цикл событий
+        self.model = await asyncio.to_thread(NaiveBayesModel.fit, samples)
+        self.train_ms = (time.perf_counter() - started) * 1000
+        self.trained_at = time.time()
+        logger.info(
+            f"Классификатор тем обучен на {self.model.samples} вопросах "
+            f"за {self.train_ms:.0f} мс, слов в словаре: {len(self.model.log_probs)}"
+        )
+        return self.report()
+
+    async def rescore_backlog(self) -> List[Tuple[int, Optional[str], float]]:
+        """
+        Переоценивает темы всех ожидающих ответа вопросов, кроме назначенных
+        администратором, одной пачкой. Возвращает изменённые (id, тема, уверенность).
+        """
+        changed = []
+        for question in await repo.get_pending_questions():
+            if question.topic_by_admin:
+                continue
+            topic, confidence = self.classify(question.question_text or "")
+            if topic != question.topic:
+                changed.append((question.id, topic, confidence))
+        await repo.set_question_topics([(question_id, topic) for question_id, topic, _ in changed])
+        return changed
+
+    def report(self) -> dict:
+        return {
+            "samples": self.model.samples,
+            "vocabulary": len(self.model.log_probs),
+            "trained_at": self.trained_at,
+            "train_ms": round(self.train_ms, 1),
+            "min_confidence": self.min_confidence,
+        }
+
+
+def topic_title(topic: Optional[str]) -> str:
+    return TOPICS[topic][0] if topic in TOPICS else "без темы"
+
+
+topic_classifier = TopicClassifier()
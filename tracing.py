@@ -0,0 +1,262 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from typing import Any, Dict, List, Optional
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from logger import error_logger
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_trace_ids = itertools.count(1)
+
+
+class Trace:
+    """
+    Трасса одного апдейта: корневой интервал и дочерние интервалы
+    (обработчик, FSM, SQL-запросы, очередь записи, методы Bot API).
+    """
+
+    __slots__ = (
+        "id",
+        "update_id",
+        "event_type",
+        "handler",
+        "sampled",
+        "started_at",
+        "started",
+        "duration_ms",
+        "spans",
+    )
+
+    def __init__(self, update_id: int, event_type: str, sampled: bool):
+        self.id = next(_trace_ids)
+        self.update_id = update_id
+        self.event_type = event_type
+        self.handler: Optional[str] = None
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self.spans: List[tuple] = []
+
+    def add_span(self, kind: str, name: str, started: float, ended: float, error: str = None):
+        self.spans.append((kind, name, started - self.started, ended - started, error))
+
+    def to_dict(self) -> dict:
+        totals: Dict[str, float] = {}
+        for kind, _, _, duration, _ in self.spans:
+            totals[kind] = totals.get(kind, 0.0) + duration
+        return {
+            "trace_id": self.id,
+            "update_id": self.update_id,
+            "event_type": self.event_type,
+            "handler": self.handler,
+            "sampled": self.sampled,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round(self.duration_ms, 2),
+            "totals_ms": {kind: round(total * 1000, 2) for kind, total in totals.items()},
+            "spans": [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "offset_ms": round(offset * 1000, 2),
+                    "duration_ms": round(duration * 1000, 2),
+                    **({"error": error} if error else {}),
+                }
+                for kind, name, offset, duration, error in sorted(self.spans, key=lambda item: item[2])
+            ],
+        }
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """
+    Дочерний интервал текущей трассы; вне трассы ничего не делает.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        trace.add_span(kind, name, started, time.perf_counter(), error)
+
+
+def untraced_task(coro) -> asyncio.Task:
+    """
+    Фоновая задача без текущей трассы. Иначе задача, запущенная лениво
+    из обработчика, унаследует его трассу и будет дописывать в неё
+    интервалы чужих апдейтов.
+    """
+    return Context().run(asyncio.create_task, coro)
+
+
+class Tracer:
+    """
+    Трассировка апдейтов без внешнего коллектора. В буфер на buffer_size
+    трасс (и, если задан, в JSONL-файл) попадает доля sample_rate апдейтов
+    и все апдейты, обработка которых заняла больше slow_ms.
+    """
+
+    def __init__(self, sample_rate: float = 0.05, slow_ms: float = 1000, buffer_size: int = 200, path: str = ""):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.path = path
+        self.traces: deque = deque(maxlen=buffer_size)
+        self.started = 0
+        self.kept = 0
+        self._pending: List[str] = []
+        self._file_task: Optional[asyncio.Task] = None
+
+    def configure(self, sample_rate: float, slow_ms: float, buffer_size: int, path: str = ""):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.path = path
+        self.traces = deque(self.traces, maxlen=buffer_size)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    async def update_middleware(self, handler, event, data):
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_ms <= 0:
+            return await handler(event, data)
+        trace = Trace(event.update_id, event.event_type, sampled)
+        self.started += 1
+        token = _current_trace.set(trace)
+        try:
+            return await handler(event, data)
+        finally:
+            _current_trace.reset(token)
+            trace.duration_ms = (time.perf_counter() - trace.started) * 1000
+            if sampled or trace.duration_ms >= self.slow_ms > 0:
+                self._keep(trace)
+
+    async def handler_middleware(self, handler, event, data):
+        trace = _current_trace.get()
+        if trace is None:
+            return await handler(event, data)
+        callback = data.get("dispatch_handler") or data.get("action_handler")
+        if callback is None:
+            callback = getattr(data.get("handler"), "callback", None)
+        trace.handler = getattr(callback, "__qualname__", repr(callback))
+        with span("handler", trace.handler):
+            return await handler(event, data)
+
+    async def session_middleware(self, make_request, bot, method):
+        with span("api", method.__api_method__):
+            return await make_request(bot, method)
+
+    def instrument_engine(self, engine: AsyncEngine):
+        """
+        Интервал на каждый SQL-запрос движка. Параметры запросов не пишутся:
+        в них персональные данные.
+        """
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            if _current_trace.get() is not None:
+                context._trace_started = time.perf_counter()
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            trace = _current_trace.get()
+            started = getattr(context, "_trace_started", None)
+            if trace is not None and started is not None:
+                trace.add_span("db", " ".join(statement.split())[:120], started, time.perf_counter())
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before)
+        event.listen(engine.sync_engine, "after_cursor_execute", after)
+
+    def _keep(self, trace: Trace):
+        self.kept += 1
+        self.traces.append(trace)
+        if self.path:
+            # Трассы чаще всего сохраняются в медленные периоды — файл пишется
+            # в отдельном потоке, чтобы не задерживать цикл событий ещё больше
+            self._pending.append(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+            if self._file_task is None or self._file_task.done():
+                self._file_task = untraced_task(self._write_pending())
+
+    async def _write_pending(self):
+        while self._pending:
+            lines, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._append, self.path, lines)
+            except OSError as e:
+                error_logger.error(f"Не удалось записать {len(lines)} трасс в {self.path}: {e}")
+
+    @staticmethod
+    def _append(path: str, lines: List[str]):
+        with open(path, "a", encoding="utf-8") as trace_file:
+            trace_file.writelines(lines)
+
+    async def drain(self):
+        """
+        Дожидается записи в TRACE_FILE всех сохранённых трасс.
+        """
+        if self._file_task is not None:
+            await self._file_task
+
+    def recent(self, limit: int = 50, min_ms: float = 0, handler: str = None) -> List[dict]:
+        result = []
+        for trace in reversed(self.traces):
+            if trace.duration_ms < min_ms or (handler and trace.handler != handler):
+                continue
+            result.append(trace.to_dict())
+            if len(result) >= limit:
+                break
+        return result
+
+    def report(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "started": self.started,
+            "kept": self.kept,
+            "buffered": len(self.traces),
+        }
+
+
+class TracedStorage(BaseStorage):
+    """
+    Обёртка FSM-хранилища, добавляющая в трассу интервалы обращений к нему.
+    """
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        with span("fsm", "set_state"):
+            await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with span("fsm", "get_state"):
+            return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with span("fsm", "set_data"):
+            await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with span("fsm", "get_data"):
+            return await self.storage.get_data(key)
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+tracer = Tracer()
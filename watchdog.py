@@ -0,0 +1,142 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from logger import logger
+
+STACK_LIMIT = 30
+
+
+class HandlerContextMiddleware:
+    """
+    Внутренний middleware aiogram: держит в локальных переменных кадра имя
+    обработчика и FSM-состояние, чтобы сторожевой поток мог найти их в стеке
+    заблокированного цикла событий.
+    """
+
+    async def __call__(self, handler, event, data):
+        callback = data.get("dispatch_handler")
+        if callback is None:
+            callback = getattr(data.get("handler"), "callback", None)
+        watchdog_handler = getattr(callback, "__qualname__", repr(callback))
+        watchdog_state = data.get("raw_state")
+        return await handler(event, data)
+
+
+_CONTEXT_CODE = HandlerContextMiddleware.__call__.__code__
+
+
+def _find_handler_context(frame) -> Optional[dict]:
+    while frame is not None:
+        if frame.f_code is _CONTEXT_CODE:
+            f_locals = frame.f_locals
+            return {
+                "handler": f_locals.get("watchdog_handler"),
+                "state": f_locals.get("watchdog_state"),
+            }
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """
+    Измеряет задержку цикла событий. Если цикл не отвечает дольше threshold,
+    отдельный поток снимает стек заблокировавшей его корутины вместе с текущим
+    обработчиком aiogram и состоянием Form и пишет его в лог.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.5, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=history)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._current_stall = None
+
+    def configure(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(
+            target=self._monitor, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _beat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - started - self.interval, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples += 1
+            self._heartbeat = now
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval / 2):
+            blocked_for = time.monotonic() - self._heartbeat
+            if blocked_for >= self.threshold:
+                if self._current_stall is None:
+                    self._current_stall = self._capture(blocked_for)
+            elif self._current_stall is not None:
+                self._finish_stall()
+
+    def _capture(self, blocked_for: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stall = {
+            "detected_at": time.time(),
+            "blocked_ms": round(blocked_for * 1000, 1),
+            "stack": traceback.format_stack(frame, limit=STACK_LIMIT) if frame else [],
+            "context": _find_handler_context(frame),
+        }
+        del frame
+        return stall
+
+    def _finish_stall(self):
+        stall, self._current_stall = self._current_stall, None
+        stall["blocked_ms"] = round(max(stall["blocked_ms"], self.last_lag * 1000), 1)
+        self.stalls.append(stall)
+        context = stall["context"] or {}
+        logger.warning(
+            f"Цикл событий заблокирован на {stall['blocked_ms']} мс; "
+            f"обработчик: {context.get('handler')}, состояние: {context.get('state')}\n"
+            + "".join(stall["stack"][-10:])
+        )
+
+    def report(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "samples": self.samples,
+            "blocked_now": self._current_stall is not None,
+            "stalls": list(self.stalls),
+        }
+
+
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,147 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from logger import logger
+from tracing import span, untraced_task
+
+WriteOperation = Callable[[AsyncConnection], Awaitable[Any]]
+
+
+class WriteQueue:
+    """
+    Групповая фиксация записей в SQLite. Все изменения выполняет одна фоновая
+    задача: операции, пришедшие в течение window секунд после первой
+    (но не больше max_batch), выполняются в одной транзакции, то есть с одним
+    fsync на всю пачку. Результат операции отдаётся вызывающему только
+    после фиксации транзакции.
+
+    Если пачка падает, она откатывается целиком, и каждая операция
+    повторяется в своей транзакции: ошибка достаётся только её автору.
+    """
+
+    def __init__(self, engine: AsyncEngine, window: float = 0.002, max_batch: int = 100):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.operations = 0
+        self.largest_batch = 0
+        self.fallbacks = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """
+        Ставит операцию в очередь и ждёт её фиксации.
+        operation получает соединение с открытой транзакцией.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        if self._task is None or self._task.done():
+            self._task = untraced_task(self._run())
+        # Запросы пачки выполняются в задаче записи, вне трассы апдейта,
+        # поэтому в трассу попадает общее ожидание: очередь и фиксация
+        with span("db", "write_queue"):
+            return await future
+
+    async def _collect(self) -> List[Tuple[WriteOperation, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch:
+            if self._queue.empty():
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: List[Tuple[WriteOperation, asyncio.Future]]):
+        # Вызывающий мог уйти (отмена обработчика) до начала записи
+        batch = [(operation, future) for operation, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.operations += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            results = []
+            async with self.engine.begin() as conn:
+                for operation, _ in batch:
+                    results.append(await operation(conn))
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], exception=e)
+                return
+            self.fallbacks += 1
+            logger.warning(
+                f"Пачка из {len(batch)} записей откатилась ({e}), повтор по одной"
+            )
+            for operation, future in batch:
+                try:
+                    async with self.engine.begin() as conn:
+                        result = await operation(conn)
+                except Exception as single_error:
+                    self._resolve(future, exception=single_error)
+                else:
+                    self._resolve(future, result)
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exception: Exception = None):
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Дожидается записи всех поставленных операций и останавливает задачу.
+        """
+        if self._task is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Остановка: не записано {self._queue.qsize()} операций")
+            return False
+        finally:
+            self._task.cancel()
+
+    def report(self) -> dict:
+        return {
+            "window_ms": round(self.window * 1000, 2),
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "operations": self.operations,
+            "avg_batch": round(self.operations / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "fallbacks": self.fallbacks,
+        }